@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Benchmarks cold (XML) and warm (binary cache) catalogue loading with
+``corejet.core.cache.CatalogueCache``.
+
+Run with ``python benchmarks/bench_cache.py``.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import argparse
+
+from corejet.core.cache import CatalogueCache
+
+from bench_model import syntheticCatalogue
+
+
+def timed(func, repeat):
+    best = None
+    for i in xrange(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=u"Benchmarks the CoreJet catalogue cache")
+    parser.add_argument('--epics', type=int, default=20)
+    parser.add_argument('--stories', type=int, default=100)
+    parser.add_argument('--scenarios', type=int, default=10)
+    parser.add_argument('--steps', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(tmpdir, 'corejet.xml')
+        with open(source, 'w') as f:
+            f.write(syntheticCatalogue(args.epics, args.stories,
+                                       args.scenarios, args.steps))
+        cacheDir = os.path.join(tmpdir, 'cache')
+
+        def cold():
+            cache = CatalogueCache(cacheDir)
+            cache.invalidate(source)
+            cache.load(source)
+
+        def warm():
+            CatalogueCache(cacheDir).load(source)
+
+        def warmChecksum():
+            CatalogueCache(cacheDir, checksum=True).load(source)
+
+        coldTime = timed(cold, args.repeat)
+        warmTime = timed(warm, args.repeat)
+        CatalogueCache(cacheDir, checksum=True).invalidate(source)
+        CatalogueCache(cacheDir, checksum=True).load(source)
+        checksumTime = timed(warmChecksum, args.repeat)
+
+        cacheFiles = [os.path.join(cacheDir, name)
+                      for name in os.listdir(cacheDir)]
+        print "source:           %.2f MB" % (
+            os.path.getsize(source) / 1024.0 / 1024.0)
+        print "cache entry:      %.2f MB" % (
+            sum(os.path.getsize(name) for name in cacheFiles) / 1024.0 / 1024.0)
+        print "cold (parse XML and write cache): %.3fs" % coldTime
+        print "warm (mtime key):                 %.3fs (%.1fx)" % (
+            warmTime, coldTime / warmTime)
+        print "warm (checksum key):              %.3fs (%.1fx)" % (
+            checksumTime, coldTime / checksumTime)
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main()
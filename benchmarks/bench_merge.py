@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Benchmarks loading and merging many catalogue files with
+``corejet.core.merge.loadCatalogues()``, in this process and in a pool of
+worker processes.
+
+Run with ``python benchmarks/bench_merge.py``.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import argparse
+import multiprocessing
+
+from corejet.core.model import RequirementsCatalogue
+from corejet.core.merge import loadCatalogues
+
+from bench_model import syntheticCatalogue
+from bench_cache import timed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=u"Benchmarks parallel CoreJet catalogue loading")
+    parser.add_argument('--files', type=int, default=40)
+    parser.add_argument('--epics', type=int, default=2)
+    parser.add_argument('--stories', type=int, default=50)
+    parser.add_argument('--scenarios', type=int, default=10)
+    parser.add_argument('--steps', type=int, default=2)
+    parser.add_argument('--processes', type=int,
+                        default=multiprocessing.cpu_count())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        paths = []
+        for n in xrange(args.files):
+            xml = syntheticCatalogue(args.epics, args.stories,
+                                     args.scenarios, args.steps)
+            # One team per file, each with its own epics and stories
+            xml = xml.replace('id="E', 'id="T%d-E' % n)
+            xml = xml.replace('id="S', 'id="T%d-S' % n)
+            path = os.path.join(tmpdir, 'team%d.xml' % n)
+            with open(path, 'w') as f:
+                f.write(xml)
+            paths.append(path)
+
+        def populateLoop():
+            catalogue = RequirementsCatalogue()
+            for path in paths:
+                with open(path, 'rb') as f:
+                    catalogue.populate(f)
+
+        def serial():
+            loadCatalogues(paths, processes=1)
+
+        def parallel():
+            loadCatalogues(paths, processes=args.processes)
+
+        print "%d files, %.2f MB" % (len(paths),
+            sum(os.path.getsize(path) for path in paths) / 1024.0 / 1024.0)
+        print "populate() per file (no merge): %.3fs" % timed(
+            populateLoop, args.repeat)
+        serialTime = timed(serial, args.repeat)
+        print "loadCatalogues, 1 process:      %.3fs" % serialTime
+        parallelTime = timed(parallel, args.repeat)
+        print "loadCatalogues, %d processes:   %.3fs (%.1fx)" % (
+            args.processes, parallelTime, serialTime / parallelTime)
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main()
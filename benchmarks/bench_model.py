@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Benchmarks the size of the model classes and the throughput of
+``RequirementsCatalogue.populate()``.
+
+Run with ``python benchmarks/bench_model.py``.
+"""
+
+import sys
+import time
+import argparse
+
+from StringIO import StringIO
+
+from corejet.core.model import RequirementsCatalogue
+from corejet.core.model import Epic, Story, Scenario, Step
+
+
+def sizeOf(obj):
+    """Shallow size of an instance including its ``__dict__``, if any
+    """
+    size = sys.getsizeof(obj)
+    dict_ = getattr(obj, '__dict__', None)
+    if dict_ is not None:
+        size += sys.getsizeof(dict_)
+    return size
+
+
+def syntheticCatalogue(epics, stories, scenarios, steps):
+    """Return the XML for a catalogue of the given shape. ``steps`` is the
+    number of steps of each type per scenario.
+    """
+    out = StringIO()
+    out.write('<requirementscatalogue project="Benchmark" '
+              'extractTime="2011-01-02T12:01:00">\n')
+    for e in xrange(epics):
+        out.write('  <epic id="E%d" title="Epic %d">\n' % (e, e,))
+        for s in xrange(stories):
+            out.write('    <story id="S%d-%d" title="Story %d" points="3" '
+                      'requirementStatus="open" priority="high">\n'
+                      % (e, s, s,))
+            for c in xrange(scenarios):
+                out.write('      <scenario name="Scenario %d" '
+                          'testStatus="pass">\n' % c)
+                for step_type in ('given', 'when', 'then'):
+                    for n in xrange(steps):
+                        out.write('        <%s>a "quoted" %s step %d</%s>\n'
+                                  % (step_type, step_type, n, step_type,))
+                out.write('      </scenario>\n')
+            out.write('    </story>\n')
+        out.write('  </epic>\n')
+    out.write('</requirementscatalogue>\n')
+    return out.getvalue()
+
+
+def benchmarkSteps(count):
+    start = time.time()
+    steps = [Step(u'a "quoted" step %d' % n, 'given') for n in xrange(count)]
+    elapsed = time.time() - start
+    size = sum(sizeOf(step) for step in steps)
+    print "Step:      %6.2f MB per %d steps (%d bytes each, excluding text), " \
+          "created in %.3fs" % (size / 1024.0 / 1024.0, count,
+                                size / count, elapsed,)
+
+    scenario = Scenario(u'Scenario', status='pass')
+    story = Story(u'S1', u'Story', points=3, status='open', priority='high')
+    epic = Epic(u'E1', u'Epic')
+    print "Scenario:  %6d bytes, excluding lists and text" % sizeOf(scenario)
+    print "Story:     %6d bytes, excluding lists and text" % sizeOf(story)
+    print "Epic:      %6d bytes, excluding lists and text" % sizeOf(epic)
+
+
+def benchmarkPopulate(xml, repeat):
+    best = None
+    for i in xrange(repeat):
+        catalogue = RequirementsCatalogue()
+        start = time.time()
+        catalogue.populate(StringIO(xml))
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    scenarios = steps = 0
+    for epic in catalogue.epics:
+        for story in epic.stories:
+            for scenario in story.scenarios:
+                scenarios += 1
+                steps += len(scenario.givens) + len(scenario.whens) + \
+                         len(scenario.thens)
+
+    print "populate:  %d scenarios, %d steps in %.3fs: %d scenarios/s, " \
+          "%d steps/s" % (scenarios, steps, best, scenarios / best,
+                          steps / best,)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=u"Benchmarks the CoreJet model classes")
+    parser.add_argument('--steps', type=int, default=100000,
+        help=u"number of steps to create (default 100000)")
+    parser.add_argument('--epics', type=int, default=10)
+    parser.add_argument('--stories', type=int, default=100)
+    parser.add_argument('--scenarios', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    benchmarkSteps(args.steps)
+    xml = syntheticCatalogue(args.epics, args.stories, args.scenarios, 1)
+    benchmarkPopulate(xml, args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks the throughput of ``corejet.core.parser.appendScenarios()`` in
+lines per second, for English and Finnish acceptance criteria, and that of
+classifying lines alone with a single ``Classifier`` match compared to
+trying each line type's regex in turn.
+
+It also benchmarks generating the scenarios of an outline with a wide
+(by default 50 column) example table from compiled step templates,
+compared to replacing each column's placeholder in every step in turn,
+and appending unchanged criteria through a ``ParseCache``, and parsing
+the criteria of many stories with ``appendAllScenarios()`` in this process
+and in a pool of worker processes.
+
+Run with ``python benchmarks/bench_parser.py``.
+"""
+
+import time
+import argparse
+import multiprocessing
+
+from corejet.core.model import Story, Scenario, Step
+from corejet.core import parser
+from corejet.core.parser import appendScenarios, appendAllScenarios
+from corejet.core.parsecache import ParseCache
+
+
+BACKGROUND = u"""\
+Given a logged-in user
+ And a shopping basket
+
+"""
+
+ENGLISH = u"""\
+Scenario: Adding item %(n)d
+Given an empty basket
+When the user adds item %(n)d to the basket
+ And the user opens the basket
+Then the basket holds item %(n)d
+ But the basket holds nothing else
+
+Scenario Outline: Adding items %(n)d
+Given <start> items in the basket
+When the user adds <added> items
+Then the basket holds <total> items
+
+Examples:
+| start | added | total |
+| 1     | 2     | 3     |
+| 4     | 5     | 9     |
+"""
+
+FINNISH = u"""\
+# language: fi
+
+Tapaus: Tuotteen %(n)d lisääminen
+Oletetaan, että kori on tyhjä,
+  ja käyttäjä on kirjautunut.
+Kun käyttäjä lisää tuotteen %(n)d koriin,
+niin korissa on tuote %(n)d,
+  mutta ei mitään muuta.
+"""
+
+
+def criteria(template, count, background=u''):
+    return background + u'\n'.join([template % {'n': n}
+                                     for n in xrange(count)])
+
+
+def benchmark(label, text, stories, repeat, append=appendScenarios,
+              name=None):
+    lines = len(text.splitlines()) * stories
+    best = None
+    for i in xrange(repeat):
+        targets = [Story(u'S%d' % n, u'Story') for n in xrange(stories)]
+        start = time.time()
+        for story in targets:
+            append(story, text)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print "%-8s %7d lines in %.3fs: %8d lines/s%s" % (
+        label, lines, best, lines / best, name and ' (%s)' % name or '',)
+
+
+def sequential(lines, language):
+    # How lines were classified before Classifier, one regex at a time
+    for line in lines:
+        if parser.language_regex.match(line):
+            continue
+        for lineType, regex in parser.LINE_TYPES:
+            if regex.match(line, language):
+                break
+
+
+def classified(lines, language):
+    classify = parser.getClassifier(language).classify
+    for line in lines:
+        classify(line)
+
+
+def benchmarkClassify(label, text, language, stories, repeat):
+    lines = text.splitlines() * stories
+    for name, func in (('one regex per type', sequential,),
+                       ('Classifier', classified,),):
+        best = None
+        for i in xrange(repeat):
+            start = time.time()
+            func(lines, language)
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        print "%-8s %7d lines classified in %.3fs: %8d lines/s (%s)" % (
+            label, len(lines), best, len(lines) / best, name,)
+
+
+def wideOutline(columns, rows, steps):
+    names = [u'column %d' % c for c in xrange(columns)]
+    lines = [u'Scenario Outline: Wide']
+    for keyword in (u'Given', u'When', u'Then'):
+        for s in xrange(steps):
+            # Each step uses a few of the columns
+            used = [names[(s * 7 + i) % columns] for i in xrange(3)]
+            lines.append(u'%s %s with <%s>, <%s> and <%s>' % (
+                s and u'And' or keyword, keyword.lower(),
+                used[0], used[1], used[2],))
+    lines.append(u'Examples:')
+    lines.append(u'| %s |' % u' | '.join(names))
+    for r in xrange(rows):
+        lines.append(u'| %s |' % u' | '.join(
+            [u'%d-%d' % (r, c) for c in xrange(columns)]))
+    story = Story(u'S1', u'Story')
+    outline, = parser.iterScenarios(story, u'\n'.join(lines), outlines=True)
+    return outline
+
+
+def replaced(outline):
+    # How outline scenarios were generated before compiled templates
+    examples = outline.examples
+    for index in xrange(len(examples)):
+        mapping = examples.mapping(index)
+        def translate(s, mapping):
+            for key in mapping:
+                s = s.replace(u"<%s>" % key, mapping[key])
+            return s
+        previousStep = None
+        steps = {}
+        for stepType, template in (('given', outline.givens,),
+                                   ('when', outline.whens,),
+                                   ('then', outline.thens,),):
+            steps[stepType] = []
+            for step in template:
+                steps[stepType].append(Step(translate(step.text, mapping),
+                                            previousStep))
+                previousStep = stepType
+        Scenario(u"%s #%02d" % (outline.name, index + 1),
+                 givens=steps['given'], whens=steps['when'],
+                 thens=steps['then'], story=outline.story)
+
+
+def compiled(outline):
+    for scenario in outline:
+        pass
+
+
+def benchmarkOutline(columns, rows, steps, repeat):
+    outline = wideOutline(columns, rows, steps)
+    for name, func in (('replace per column', replaced,),
+                       ('compiled templates', compiled,),):
+        best = None
+        for i in xrange(repeat):
+            start = time.time()
+            func(outline)
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        print "Outline: %d columns, %d rows, %d steps in %.3fs: " \
+              "%8d rows/s (%s)" % (columns, rows, steps * 3, best,
+                                   rows / best, name,)
+
+
+def benchmarkBatch(label, text, stories, processes, repeat):
+    lines = len(text.splitlines()) * stories
+    for count in sorted(set([1, processes])):
+        best = None
+        for i in xrange(repeat):
+            targets = [Story(u'S%d' % n, u'Story') for n in xrange(stories)]
+            start = time.time()
+            appendAllScenarios([(story, text) for story in targets],
+                               processes=count)
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        print "%-8s %7d lines in %.3fs: %8d lines/s " \
+              "(appendAllScenarios, %d processes)" % (
+                  label, lines, best, lines / best, count,)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=u"Benchmarks the CoreJet scenario parser")
+    parser.add_argument('--stories', type=int, default=1000)
+    parser.add_argument('--scenarios', type=int, default=5,
+        help=u"Repetitions of the sample criteria per story")
+    parser.add_argument('--columns', type=int, default=50,
+        help=u"Columns of the outline example table")
+    parser.add_argument('--rows', type=int, default=2000,
+        help=u"Rows of the outline example table")
+    parser.add_argument('--processes', type=int,
+                        default=multiprocessing.cpu_count())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    english = criteria(ENGLISH, args.scenarios, BACKGROUND)
+    finnish = criteria(FINNISH, args.scenarios)
+
+    benchmark('English:', english, args.stories, args.repeat)
+    benchmark('Finnish:', finnish, args.stories, args.repeat)
+    # Every story has the same criteria, so all but the first are hits
+    benchmark('English:', english, args.stories, args.repeat,
+              ParseCache().appendScenarios, 'ParseCache')
+    benchmarkBatch('English:', english, args.stories, args.processes,
+                   args.repeat)
+    benchmarkClassify('English:', english, 'en', args.stories, args.repeat)
+    benchmarkClassify('Finnish:', finnish, 'fi', args.stories, args.repeat)
+    benchmarkOutline(args.columns, args.rows, 3, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
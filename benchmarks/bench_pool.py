@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Benchmarks the memory held by text in a catalogue with much repeated step
+text, with and without a shared ``corejet.core.model.TextPool``, for both
+``RequirementsCatalogue.populate()`` and
+``corejet.core.parser.appendScenarios()``.
+
+Run with ``python benchmarks/bench_pool.py``.
+"""
+
+import sys
+import time
+import argparse
+
+from StringIO import StringIO
+
+from corejet.core.model import RequirementsCatalogue, TextPool, Story
+from corejet.core.parser import appendScenarios
+
+
+def unshared(text):
+    return text
+
+
+def repetitiveCatalogue(epics, stories, scenarios, steps, vocabulary):
+    """Return the XML for a catalogue whose step texts and scenario names
+    are drawn from ``vocabulary`` distinct values
+    """
+    out = StringIO()
+    out.write('<requirementscatalogue project="Benchmark" '
+              'extractTime="2011-01-02T12:01:00">\n')
+    n = 0
+    for e in xrange(epics):
+        out.write('  <epic id="E%d" title="Epic %d">\n' % (e, e,))
+        for s in xrange(stories):
+            out.write('    <story id="S%d-%d" title="Story %d" points="3" '
+                      'requirementStatus="open" priority="high">\n'
+                      % (e, s, s,))
+            for c in xrange(scenarios):
+                out.write('      <scenario name="Scenario %d" '
+                          'testStatus="pass">\n' % c)
+                for step_type in ('given', 'when', 'then'):
+                    for i in xrange(steps):
+                        n += 1
+                        out.write('        <%s>a logged-in user with the %s '
+                                  'step number %d</%s>\n' % (step_type,
+                                  step_type, n % vocabulary, step_type,))
+                out.write('      </scenario>\n')
+            out.write('    </story>\n')
+        out.write('  </epic>\n')
+    out.write('</requirementscatalogue>\n')
+    return out.getvalue()
+
+
+def criteria(scenarios, steps, vocabulary):
+    lines = []
+    n = 0
+    for c in xrange(scenarios):
+        lines.append(u'Scenario: Scenario %d' % c)
+        for keyword in (u'Given', u'When', u'Then'):
+            for i in xrange(steps):
+                n += 1
+                lines.append(u'%s a logged-in user with step number %d' %
+                             (i and u'And' or keyword, n % vocabulary,))
+    return u'\n'.join(lines)
+
+
+def textSize(stories):
+    """Return the number of distinct text objects held by the scenario
+    names and steps of ``stories``, and their total size in bytes
+    """
+    seen = {}
+    for story in stories:
+        for scenario in story.scenarios:
+            seen[id(scenario.name)] = scenario.name
+            for steps in (scenario.givens, scenario.whens, scenario.thens,):
+                for step in steps:
+                    seen[id(step.text)] = step.text
+    return len(seen), sum(sys.getsizeof(text) for text in seen.values())
+
+
+def report(label, stories, elapsed):
+    count, size = textSize(stories)
+    print "%-24s %7d text objects, %7.2f MB, built in %.3fs" % (
+        label, count, size / 1024.0 / 1024.0, elapsed,)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=u"Benchmarks shared text in CoreJet catalogues")
+    parser.add_argument('--epics', type=int, default=10)
+    parser.add_argument('--stories', type=int, default=100)
+    parser.add_argument('--scenarios', type=int, default=10)
+    parser.add_argument('--steps', type=int, default=3)
+    parser.add_argument('--vocabulary', type=int, default=200)
+    args = parser.parse_args()
+
+    xml = repetitiveCatalogue(args.epics, args.stories, args.scenarios,
+                              args.steps, args.vocabulary)
+
+    for label, pool in (('populate, unshared:', unshared,),
+                        ('populate, TextPool:', TextPool(),),):
+        catalogue = RequirementsCatalogue()
+        start = time.time()
+        catalogue.populate(StringIO(xml), pool=pool)
+        elapsed = time.time() - start
+        report(label, [story for epic in catalogue.epics
+                             for story in epic.stories], elapsed)
+
+    text = criteria(args.scenarios, args.steps, args.vocabulary)
+    count = args.epics * args.stories
+    for label, pool in (('appendScenarios, unshared:', None,),
+                        ('appendScenarios, TextPool:', TextPool(),),):
+        stories = [Story(u'S%d' % n, u'Story') for n in xrange(count)]
+        start = time.time()
+        for story in stories:
+            appendScenarios(story, text, pool=pool)
+        elapsed = time.time() - start
+        report(label, stories, elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+"""Binary cache of requirements catalogues.
+
+Parsing a large catalogue means running lxml over the whole file and
+calling ``dateutil`` for its timestamps. A ``CatalogueCache`` keeps a
+compact ``marshal`` representation of each catalogue it has loaded, keyed
+by the source path, and reuses it for as long as the source is unchanged.
+"""
+
+import gc
+import os
+import sys
+import marshal
+import hashlib
+import datetime
+import tempfile
+
+from dateutil import tz
+
+from corejet.core.model import RequirementsCatalogue
+from corejet.core.model import Epic, Story, Scenario, Step
+
+# Bump whenever the tuple layout below changes
+FORMAT_VERSION = 1
+
+def _dumpTime(value):
+    if value is None:
+        return None
+    offset = value.utcoffset()
+    if offset is not None:
+        offset = offset.days * 86400 + offset.seconds
+    return (value.year, value.month, value.day, value.hour, value.minute,
+            value.second, value.microsecond, offset,)
+
+def _loadTime(value):
+    if value is None:
+        return None
+    year, month, day, hour, minute, second, microsecond, offset = value
+    tzinfo = None
+    if offset is not None:
+        tzinfo = tz.tzoffset(None, offset)
+    return datetime.datetime(year, month, day, hour, minute, second,
+                             microsecond, tzinfo)
+
+def dumpSteps(steps, stepType):
+    """Return the given steps as a tuple. Steps of type ``stepType``, i.e.
+    all of them for a populated catalogue, are stored as their text alone.
+    """
+    for step in steps:
+        if step.step_type != stepType:
+            return tuple([(step.text, step.step_type,) for step in steps])
+    return tuple([step.text for step in steps])
+
+def loadSteps(steps, stepType, pool=None):
+    """Build a list of steps from the output of ``dumpSteps()``, sharing
+    their text through ``pool`` if given
+    """
+    # Cached text has already been cleaned by the Step constructor, so
+    # bypass it: steps are by far the most numerous nodes
+    new = Step.__new__
+    result = []
+    append = result.append
+    for text in steps:
+        step = new(Step)
+        step._parent = None
+        if type(text) is tuple:
+            text, step.step_type = text
+        else:
+            step.step_type = stepType
+        if pool is not None:
+            text = pool(text)
+        step._text = text
+        append(step)
+    return result
+
+def dumpScenario(scenario):
+    """Return the given scenario as nested tuples of primitive values
+    """
+    return (scenario.name, scenario.status,
+            dumpSteps(scenario.givens, 'given'),
+            dumpSteps(scenario.whens, 'when'),
+            dumpSteps(scenario.thens, 'then'),)
+
+def loadScenario(data, story=None, pool=None):
+    """Build a scenario from the output of ``dumpScenario()``, sharing its
+    name and step texts through ``pool`` if given
+    """
+    name, status, givens, whens, thens = data
+    if pool is not None:
+        name = pool(name)
+    return Scenario(name, status=status, story=story,
+        givens=loadSteps(givens, 'given', pool),
+        whens=loadSteps(whens, 'when', pool),
+        thens=loadSteps(thens, 'then', pool),
+    )
+
+def dumpStory(story):
+    """Return the given story, with its steps and scenarios, as nested
+    tuples of primitive values
+    """
+    return (story.name, story.title, story.points, story.status,
+            story.resolution, story.priority,
+            dumpSteps(story.givens, 'given'),
+            dumpSteps(story.whens, 'when'),
+            dumpSteps(story.thens, 'then'),
+            tuple([dumpScenario(scenario) for scenario in story.scenarios]),)
+
+def loadStory(data, epic=None):
+    """Build a story from the output of ``dumpStory()``
+    """
+    (name, title, points, status, resolution, priority,
+     givens, whens, thens, scenarios,) = data
+    story = Story(name, title, points=points, status=status,
+        resolution=resolution, priority=priority, epic=epic,
+        givens=loadSteps(givens, 'given'),
+        whens=loadSteps(whens, 'when'),
+        thens=loadSteps(thens, 'then'),
+    )
+    story.scenarios = [loadScenario(scenario, story) for scenario in scenarios]
+    return story
+
+def dumpEpic(epic):
+    """Return the given epic, with all its stories, as nested tuples of
+    primitive values
+    """
+    return (epic.name, epic.title,
+            tuple([dumpStory(story) for story in epic.stories]),)
+
+def loadEpic(data):
+    """Build an epic from the output of ``dumpEpic()``
+    """
+    name, title, stories = data
+    epic = Epic(name, title)
+    epic.stories = [loadStory(story, epic) for story in stories]
+    return epic
+
+def dumpCatalogue(catalogue):
+    """Return the given catalogue as nested tuples of primitive values,
+    suitable for ``marshal``
+    """
+    return (catalogue.project, _dumpTime(catalogue.extractTime),
+            _dumpTime(catalogue.testTime),
+            tuple([dumpEpic(epic) for epic in catalogue.epics]),)
+
+def loadCatalogue(data):
+    """Build a catalogue from the output of ``dumpCatalogue()``
+    """
+    project, extractTime, testTime, epics = data
+    # Every node created here stays reachable, so the cyclic collector,
+    # which creating this many objects would trigger over and over, has
+    # nothing to free
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return RequirementsCatalogue(project=project,
+            extractTime=_loadTime(extractTime),
+            testTime=_loadTime(testTime),
+            epics=[loadEpic(epic) for epic in epics],
+        )
+    finally:
+        if enabled:
+            gc.enable()
+
+def dumps(catalogue):
+    """Return a compact binary representation of the catalogue
+    """
+    return marshal.dumps(dumpCatalogue(catalogue), marshal.version)
+
+def loads(data):
+    """Build a catalogue from the output of ``dumps()``
+    """
+    return loadCatalogue(marshal.loads(data))
+
+def makeDirectory(directory):
+    """Create ``directory`` and its parents unless it exists, even if
+    another process creates it at the same time
+    """
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Another process may have created it in the meantime
+            if not os.path.isdir(directory):
+                raise
+
+def replaceFile(path, write):
+    """Replace the file at ``path`` atomically with the output of
+    ``write``, which is called with a file object open for writing
+    """
+    # Write to a temporary file first so that readers never see a
+    # partially written file
+    fd, tempPath = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(tempPath, path)
+    except:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+
+def writeRecords(directory, path, records):
+    """Write each of ``records`` to the file at ``path`` in ``directory``
+    as a separate ``marshal`` record, replacing the file atomically
+    """
+    makeDirectory(directory)
+    def write(f):
+        for record in records:
+            marshal.dump(record, f, marshal.version)
+    replaceFile(path, write)
+
+class CatalogueCache(object):
+    """Loads catalogues from XML files, which may be compressed, keeping a
+    binary copy of each one in ``directory``.
+
+    A cached copy is used when the source file has the same path, size
+    and modification time as when it was cached. If ``checksum`` is true,
+    the SHA-1 hash of the file contents is compared as well. This catches
+    edits within the resolution of the file system's timestamps.
+    """
+
+    def __init__(self, directory, checksum=False):
+        self.directory = directory
+        self.checksum = checksum
+
+    def load(self, path):
+        """Return a ``RequirementsCatalogue`` for the XML file at ``path``,
+        from the cache if possible
+        """
+        path = os.path.abspath(path)
+        key = self._key(path)
+        cachePath = self._cachePath(path)
+
+        catalogue = self._read(cachePath, key)
+        if catalogue is not None:
+            return catalogue
+
+        catalogue = RequirementsCatalogue()
+        catalogue.populate(path)
+
+        self._write(cachePath, key, catalogue)
+        return catalogue
+
+    def invalidate(self, path):
+        """Remove any cached copy of the catalogue at ``path``
+        """
+        cachePath = self._cachePath(os.path.abspath(path))
+        if os.path.exists(cachePath):
+            os.remove(cachePath)
+
+    def _cachePath(self, path):
+        if isinstance(path, unicode):
+            path = path.encode('utf-8')
+        name = hashlib.sha1(path).hexdigest()
+        return os.path.join(self.directory, name + '.cache')
+
+    def _key(self, path):
+        stat = os.stat(path)
+        digest = None
+        if self.checksum:
+            digest = hashlib.sha1()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 16), ''):
+                    digest.update(chunk)
+            digest = digest.hexdigest()
+        # marshal's format is only stable for a given Python version
+        return (FORMAT_VERSION, marshal.version, sys.version_info[:2],
+                path, stat.st_size, stat.st_mtime, digest,)
+
+    def _read(self, cachePath, key):
+        if not os.path.exists(cachePath):
+            return None
+        try:
+            with open(cachePath, 'rb') as f:
+                # The key is stored as a separate marshal record, so a
+                # stale entry is rejected without reading the model
+                if marshal.load(f) != key:
+                    return None
+                return loadCatalogue(marshal.load(f))
+        except (EOFError, ValueError, TypeError,):
+            # Truncated or otherwise unreadable: treat as a miss
+            return None
+
+    def _write(self, cachePath, key, catalogue):
+        writeRecords(self.directory, cachePath,
+                     (key, dumpCatalogue(catalogue),))
@@ -0,0 +1,304 @@
+"""Differences between two requirements catalogues.
+
+``diffCatalogues(old, new)`` compares two catalogues and returns a
+``ChangeSet`` describing the epics, stories, scenarios and steps that were
+added, removed or changed. Subtrees with equal fingerprints are skipped,
+so the comparison takes time roughly linear in the size of the changes
+once the fingerprints of both catalogues have been computed.
+
+Epics are matched by id, stories by id within their epic, scenarios by
+name within their story and steps by position within their given, when
+or then list. A step inserted in the middle of a list therefore shows up
+as changes to the steps after it, plus one added step at the end.
+
+A change set can be applied to a copy of the old catalogue to bring it in
+line with the new one::
+
+    changes = diffCatalogues(yesterday, today)
+    changes.apply(yesterday)
+"""
+
+from corejet.core.model import Step
+from corejet.core.cache import dumpEpic, loadEpic
+from corejet.core.cache import dumpStory, loadStory
+from corejet.core.cache import dumpScenario, loadScenario
+
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+
+# Fields compared for each kind of node. Nodes are identified by their key
+# (id, name or position), so keys are not included here.
+CATALOGUE_FIELDS = ('project', 'extractTime', 'testTime',)
+EPIC_FIELDS = ('title',)
+STORY_FIELDS = ('title', 'points', 'status', 'resolution', 'priority',)
+SCENARIO_FIELDS = ('status',)
+STEP_FIELDS = ('text',)
+
+STEP_LISTS = ('givens', 'whens', 'thens',)
+
+class Change(object):
+    """A single change.
+
+    ``action`` is one of ``added``, ``removed`` or ``changed``. ``kind``
+    is one of ``catalogue``, ``epic``, ``story``, ``scenario`` or
+    ``step``. ``path`` identifies the node:
+
+    * ``()`` for the catalogue
+    * ``(epicId,)`` for an epic
+    * ``(epicId, storyId)`` for a story
+    * ``(epicId, storyId, scenarioName)`` for a scenario
+    * ``(epicId, storyId, scenarioName, listName, index)`` for a step,
+      where ``scenarioName`` is ``None`` for a story-level step and
+      ``listName`` is one of ``givens``, ``whens`` or ``thens``
+
+    For added nodes, ``node`` is the node in the new catalogue and
+    ``index`` its position in its parent's list. For removed nodes,
+    ``node`` is the node in the old catalogue. For changed nodes,
+    ``fields`` maps each changed field name to an ``(old, new)`` tuple.
+    Changes to children are reported separately.
+    """
+
+    def __init__(self, action, kind, path, node=None, index=None,
+                 fields=None):
+        self.action = action
+        self.kind = kind
+        self.path = path
+        self.node = node
+        self.index = index
+        self.fields = fields or {}
+
+    def __repr__(self):
+        return "<Change %s %s %r>" % (self.action, self.kind, self.path,)
+
+class ChangeSet(object):
+    """The changes between two catalogues. Changes are grouped by parent
+    in document order; within a parent, removed children come first.
+    """
+
+    def __init__(self, changes=None):
+        self.changes = changes or []
+
+    def __iter__(self):
+        return iter(self.changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __nonzero__(self):
+        return bool(self.changes)
+
+    def filter(self, action=None, kind=None):
+        """Return the changes with the given action and/or kind
+        """
+        return [change for change in self.changes
+                if (action is None or change.action == action) and
+                   (kind is None or change.kind == kind)]
+
+    def apply(self, catalogue):
+        """Apply the changes to ``catalogue``, which should be equivalent
+        to the old catalogue the change set was computed from. Added nodes
+        are copied, so the new catalogue is not modified.
+
+        Removals are applied first, then changes, then additions, so the
+        resulting order of nodes matches the new catalogue unless nodes
+        were reordered.
+        """
+        resolver = _Resolver(catalogue)
+
+        for change in reversed(self.filter(REMOVED)):
+            owner, nodes, node = resolver.find(change.kind, change.path)
+            for idx, candidate in enumerate(nodes):
+                if candidate is node:
+                    del nodes[idx]
+                    break
+            resolver.modified(owner)
+
+        for change in self.filter(CHANGED):
+            owner, nodes, node = resolver.find(change.kind, change.path)
+            for name, (old, new) in change.fields.items():
+                setattr(node, name, new)
+            resolver.modified(owner)
+
+        for change in self.filter(ADDED):
+            path = change.path
+            if change.kind == 'epic':
+                owner = catalogue
+                nodes = catalogue.epics
+                copy = loadEpic(dumpEpic(change.node))
+            elif change.kind == 'story':
+                owner = resolver.epic(path[0])
+                nodes = owner.stories
+                copy = loadStory(dumpStory(change.node), owner)
+            elif change.kind == 'scenario':
+                owner = resolver.story(path[0], path[1])
+                nodes = resolver.scenarios(owner)
+                copy = loadScenario(dumpScenario(change.node), owner)
+            else:
+                owner = resolver.stepOwner(path)
+                nodes = getattr(owner, path[3])
+                copy = Step(change.node.text, change.node.step_type)
+            nodes.insert(change.index, copy)
+            resolver.modified(owner)
+
+class _Resolver(object):
+    """Finds nodes in a catalogue by path. A name-to-node mapping is
+    cached for each parent until that parent's children change.
+    """
+
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self._maps = {}
+
+    def modified(self, owner):
+        self._maps.pop(id(owner), None)
+
+    def _child(self, owner, nodes, key):
+        mapping = self._maps.get(id(owner))
+        if mapping is None:
+            mapping = self._maps[id(owner)] = _byName(nodes)
+        try:
+            return mapping[key]
+        except KeyError:
+            raise ValueError("Cannot apply change: %r not found" % (key,))
+
+    def epic(self, epicId):
+        return self._child(self.catalogue, self.catalogue.epics, epicId)
+
+    def story(self, epicId, storyId):
+        epic = self.epic(epicId)
+        return self._child(epic, epic.stories, storyId)
+
+    def scenarios(self, story):
+        # Scenarios generated from outlines are new objects each time they
+        # are read, so they are stored before any of them are changed
+        story.expandOutlines()
+        return story.scenarios
+
+    def scenario(self, epicId, storyId, name):
+        story = self.story(epicId, storyId)
+        return self._child(story, self.scenarios(story), name)
+
+    def stepOwner(self, path):
+        if path[2] is None:
+            return self.story(path[0], path[1])
+        return self.scenario(path[0], path[1], path[2])
+
+    def find(self, kind, path):
+        """Return ``(owner, siblings, node)`` for the node at ``path``
+        """
+        if kind == 'catalogue':
+            return None, None, self.catalogue
+        elif kind == 'epic':
+            return (self.catalogue, self.catalogue.epics,
+                    self.epic(path[0]),)
+        elif kind == 'story':
+            epic = self.epic(path[0])
+            return epic, epic.stories, self.story(path[0], path[1])
+        elif kind == 'scenario':
+            story = self.story(path[0], path[1])
+            return (story, self.scenarios(story),
+                    self.scenario(path[0], path[1], path[2]),)
+        owner = self.stepOwner(path)
+        steps = getattr(owner, path[3])
+        try:
+            return owner, steps, steps[path[4]]
+        except IndexError:
+            raise ValueError("Cannot apply change: no step at %r" % (path,))
+
+def _differs(oldValue, newValue):
+    try:
+        return oldValue != newValue
+    except TypeError:
+        # Naive and timezone-aware datetimes cannot be compared
+        return True
+
+def _fieldChanges(old, new, names):
+    fields = {}
+    for name in names:
+        oldValue = getattr(old, name)
+        newValue = getattr(new, name)
+        if _differs(oldValue, newValue):
+            fields[name] = (oldValue, newValue,)
+    return fields
+
+def _byName(nodes):
+    mapping = {}
+    for node in nodes:
+        mapping.setdefault(node.name, node)
+    return mapping
+
+def _diffSteps(changes, path, old, new):
+    for listName in STEP_LISTS:
+        oldSteps = getattr(old, listName)
+        newSteps = getattr(new, listName)
+        for index in range(min(len(oldSteps), len(newSteps))):
+            fields = _fieldChanges(oldSteps[index], newSteps[index],
+                                   STEP_FIELDS)
+            if fields:
+                changes.append(Change(CHANGED, 'step',
+                    path + (listName, index,), fields=fields))
+        for index in range(len(newSteps), len(oldSteps)):
+            changes.append(Change(REMOVED, 'step', path + (listName, index,),
+                node=oldSteps[index]))
+        for index in range(len(oldSteps), len(newSteps)):
+            changes.append(Change(ADDED, 'step', path + (listName, index,),
+                node=newSteps[index], index=index))
+
+def _diffChildren(changes, kind, path, oldNodes, newNodes, diffNode):
+    oldByName = _byName(oldNodes)
+    newByName = _byName(newNodes)
+
+    for node in oldNodes:
+        if node.name not in newByName:
+            changes.append(Change(REMOVED, kind, path + (node.name,),
+                node=node))
+
+    for index, node in enumerate(newNodes):
+        oldNode = oldByName.get(node.name)
+        if oldNode is None:
+            changes.append(Change(ADDED, kind, path + (node.name,),
+                node=node, index=index))
+        else:
+            diffNode(changes, path + (node.name,), oldNode, node)
+
+def diffCatalogues(old, new):
+    """Return a ``ChangeSet`` with the differences between the catalogues
+    ``old`` and ``new``
+    """
+    changes = []
+
+    def diffScenario(changes, path, oldScenario, newScenario):
+        if oldScenario.fingerprint == newScenario.fingerprint:
+            return
+        fields = _fieldChanges(oldScenario, newScenario, SCENARIO_FIELDS)
+        if fields:
+            changes.append(Change(CHANGED, 'scenario', path, fields=fields))
+        _diffSteps(changes, path, oldScenario, newScenario)
+
+    def diffStory(changes, path, oldStory, newStory):
+        if oldStory.fingerprint == newStory.fingerprint:
+            return
+        fields = _fieldChanges(oldStory, newStory, STORY_FIELDS)
+        if fields:
+            changes.append(Change(CHANGED, 'story', path, fields=fields))
+        _diffSteps(changes, path + (None,), oldStory, newStory)
+        _diffChildren(changes, 'scenario', path, oldStory.scenarios,
+                      newStory.scenarios, diffScenario)
+
+    def diffEpic(changes, path, oldEpic, newEpic):
+        if oldEpic.fingerprint == newEpic.fingerprint:
+            return
+        fields = _fieldChanges(oldEpic, newEpic, EPIC_FIELDS)
+        if fields:
+            changes.append(Change(CHANGED, 'epic', path, fields=fields))
+        _diffChildren(changes, 'story', path, oldEpic.stories,
+                      newEpic.stories, diffStory)
+
+    fields = _fieldChanges(old, new, CATALOGUE_FIELDS)
+    if fields:
+        changes.append(Change(CHANGED, 'catalogue', (), fields=fields))
+
+    _diffChildren(changes, 'epic', (), old.epics, new.epics, diffEpic)
+
+    return ChangeSet(changes)
@@ -0,0 +1,211 @@
+"""A history of test runs.
+
+A catalogue only holds the scenario statuses of the latest test run.
+``RunHistory`` keeps the statuses of every run it is given in a SQLite
+database, keyed by run time and by story id and scenario name, so that
+trends can be queried without keeping or parsing old catalogues::
+
+    history = RunHistory('history.db')
+    history.record(catalogue)           # once per test run
+    ...
+    history.passRates(lastRuns=90)      # {epicId: passRate}
+    history.firstFailure('S1', 'First scenario')
+
+Runs are append-only: a run, once recorded, cannot be changed. Run times
+are stored without a timezone; times with a timezone are converted to UTC
+first.
+"""
+
+import sqlite3
+import datetime
+
+from dateutil import tz
+
+from corejet.core.store import openDatabase
+
+# Bump whenever the schema below changes
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS run (
+    id INTEGER PRIMARY KEY,
+    time TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS scenario (
+    id INTEGER PRIMARY KEY,
+    epic TEXT,
+    story TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (story, name)
+);
+CREATE TABLE IF NOT EXISTS result (
+    scenario INTEGER NOT NULL REFERENCES scenario (id),
+    run INTEGER NOT NULL REFERENCES run (id),
+    status TEXT,
+    PRIMARY KEY (scenario, run)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS result_run ON result (run);
+CREATE INDEX IF NOT EXISTS scenario_epic ON scenario (epic);
+"""
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+def _dumpTime(value):
+    if value.utcoffset() is not None:
+        value = value.astimezone(tz.tzutc()).replace(tzinfo=None)
+    return value.strftime(TIME_FORMAT)
+
+def _loadTime(value):
+    return datetime.datetime.strptime(value, TIME_FORMAT)
+
+class RunHistory(object):
+    """The run history stored in the SQLite database at ``path``. The
+    database is created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = openDatabase(path, SCHEMA, SCHEMA_VERSION)
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, catalogue, time=None):
+        """Record the scenario statuses in ``catalogue`` as a run at
+        ``time``, by default the catalogue's ``testTime``, and return the
+        run time as stored. Raises ``ValueError`` if there is no time or a
+        run with the same time has already been recorded.
+        """
+        if time is None:
+            time = catalogue.testTime
+        if time is None:
+            raise ValueError("The catalogue has no test time")
+        time = _dumpTime(time)
+
+        connection = self.connection
+        with connection:
+            try:
+                runId = connection.execute('INSERT INTO run (time) VALUES (?)',
+                                           (time,)).lastrowid
+            except sqlite3.IntegrityError:
+                raise ValueError("A run at %s has already been recorded" %
+                                 (time,))
+
+            known = {}
+            for scenarioId, epic, story, name in connection.execute(
+                'SELECT id, epic, story, name FROM scenario'
+            ):
+                known[(story, name,)] = (scenarioId, epic,)
+
+            results = []
+            moved = []
+            for epic in catalogue.epics:
+                for story in epic.stories:
+                    for scenario in story.scenarios:
+                        key = (story.name, scenario.name,)
+                        entry = known.get(key)
+                        if entry is None:
+                            scenarioId = connection.execute(
+                                'INSERT INTO scenario (epic, story, name) '
+                                'VALUES (?, ?, ?)',
+                                (epic.name, story.name, scenario.name,)
+                            ).lastrowid
+                            known[key] = (scenarioId, epic.name,)
+                        else:
+                            scenarioId, epicName = entry
+                            if epicName != epic.name:
+                                # Stories are reported under the epic they
+                                # were last recorded in
+                                moved.append((epic.name, scenarioId,))
+                                known[key] = (scenarioId, epic.name,)
+                        results.append((scenarioId, runId, scenario.status,))
+
+            connection.executemany('UPDATE scenario SET epic = ? WHERE id = ?',
+                                   moved)
+            # A scenario name repeated within a story: the last one wins
+            connection.executemany('INSERT OR REPLACE INTO result '
+                                   '(scenario, run, status) VALUES (?, ?, ?)',
+                                   results)
+        return _loadTime(time)
+
+    def runs(self, lastRuns=None):
+        """Return the times of the recorded runs, oldest first, or of the
+        last ``lastRuns`` runs only
+        """
+        return [_loadTime(time) for runId, time in self._runs(lastRuns)]
+
+    def _runs(self, lastRuns):
+        if lastRuns is None:
+            rows = self.connection.execute(
+                'SELECT id, time FROM run ORDER BY time')
+            return list(rows)
+        rows = self.connection.execute(
+            'SELECT id, time FROM run ORDER BY time DESC LIMIT ?', (lastRuns,))
+        return list(reversed(list(rows)))
+
+    def _window(self, lastRuns):
+        # A condition selecting the results of the last ``lastRuns`` runs
+        if lastRuns is None:
+            return '1', ()
+        return ('result.run IN (SELECT id FROM run ORDER BY time DESC '
+                'LIMIT ?)', (lastRuns,))
+
+    def passRates(self, lastRuns=None):
+        """Return a dict mapping epic ids to the fraction of scenario
+        results with status ``pass`` over all runs, or the last
+        ``lastRuns`` runs. Scenarios without a status are not counted.
+        """
+        window, parameters = self._window(lastRuns)
+        rates = {}
+        for epic, passed, total in self.connection.execute(
+            'SELECT scenario.epic, '
+            "SUM(result.status = 'pass'), COUNT(result.status) "
+            'FROM result JOIN scenario ON result.scenario = scenario.id '
+            'WHERE ' + window + ' GROUP BY scenario.epic', parameters
+        ):
+            if total:
+                rates[epic] = float(passed) / total
+        return rates
+
+    def passRatesByRun(self, epic, lastRuns=None):
+        """Return ``(time, passRate)`` pairs for each run, oldest first,
+        for the scenarios of the given epic. Runs in which the epic had no
+        scenarios with a status are left out.
+        """
+        window, parameters = self._window(lastRuns)
+        return [(_loadTime(time), float(passed) / total,)
+                for time, passed, total in self.connection.execute(
+            'SELECT run.time, '
+            "SUM(result.status = 'pass'), COUNT(result.status) "
+            'FROM result JOIN scenario ON result.scenario = scenario.id '
+            'JOIN run ON result.run = run.id '
+            'WHERE scenario.epic = ? AND ' + window + ' '
+            'GROUP BY run.time ORDER BY run.time',
+            (epic,) + parameters) if total]
+
+    def statuses(self, story, scenario, lastRuns=None):
+        """Return ``(time, status)`` pairs, oldest first, for each run that
+        recorded the given scenario
+        """
+        window, parameters = self._window(lastRuns)
+        return [(_loadTime(time), status,)
+                for time, status in self.connection.execute(
+            'SELECT run.time, result.status FROM result '
+            'JOIN scenario ON result.scenario = scenario.id '
+            'JOIN run ON result.run = run.id '
+            'WHERE scenario.story = ? AND scenario.name = ? AND ' + window +
+            ' ORDER BY run.time', (story, scenario,) + parameters)]
+
+    def firstFailure(self, story, scenario, status='fail'):
+        """Return the time of the first run in which the given scenario
+        had the status ``status``, or ``None``
+        """
+        row = self.connection.execute(
+            'SELECT MIN(run.time) FROM result '
+            'JOIN scenario ON result.scenario = scenario.id '
+            'JOIN run ON result.run = run.id '
+            'WHERE scenario.story = ? AND scenario.name = ? '
+            'AND result.status = ?', (story, scenario, status,)).fetchone()
+        if row[0] is None:
+            return None
+        return _loadTime(row[0])
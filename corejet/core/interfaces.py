@@ -6,7 +6,7 @@ class IStep(Interface):
     """
     
     text = schema.TextLine(title=u"Step text")
-    step_type = schema.Choice(title=u"Step type", values=("given", "when", "then,"))
+    step_type = schema.Choice(title=u"Step type", values=("given", "when", "then",))
 
 class IScenario(Interface):
     """A scenario comprising multiple given, when and/or then steps
@@ -22,6 +22,58 @@ class IScenario(Interface):
     
     story = schema.Object(schema=Interface, required=False)
 
+class IExampleTable(Interface):
+    """The examples of a scenario outline, stored by column
+    """
+    
+    columns = schema.List(title=u"Column names", value_type=schema.TextLine())
+    
+    def append(row):
+        """Add a row: a sequence with one value per column
+        """
+    
+    def addColumn(name):
+        """Return the index of the named column, adding it if necessary
+        """
+    
+    def row(index):
+        """Return the row at index as a tuple of values
+        """
+    
+    def column(name):
+        """Return the values in the named column
+        """
+    
+    def mapping(index):
+        """Return the row at index as a dict of column names to values
+        """
+
+class IScenarioOutline(Interface):
+    """A scenario outline: template steps with placeholders, and a table of
+    examples. It is a sequence of the concrete scenarios, one per example,
+    which are generated when they are accessed.
+    """
+    
+    name = schema.TextLine(title=u"Outline name")
+    
+    givens = schema.List(title=u"Given clauses", value_type=schema.Object(schema=IStep))
+    whens = schema.List(title=u"When clauses", value_type=schema.Object(schema=IStep))
+    thens = schema.List(title=u"Then clauses", value_type=schema.Object(schema=IStep))
+    
+    examples = schema.Object(title=u"Examples", schema=IExampleTable)
+    
+    story = schema.Object(schema=Interface, required=False)
+    
+    def scenario(index, plain=False):
+        """Return a new scenario for the example at index. If plain is
+        true, its status is not kept by the outline.
+        """
+    
+    def getScenario(name, default=None):
+        """Return a new scenario for the example with the given scenario
+        name, or default
+        """
+
 class IStory(Interface):
     """A story comprising multiple scenarios
     """
@@ -42,6 +94,11 @@ class IStory(Interface):
     priority = schema.TextLine(title=u"Priority", required=False)
     
     epic = schema.Object(schema=Interface, required=False)
+    
+    def appendOutline(outline):
+        """Append the scenarios of an IScenarioOutline. They are generated
+        each time the scenarios are read, and only their status is kept.
+        """
 
 class IEpic(Interface):
     """An epic comprising multiple stories
@@ -58,22 +115,49 @@ class IRequirementsCatalogue(Interface):
     """
     
     extractTime = schema.Datetime(title=u"Extract time")
-    testTime = schema.Datetime(title=u"Test time")
+    testTime = schema.Datetime(title=u"Test time", required=False)
     project = schema.TextLine(title=u"Project")
     epics = schema.List(title=u"Epic", value_type=schema.Object(schema=IEpic))
 
-    def populate(input):
-        """Populate from XML representation in the file-like object input
+    def populate(input, validate=False):
+        """Populate from XML representation in the file-like object or
+        file name input. Compressed files are decompressed on the fly.
+        If validate is true, raise a CatalogueValidationError listing all
+        the problems found if the result does not conform to the schema.
         """
     
     def serialize():
         """Return a serialisation of this catalogue as an lxml ElementTree
         """
     
-    def write(output):
-        """Write XML representation to the file-like object output
+    def getStory(id, default=None):
+        """Return the story with the given id, or default
+        """
+    
+    def getScenario(storyId, name, default=None):
+        """Return the scenario with the given name in the story with the
+        given id, or default
+        """
+    
+    def storiesByStatus(status):
+        """Return a list of the stories with the given requirement status
+        """
+    
+    def storiesByPriority(priority):
+        """Return a list of the stories with the given priority
+        """
+    
+    def write(output, compression=0):
+        """Write XML representation to the file-like object or file name
+        output, gzip-compressed if a compression level is given
+        """
+    
+    def query(epic=None, story=None, scenario=None, prune=False):
+        """Return a lazy view of the epics, stories and scenarios matching
+        the given predicates. See corejet.core.query.
         """
 
 # Fix schemata we can't set immediately due to circular dependencies
 IStory['epic'].schema = IEpic
 IScenario['story'].schema = IStory
+IScenarioOutline['story'].schema = IStory
@@ -0,0 +1,278 @@
+"""JSON and JSON Lines representations of requirements catalogues.
+
+The JSON form mirrors the XML one, using the same names for attributes::
+
+    {"project": "...", "extractTime": "...", "testTime": "...",
+     "epics": [
+        {"id": "E1", "title": "...", "stories": [
+            {"id": "S1", "title": "...", "points": 3,
+             "requirementStatus": "...", "requirementResolution": "...",
+             "priority": "...",
+             "givens": ["..."], "whens": ["..."], "thens": ["..."],
+             "scenarios": [
+                {"name": "...", "testStatus": "...",
+                 "givens": ["..."], "whens": ["..."], "thens": ["..."]}
+             ]}
+        ]}
+     ]}
+
+As in the XML form, attributes without a value are left out. In the JSON
+Lines form, each line is an object with a ``type``: one ``catalogue`` line
+with the catalogue attributes comes first, followed by an ``epic`` line for
+each epic, and a ``story`` line for each story, after the line for its
+epic::
+
+    {"type": "catalogue", "project": "...", "extractTime": "..."}
+    {"type": "epic", "id": "E1", "title": "..."}
+    {"type": "story", "id": "S1", "title": "...", "scenarios": [...]}
+
+``JSONLinesWriter`` and ``JSONLinesReader`` handle one story at a time, so
+large catalogues can be converted or processed in constant memory.
+"""
+
+import json
+
+import dateutil.parser
+
+from corejet.core.model import RequirementsCatalogue
+from corejet.core.model import Epic, Story, Scenario, Step
+
+def _time(value):
+    if value:
+        return dateutil.parser.parse(value)
+    return None
+
+def _steps(data, key, stepType):
+    return [Step(text, stepType) for text in data.get(key, ())]
+
+def _catalogueData(catalogue):
+    data = {}
+    if catalogue.project:
+        data['project'] = catalogue.project
+    if catalogue.extractTime:
+        data['extractTime'] = catalogue.extractTime.isoformat()
+    if catalogue.testTime:
+        data['testTime'] = catalogue.testTime.isoformat()
+    return data
+
+def _epicData(epic):
+    return {'id': epic.name, 'title': epic.title}
+
+def _scenarioData(scenario):
+    data = {'name': scenario.name}
+    if scenario.status:
+        data['testStatus'] = scenario.status
+    if scenario.givens:
+        data['givens'] = [step.text for step in scenario.givens]
+    if scenario.whens:
+        data['whens'] = [step.text for step in scenario.whens]
+    if scenario.thens:
+        data['thens'] = [step.text for step in scenario.thens]
+    return data
+
+def _storyData(story):
+    data = {'id': story.name, 'title': story.title}
+    if story.points:
+        data['points'] = story.points
+    if story.status:
+        data['requirementStatus'] = story.status
+    if story.resolution:
+        data['requirementResolution'] = story.resolution
+    if story.priority:
+        data['priority'] = story.priority
+    if story.givens:
+        data['givens'] = [step.text for step in story.givens]
+    if story.whens:
+        data['whens'] = [step.text for step in story.whens]
+    if story.thens:
+        data['thens'] = [step.text for step in story.thens]
+    if story.scenarios:
+        data['scenarios'] = [_scenarioData(scenario)
+                             for scenario in story.scenarios]
+    return data
+
+def _loadScenario(data, story):
+    return Scenario(data['name'], status=data.get('testStatus'), story=story,
+        givens=_steps(data, 'givens', 'given'),
+        whens=_steps(data, 'whens', 'when'),
+        thens=_steps(data, 'thens', 'then'),
+    )
+
+def _loadStory(data, epic):
+    points = data.get('points')
+    if points:
+        try:
+            points = int(points)
+        except (TypeError, ValueError,):
+            points = None
+    story = Story(data['id'], data.get('title'), points=points,
+        status=data.get('requirementStatus'),
+        resolution=data.get('requirementResolution'),
+        priority=data.get('priority'),
+        epic=epic,
+        givens=_steps(data, 'givens', 'given'),
+        whens=_steps(data, 'whens', 'when'),
+        thens=_steps(data, 'thens', 'then'),
+    )
+    story.scenarios = [_loadScenario(scenario, story)
+                       for scenario in data.get('scenarios', ())]
+    return story
+
+def _loadEpic(data):
+    return Epic(data['id'], data.get('title'))
+
+def _catalogue(data):
+    return RequirementsCatalogue(project=data.get('project'),
+        extractTime=_time(data.get('extractTime')),
+        testTime=_time(data.get('testTime')),
+    )
+
+def writeJSON(catalogue, output):
+    """Write ``catalogue`` as a JSON document to the file-like object
+    ``output``. Stories are encoded one at a time.
+    """
+    data = _catalogueData(catalogue)
+    output.write(json.dumps(data)[:-1])
+    if data:
+        output.write(', ')
+    output.write('"epics": [')
+    for epicIndex, epic in enumerate(catalogue.epics):
+        if epicIndex:
+            output.write(',')
+        output.write('\n' + json.dumps(_epicData(epic))[:-1] +
+                     ', "stories": [')
+        for storyIndex, story in enumerate(epic.stories):
+            if storyIndex:
+                output.write(',')
+            output.write('\n' + json.dumps(_storyData(story)))
+        output.write(']}')
+    output.write(']}\n')
+
+def readJSON(input):
+    """Return a ``RequirementsCatalogue`` read from the JSON document in
+    the file-like object ``input``
+    """
+    data = json.load(input)
+    catalogue = _catalogue(data)
+    for epicData in data.get('epics', ()):
+        epic = _loadEpic(epicData)
+        epic.stories = [_loadStory(story, epic)
+                        for story in epicData.get('stories', ())]
+        catalogue.epics.append(epic)
+    return catalogue
+
+class JSONLinesWriter(object):
+    """Writes a catalogue to the file-like object ``output`` in the JSON
+    Lines form, one line at a time. The catalogue line is written when the
+    writer is created. Call ``writeEpic()`` for each epic, followed by
+    ``writeStory()`` for each of its stories.
+    """
+
+    def __init__(self, output, project=None, extractTime=None,
+                 testTime=None):
+        self.output = output
+        data = _catalogueData(RequirementsCatalogue(project=project,
+            extractTime=extractTime, testTime=testTime))
+        data['type'] = 'catalogue'
+        self._write(data)
+
+    def _write(self, data):
+        self.output.write(json.dumps(data) + '\n')
+
+    def writeEpic(self, epic):
+        """Write an epic line. Its stories are not written.
+        """
+        data = _epicData(epic)
+        data['type'] = 'epic'
+        self._write(data)
+
+    def writeStory(self, story):
+        """Write a story line, including all its steps and scenarios
+        """
+        data = _storyData(story)
+        data['type'] = 'story'
+        self._write(data)
+
+class JSONLinesReader(object):
+    """Reads a catalogue in the JSON Lines form from the file-like object
+    ``input``. The catalogue line is read when the reader is created, and
+    its attributes are available as ``project``, ``extractTime`` and
+    ``testTime``.
+
+    Iterating over the reader yields one story at a time. Each story's
+    ``epic`` is an ``Epic`` without any stories, shared by all the stories
+    of that epic, so memory use does not grow with the catalogue.
+    """
+
+    def __init__(self, input):
+        self.input = input
+        self.project = self.extractTime = self.testTime = None
+        self._pending = None
+
+        for line in input:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if data.get('type') == 'catalogue':
+                self.project = data.get('project')
+                self.extractTime = _time(data.get('extractTime'))
+                self.testTime = _time(data.get('testTime'))
+            else:
+                self._pending = data
+            break
+
+    def _records(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            yield pending
+        for line in self.input:
+            if line.strip():
+                yield json.loads(line)
+
+    def iterItems(self):
+        """Yield each epic, with no stories, and each story, in the order
+        they appear
+        """
+        epic = None
+        for data in self._records():
+            recordType = data.get('type')
+            if recordType == 'epic':
+                epic = _loadEpic(data)
+                yield epic
+            elif recordType == 'story':
+                if epic is None:
+                    raise ValueError("Story %r before any epic" %
+                                     (data.get('id'),))
+                yield _loadStory(data, epic)
+            else:
+                raise ValueError("Unexpected line type %r" % (recordType,))
+
+    def __iter__(self):
+        for item in self.iterItems():
+            if isinstance(item, Story):
+                yield item
+
+def writeJSONLines(catalogue, output):
+    """Write ``catalogue`` to the file-like object ``output`` in the JSON
+    Lines form
+    """
+    writer = JSONLinesWriter(output, catalogue.project,
+                             catalogue.extractTime, catalogue.testTime)
+    for epic in catalogue.epics:
+        writer.writeEpic(epic)
+        for story in epic.stories:
+            writer.writeStory(story)
+
+def readJSONLines(input):
+    """Return a ``RequirementsCatalogue`` read from the JSON Lines form in
+    the file-like object ``input``
+    """
+    reader = JSONLinesReader(input)
+    catalogue = RequirementsCatalogue(project=reader.project,
+        extractTime=reader.extractTime, testTime=reader.testTime)
+    for item in reader.iterItems():
+        if isinstance(item, Epic):
+            catalogue.epics.append(item)
+        else:
+            item.epic.stories.append(item)
+    return catalogue
@@ -0,0 +1,102 @@
+"""Loading and merging several requirements catalogues.
+
+``loadCatalogues(paths)`` parses a number of catalogue files in a pool of
+worker processes and merges them into a single catalogue with
+``mergeCatalogues()``. Workers send each parsed catalogue back in the
+compact ``marshal`` format of ``corejet.core.cache``, and catalogues are
+merged in the order the paths were given as soon as they arrive, so the
+result does not depend on which worker finishes first.
+
+Merging follows a simple rule: a later catalogue wins.
+
+* Epics are matched by id. An epic keeps the position where it first
+  appeared, and takes its title from the last catalogue that has it.
+* Stories are matched by id across the whole catalogue. A story that
+  appears again replaces the earlier one, in place if it is in the same
+  epic and otherwise by moving to the end of its new epic.
+* The project name and the extract and test times are taken from the
+  last catalogue that sets them.
+"""
+
+from corejet.core.model import RequirementsCatalogue, Epic
+from corejet.core.cache import dumpCatalogue, loadCatalogue
+from corejet.core.pool import imapJobs
+
+def mergeCatalogues(catalogues, target=None):
+    """Merge the given catalogues, in order, into ``target`` and return
+    it. A new ``RequirementsCatalogue`` is created if ``target`` is not
+    given. The epics and stories of the source catalogues are moved, not
+    copied, so the sources are left empty.
+    """
+    if target is None:
+        target = RequirementsCatalogue()
+    for catalogue in catalogues:
+        _merge(target, catalogue)
+    return target
+
+def loadCatalogues(paths, processes=None, cache=None):
+    """Load the catalogue XML files at ``paths`` and merge them into a
+    single ``RequirementsCatalogue``.
+
+    Files are parsed in a pool of ``processes`` worker processes, by
+    default one per CPU. With one process, or only one file, they are
+    parsed in this process instead. If ``cache`` is a ``CatalogueCache``,
+    the workers load files through it.
+    """
+    target = RequirementsCatalogue()
+    jobs = [(path, cache,) for path in paths]
+    for catalogue in imapJobs(_load, jobs, processes,
+                              receive=(dumpCatalogue, loadCatalogue)):
+        _merge(target, catalogue)
+    return target
+
+def _load(job):
+    path, cache = job
+    if cache is not None:
+        return cache.load(path)
+    catalogue = RequirementsCatalogue()
+    catalogue.populate(path)
+    return catalogue
+
+def _merge(target, source):
+    if source.project is not None:
+        target.project = source.project
+    if source.extractTime is not None:
+        target.extractTime = source.extractTime
+    if source.testTime is not None:
+        target.testTime = source.testTime
+
+    epics = {}
+    for epic in target.epics:
+        epics.setdefault(epic.name, epic)
+
+    sourceEpics = list(source.epics)
+    source.epics = []
+
+    for sourceEpic in sourceEpics:
+        epic = epics.get(sourceEpic.name)
+        if epic is None:
+            epic = epics[sourceEpic.name] = Epic(sourceEpic.name,
+                                                 sourceEpic.title)
+            target.epics.append(epic)
+        elif sourceEpic.title is not None:
+            epic.title = sourceEpic.title
+
+        stories = list(sourceEpic.stories)
+        sourceEpic.stories = []
+
+        for story in stories:
+            story.epic = epic
+            existing = target.getStory(story.name)
+            if existing is None:
+                epic.stories.append(story)
+                continue
+            siblings = existing._parent.stories
+            for index, candidate in enumerate(siblings):
+                if candidate is existing:
+                    break
+            if existing._parent is epic:
+                siblings[index] = story
+            else:
+                del siblings[index]
+                epic.stories.append(story)
@@ -1,6 +1,20 @@
 """Basic data model
 """
 
+import re
+import gzip
+import mmap
+import hashlib
+import collections
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
 from lxml import etree
 import dateutil.parser
 
@@ -10,8 +24,505 @@ from corejet.core.interfaces import IRequirementsCatalogue
 from corejet.core.interfaces import IEpic
 from corejet.core.interfaces import IStory
 from corejet.core.interfaces import IScenario
+from corejet.core.interfaces import IScenarioOutline
+from corejet.core.interfaces import IExampleTable
 from corejet.core.interfaces import IStep
 
+def _startTag(element):
+    """Return the serialised start tag of the (empty) element
+    """
+    return etree.tostring(element)[:-2] + '>'
+
+def _catalogueElement(catalogue):
+    """Return a <requirementscatalogue /> element without any children
+    """
+    
+    catalogueElement = etree.Element("requirementscatalogue")
+    
+    if catalogue.project:
+        catalogueElement.set("project", catalogue.project)
+    if catalogue.extractTime:
+        catalogueElement.set("extractTime", catalogue.extractTime.isoformat())
+    if catalogue.testTime:
+        catalogueElement.set("testTime", catalogue.testTime.isoformat())
+    
+    return catalogueElement
+
+def _epicElement(epic):
+    """Return an <epic /> element without any children
+    """
+    
+    epicElement = etree.Element("epic")
+    
+    epicElement.set("id", epic.name)
+    epicElement.set("title", epic.title)
+    
+    return epicElement
+
+def _storyElement(story):
+    """Return a <story /> element with all its steps and scenarios
+    """
+    
+    storyElement = etree.Element("story")
+    storyElement.set("id", story.name)
+    storyElement.set("title", story.title)
+    
+    if story.points:
+        storyElement.set("points", str(story.points))
+    if story.status:
+        storyElement.set("requirementStatus", story.status)
+    if story.resolution:
+        storyElement.set("requirementResolution", story.resolution)
+    if story.priority:
+        storyElement.set("priority", story.priority)
+    
+    for given in story.givens:
+        givenElement = etree.SubElement(storyElement, "given")
+        givenElement.text = given.text
+    
+    for when in story.whens:
+        whenElement = etree.SubElement(storyElement, "when")
+        whenElement.text = when.text
+    
+    for then in story.thens:
+        thenElement = etree.SubElement(storyElement, "then")
+        thenElement.text = then.text
+    
+    for scenario in story.scenarios:
+        
+        scenarioElement = etree.SubElement(storyElement, "scenario")
+        scenarioElement.set("name", scenario.name)
+        
+        if scenario.status:
+            scenarioElement.set("testStatus", scenario.status)
+        
+        for given in scenario.givens:
+            givenElement = etree.SubElement(scenarioElement, "given")
+            givenElement.text = given.text
+        
+        for when in scenario.whens:
+            whenElement = etree.SubElement(scenarioElement, "when")
+            whenElement.text = when.text
+        
+        for then in scenario.thens:
+            thenElement = etree.SubElement(scenarioElement, "then")
+            thenElement.text = then.text
+    
+    return storyElement
+
+def _writeStream(stream, catalogueElement, epics):
+    """Write a catalogue with the given root element and epics to
+    ``stream``, one story at a time
+    """
+    
+    if not epics:
+        stream.write(etree.tostring(catalogueElement) + '\n')
+        return
+    
+    stream.write(_startTag(catalogueElement) + '\n')
+    
+    for epic in epics:
+        epicElement = _epicElement(epic)
+        
+        if not epic.stories:
+            stream.write('  ' + etree.tostring(epicElement) + '\n')
+            continue
+        
+        stream.write('  ' + _startTag(epicElement) + '\n')
+        
+        for story in epic.stories:
+            storyElement = _storyElement(story)
+            etree.indent(storyElement, level=2)
+            stream.write('    ' + etree.tostring(storyElement) + '\n')
+        
+        stream.write('  </epic>\n')
+    
+    stream.write('</requirementscatalogue>\n')
+
+def serializeCatalogue(catalogue):
+    """Return the XML representation of the catalogue, or of anything
+    with the same attributes, as an ``ElementTree``
+    """
+    
+    catalogueElement = _catalogueElement(catalogue)
+    
+    for epic in catalogue.epics:
+        epicElement = _epicElement(epic)
+        catalogueElement.append(epicElement)
+        
+        for story in epic.stories:
+            epicElement.append(_storyElement(story))
+    
+    return etree.ElementTree(catalogueElement)
+
+def writeCatalogue(catalogue, output, compression=0):
+    """Write the XML representation of the catalogue, or of anything with
+    the same attributes, to ``output``. See
+    ``RequirementsCatalogue.write()``.
+    """
+    
+    stream = output
+    if isinstance(output, basestring):
+        stream = open(output, 'wb')
+    
+    try:
+        if compression:
+            target = gzip.GzipFile(fileobj=stream, mode='wb',
+                                   compresslevel=compression)
+            try:
+                _writeStream(target, _catalogueElement(catalogue),
+                                catalogue.epics)
+            finally:
+                target.close()
+        else:
+            _writeStream(stream, _catalogueElement(catalogue),
+                            catalogue.epics)
+    finally:
+        if stream is not output:
+            stream.close()
+
+def _openInput(path):
+    """Open the catalogue file at ``path`` for parsing, decompressing it
+    on the fly if necessary
+    """
+    
+    stream = open(path, 'rb')
+    magic = stream.read(6)
+    
+    if magic.startswith('\x1f\x8b'):
+        stream.close()
+        return gzip.open(path, 'rb')
+    
+    if magic == '\xfd7zXZ\x00':
+        stream.close()
+        if lzma is None:
+            raise ValueError("Cannot read %s: xz support requires the lzma "
+                             "or backports.lzma module" % (path,))
+        return lzma.LZMAFile(path, 'rb')
+    
+    try:
+        # The map shares the operating system's page cache, so the raw
+        # document is never copied into Python memory as a whole
+        mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, EnvironmentError,):
+        # Empty files and special files cannot be mapped
+        stream.seek(0)
+        return stream
+    
+    stream.close()
+    return mapped
+
+class _NodeList(list):
+    """A list of model nodes that tells its owner about nodes being added,
+    removed or reordered, so that the owner can keep derived data such as
+    the catalogue indexes and fingerprints up to date.
+    
+    Nodes added to the list get a ``_parent`` reference to the owner.
+    Copies and pickles are plain lists: the owner wraps them again when
+    its state is restored.
+    """
+    
+    __slots__ = ('owner',)
+    
+    def __init__(self, owner, nodes=()):
+        list.__init__(self, nodes)
+        self.owner = owner
+    
+    def __reduce__(self):
+        return (list, (list(self),))
+    
+    def _added(self, nodes):
+        owner = self.owner
+        if owner is None:
+            return
+        for node in nodes:
+            node._parent = owner
+        owner._nodesAdded(self, nodes)
+    
+    def _removed(self, nodes):
+        owner = self.owner
+        if owner is None:
+            return
+        owner._nodesRemoved(self, nodes)
+        for node in nodes:
+            if node._parent is owner:
+                node._parent = None
+    
+    def append(self, node):
+        list.append(self, node)
+        self._added((node,))
+    
+    def extend(self, nodes):
+        nodes = list(nodes)
+        list.extend(self, nodes)
+        self._added(nodes)
+    
+    def __iadd__(self, nodes):
+        self.extend(nodes)
+        return self
+    
+    def insert(self, index, node):
+        list.insert(self, index, node)
+        self._added((node,))
+    
+    def remove(self, node):
+        list.remove(self, node)
+        self._removed((node,))
+    
+    def pop(self, *args):
+        node = list.pop(self, *args)
+        self._removed((node,))
+        return node
+    
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            removed = list.__getitem__(self, index)
+            value = list(value)
+            list.__setitem__(self, index, value)
+        else:
+            removed = [list.__getitem__(self, index)]
+            list.__setitem__(self, index, value)
+            value = [value]
+        self._removed(removed)
+        self._added(value)
+    
+    def __delitem__(self, index):
+        removed = list.__getitem__(self, index)
+        if not isinstance(index, slice):
+            removed = [removed]
+        list.__delitem__(self, index)
+        self._removed(removed)
+    
+    def __setslice__(self, i, j, value):
+        self.__setitem__(slice(max(i, 0), max(j, 0)), value)
+    
+    def __delslice__(self, i, j):
+        self.__delitem__(slice(max(i, 0), max(j, 0)))
+    
+    # Reordering does not change membership, so the owner is told that
+    # no nodes were added
+    
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self._added(())
+    
+    def reverse(self):
+        list.reverse(self)
+        self._added(())
+
+def _nodeListProperty(name):
+    """A property for a list of child nodes, stored as a ``_NodeList``
+    in the attribute ``_<name>``. Assigning a new list releases the
+    nodes in the old one.
+    """
+    
+    storage = '_' + name
+    
+    def get(self):
+        return getattr(self, storage)
+    
+    def set(self, value):
+        old = getattr(self, storage, None)
+        if old is not None:
+            old._removed(old)
+            old.owner = None
+        # Store the new list before telling the owner about its nodes, so
+        # that the owner can tell which of its lists changed
+        new = _NodeList(self, value or ())
+        setattr(self, storage, new)
+        new._added(new)
+    
+    return property(get, set)
+
+def _contentProperty(name, indexed=False, changed=None):
+    """A property for a node attribute which is part of the node's
+    fingerprint, stored in the attribute ``_<name>``. Setting it
+    invalidates the fingerprint. If ``indexed`` is true, the catalogue
+    indexes the attribute and the node is re-indexed when it changes. If
+    ``changed`` is given, the node's method of that name is called with the
+    old and new values after the attribute is set.
+    """
+    
+    storage = '_' + name
+    
+    def get(self):
+        return getattr(self, storage)
+    
+    if indexed:
+        def store(self, value):
+            catalogue = self._catalogue()
+            if catalogue is None:
+                setattr(self, storage, value)
+            else:
+                self._unindex(catalogue)
+                setattr(self, storage, value)
+                self._index(catalogue)
+            self._invalidate()
+    else:
+        def store(self, value):
+            setattr(self, storage, value)
+            self._invalidate()
+    
+    if changed is None:
+        set = store
+    else:
+        def set(self, value):
+            old = getattr(self, storage)
+            store(self, value)
+            getattr(self, changed)(old, value)
+    
+    return property(get, set)
+
+def _digest(*values):
+    """Return the hex SHA-1 digest of the given values. ``str`` and
+    ``unicode`` values with the same text have the same digest.
+    """
+    digest = hashlib.sha1()
+    for value in values:
+        if value is None:
+            digest.update('\x00')
+            continue
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        elif not isinstance(value, str):
+            value = repr(value)
+        digest.update('%d:' % len(value))
+        digest.update(value)
+    return digest.hexdigest()
+
+def _stepsDigest(node):
+    """Return the digest of the given, when and then steps of a story or
+    scenario
+    """
+    givens, whens, thens = node.givens, node.whens, node.thens
+    values = [len(givens), len(whens), len(thens)]
+    values.extend([step.text for step in givens])
+    values.extend([step.text for step in whens])
+    values.extend([step.text for step in thens])
+    return _digest(*values)
+
+def _clean(value):
+    """Model text may not contain double quotes, which are replaced by
+    apostrophes. This is applied to the constructor arguments only.
+    """
+    if type(value) in (str, unicode):
+        return value.replace('"', "'")
+    return value
+
+class TextPool(dict):
+    """A pool of shared text. Calling the pool with a string returns an
+    equal string, cleaned as by the node constructors, that is shared by
+    every other caller passing equal text, so that step texts and names
+    repeated throughout a catalogue are only held in memory once. A pool
+    can be passed to ``RequirementsCatalogue.populate()`` and to
+    ``corejet.core.parser.appendScenarios()`` to share text between them.
+    """
+    
+    __slots__ = ()
+    
+    def __missing__(self, text):
+        cleaned = _clean(text)
+        shared = self.get(cleaned)
+        if shared is None:
+            shared = self[cleaned] = cleaned
+        self[text] = shared
+        return shared
+    
+    # A plain dict lookup for text already in the pool
+    __call__ = dict.__getitem__
+
+def _addToIndex(index, key, node):
+    nodes = index.get(key)
+    if nodes is None:
+        index[key] = [node]
+    else:
+        nodes.append(node)
+
+def _removeFromIndex(index, key, node):
+    nodes = index.get(key)
+    if nodes is None:
+        return
+    for idx, candidate in enumerate(nodes):
+        if candidate is node:
+            del nodes[idx]
+            break
+    if not nodes:
+        del index[key]
+
+def _points(value):
+    """Story points as a number, or 0 if not set or not a number
+    """
+    if not value:
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError,):
+        return 0
+
+class Rollup(object):
+    """Aggregate statistics for a story, epic or catalogue, kept up to
+    date as scenario statuses, story points and the model's structure
+    change.
+    
+    A story is complete when it has at least one scenario and all its
+    scenarios pass. ``statuses`` maps each scenario status, including
+    ``None``, to the number of scenarios with that status. Rollups should
+    be treated as read-only.
+    """
+    
+    __slots__ = ('stories', 'completedStories', 'points', 'completedPoints',
+                 'scenarios', 'statuses',)
+    
+    def __init__(self):
+        self.stories = 0
+        self.completedStories = 0
+        self.points = 0
+        self.completedPoints = 0
+        self.scenarios = 0
+        self.statuses = {}
+    
+    def __repr__(self):
+        return "<Rollup %d/%d points, %d scenarios %r>" % (
+            self.completedPoints, self.points, self.scenarios, self.statuses,)
+    
+    def count(self, status):
+        """Return the number of scenarios with the given status
+        """
+        return self.statuses.get(status, 0)
+    
+    @property
+    def completion(self):
+        """The fraction of story points in completed stories, or of
+        completed stories if there are no points
+        """
+        if self.points:
+            return float(self.completedPoints) / self.points
+        if self.stories:
+            return float(self.completedStories) / self.stories
+        return 0.0
+    
+    @property
+    def passRate(self):
+        """The fraction of scenarios which pass
+        """
+        if not self.scenarios:
+            return 0.0
+        return float(self.statuses.get('pass', 0)) / self.scenarios
+    
+    def _add(self, other, sign=1):
+        self.stories += sign * other.stories
+        self.completedStories += sign * other.completedStories
+        self.points += sign * other.points
+        self.completedPoints += sign * other.completedPoints
+        self.scenarios += sign * other.scenarios
+        statuses = self.statuses
+        for status, count in other.statuses.iteritems():
+            count = statuses.get(status, 0) + sign * count
+            if count:
+                statuses[status] = count
+            else:
+                del statuses[status]
+
 class RequirementsCatalogue(object):
     implements(IRequirementsCatalogue)
     
@@ -22,168 +533,382 @@ class RequirementsCatalogue(object):
         epics=None,
     ):
         
+        self._fingerprint = None
+        self._rollup = Rollup()
+        
         self.extractTime = extractTime
         self.testTime = testTime
         self.project = project
-        self.epics = epics or []
+        
+        self._storiesById = {}
+        self._storiesByStatus = {}
+        self._storiesByPriority = {}
+        self._scenariosByKey = {}
+        
+        self.epics = epics
+    
+    def __getstate__(self):
+        return dict(extractTime=self.extractTime, testTime=self.testTime,
+            project=self.project, epics=self.epics)
+    
+    def __setstate__(self, state):
+        self.__init__(**state)
+    
+    project = _contentProperty('project')
+    epics = _nodeListProperty('epics')
+    
+    @property
+    def fingerprint(self):
+        """Hex digest of the project name and all epics. The extract and
+        test times are not included.
+        """
+        fingerprint = self._fingerprint
+        if fingerprint is None:
+            fingerprint = self._fingerprint = _digest(self.project,
+                *[epic.fingerprint for epic in self.epics])
+        return fingerprint
+    
+    def _invalidate(self):
+        self._fingerprint = None
+    
+    @property
+    def rollup(self):
+        """A ``Rollup`` of all stories and scenarios in the catalogue
+        """
+        return self._rollup
+    
+    def _rollupChanged(self, delta):
+        self._rollup._add(delta)
+    
+    # Indexes. Stories are indexed by id, status and priority, and
+    # scenarios by story id and name. Each index maps a key to the list of
+    # nodes with that key, normally just one.
     
-    def populate(self, input):
+    def getStory(self, id, default=None):
+        """Return the story with the given id, or ``default``
+        """
+        stories = self._storiesById.get(id)
+        if not stories:
+            return default
+        return stories[0]
+    
+    def getScenario(self, storyId, name, default=None):
+        """Return the scenario with the given name in the story with the
+        given id, or ``default``
+        """
+        scenarios = self._scenariosByKey.get((storyId, name,))
+        if not scenarios:
+            story = self.getStory(storyId)
+            if story is None:
+                return default
+            return story._outlineScenario(name, default)
+        return scenarios[0]
+    
+    def storiesByStatus(self, status):
+        """Return a list of the stories with the given requirement status
+        """
+        return list(self._storiesByStatus.get(status, ()))
+    
+    def storiesByPriority(self, priority):
+        """Return a list of the stories with the given priority
+        """
+        return list(self._storiesByPriority.get(priority, ()))
+    
+    def _catalogue(self):
+        return self
+    
+    def _nodesAdded(self, nodes, added):
+        for epic in added:
+            for story in epic.stories:
+                story._index(self)
+            self._rollup._add(epic._rollup)
+        self._invalidate()
+    
+    def _nodesRemoved(self, nodes, removed):
+        for epic in removed:
+            for story in epic.stories:
+                story._unindex(self)
+            self._rollup._add(epic._rollup, -1)
+        self._invalidate()
+    
+    def _indexStory(self, story):
+        _addToIndex(self._storiesById, story.name, story)
+        _addToIndex(self._storiesByStatus, story.status, story)
+        _addToIndex(self._storiesByPriority, story.priority, story)
+    
+    def _unindexStory(self, story):
+        _removeFromIndex(self._storiesById, story.name, story)
+        _removeFromIndex(self._storiesByStatus, story.status, story)
+        _removeFromIndex(self._storiesByPriority, story.priority, story)
+    
+    def _indexScenario(self, story, scenario):
+        _addToIndex(self._scenariosByKey, (story.name, scenario.name,), scenario)
+    
+    def _unindexScenario(self, story, scenario):
+        _removeFromIndex(self._scenariosByKey, (story.name, scenario.name,), scenario)
+    
+    def populate(self, input, validate=False, pool=None):
+        """Populate from the XML representation in ``input``, which may be
+        a file-like object or a file name. Files compressed with gzip or,
+        if the ``lzma`` or ``backports.lzma`` module is available, xz are
+        decompressed as they are read. Uncompressed files are memory
+        mapped.
+
+        The document is parsed incrementally with ``iterparse()``. Epics
+        and stories are created as their start tags arrive, and each
+        scenario and story is completed as soon as its end tag has been
+        seen. Processed elements are then discarded, so peak memory is
+        bounded by the largest single story rather than by the whole
+        document.
+        
+        Steps and scenarios are built into plain lists, without the change
+        notifications of the model, and each story is attached to its epic
+        once it is complete, so that it is indexed and rolled up once
+        rather than once per scenario and step.
+        
+        Names, step texts and other repeated text are shared through a
+        ``TextPool``: ``pool`` if given, or else one used for this call only.
+        
+        If ``validate`` is true, the catalogue is checked against the schema
+        interfaces once it has been read, and a ``CatalogueValidationError``
+        listing all the errors found is raised if it is not valid. See
+        ``corejet.core.validate``.
+        """
+        if isinstance(input, basestring):
+            stream = _openInput(input)
+            try:
+                return self.populate(stream, validate, pool)
+            finally:
+                stream.close()
+        
         self.extractTime = self.testTime = self.project = None
         self.epics = []
         
-        tree = etree.parse(input)
+        if pool is None:
+            pool = TextPool()
         
-        catalogueElement = tree.getroot()
+        epic = None
+        story = None
+        scenarios = None
         
-        extractTime = catalogueElement.get('extractTime')
-        if extractTime:
-            self.extractTime = dateutil.parser.parse(extractTime)
+        newStep = Step.__new__
+        newScenario = Scenario.__new__
         
-        testTime = catalogueElement.get('testTime')
-        if testTime:
-            self.testTime = dateutil.parser.parse(testTime)
+        def readSteps(element, owner, stepType):
+            # Cleaned by the pool, so the Step constructor is bypassed
+            steps = []
+            for stepElement in element.iterchildren(tag=stepType):
+                step = newStep(Step)
+                step._parent = owner
+                step._text = pool(stepElement.text)
+                step.step_type = stepType
+                steps.append(step)
+            return _NodeList(owner, steps)
         
-        self.project = catalogueElement.get('project', None)
-        
-        for epicElement in catalogueElement.iterchildren(tag="epic"):
-            
-            name = epicElement.get('id')
-            title = epicElement.get('title')
-            
-            epic = Epic(name, title)
-            self.epics.append(epic)
+        for event, element in etree.iterparse(input, events=('start', 'end',)):
+            tag = element.tag
+            parent = element.getparent()
+            parentTag = parent is not None and parent.tag or None
+            topLevel = parent is not None and parent.getparent() is None
             
-            for storyElement in epicElement.iterchildren(tag="story"):
-                
-                name = storyElement.get("id")
-                title = storyElement.get("title")
-                points = storyElement.get("points")
-                status = storyElement.get("requirementStatus")
-                resolution = storyElement.get("requirementResolution")
-                priority = storyElement.get("priority")
-                
-                if points:
-                    try:
-                        points = int(points)
-                    except (TypeError, ValueError,):
-                        points = None
+            if event == 'start':
                 
-                story = Story(name, title, points=points, status=status,
-                    resolution=resolution, priority=priority, epic=epic)
-                epic.stories.append(story)
-
-                for givenElement in storyElement.iterchildren(tag="given"):
-                    story.givens.append(Step(givenElement.text, 'given'))
-
-                for givenElement in storyElement.iterchildren(tag="when"):
-                    story.givens.append(Step(givenElement.text, 'when'))
-
-                for givenElement in storyElement.iterchildren(tag="then"):
-                    story.givens.append(Step(givenElement.text, 'then'))
+                if parent is None:
+                    
+                    extractTime = element.get('extractTime')
+                    if extractTime:
+                        self.extractTime = dateutil.parser.parse(extractTime)
+                    
+                    testTime = element.get('testTime')
+                    if testTime:
+                        self.testTime = dateutil.parser.parse(testTime)
+                    
+                    self.project = element.get('project', None)
                 
-                for scenarioElement in storyElement.iterchildren(tag="scenario"):
+                elif tag == 'epic' and topLevel:
                     
-                    name = scenarioElement.get("name")
-                    status = scenarioElement.get("testStatus")
+                    name = element.get('id')
+                    title = element.get('title')
                     
-                    scenario = Scenario(name, status=status, story=story)
-                    story.scenarios.append(scenario)
+                    epic = Epic(name, title)
+                    self.epics.append(epic)
+                
+                elif tag == 'story' and parentTag == 'epic' and epic is not None:
                     
-                    for givenElement in scenarioElement.iterchildren(tag="given"):
-                        scenario.givens.append(Step(givenElement.text, 'given'))
+                    name = element.get("id")
+                    title = element.get("title")
+                    points = element.get("points")
+                    status = pool(element.get("requirementStatus"))
+                    resolution = pool(element.get("requirementResolution"))
+                    priority = pool(element.get("priority"))
                     
-                    for whenElement in scenarioElement.iterchildren(tag="when"):
-                        scenario.whens.append(Step(whenElement.text, 'when'))
+                    if points:
+                        try:
+                            points = int(points)
+                        except (TypeError, ValueError,):
+                            points = None
                     
-                    for thenElement in scenarioElement.iterchildren(tag="then"):
-                        scenario.thens.append(Step(thenElement.text, 'then'))
-    
-    def serialize(self):
-        
-        catalogueElement = etree.Element("requirementscatalogue")
-        
-        if self.project:
-            catalogueElement.set("project", self.project)
-        if self.extractTime:
-            catalogueElement.set("extractTime", self.extractTime.isoformat())
-        if self.testTime:
-            catalogueElement.set("testTime", self.testTime.isoformat())
-        
-        for epic in self.epics:
-            epicElement = etree.SubElement(catalogueElement, "epic")
-            
-            epicElement.set("id", epic.name)
-            epicElement.set("title", epic.title)
+                    story = Story(name, title, points=points, status=status,
+                        resolution=resolution, priority=priority, epic=epic)
+                    scenarios = []
+                
+                continue
             
-            for story in epic.stories:
+            if tag == 'scenario' and parentTag == 'story' and story is not None:
                 
-                storyElement = etree.SubElement(epicElement, "story")
-                storyElement.set("id", story.name)
-                storyElement.set("title", story.title)
+                name = pool(element.get("name"))
+                status = pool(element.get("testStatus"))
                 
-                if story.points:
-                    storyElement.set("points", str(story.points))
-                if story.status:
-                    storyElement.set("requirementStatus", story.status)
-                if story.resolution:
-                    storyElement.set("requirementResolution", story.resolution)
-                if story.priority:
-                    storyElement.set("priority", story.priority)
+                scenario = newScenario(Scenario)
+                scenario._parent = story
+                scenario._fingerprint = None
+                scenario._name = name
+                scenario._status = status
+                scenario.story = story
+                scenario._givens = readSteps(element, scenario, 'given')
+                scenario._whens = readSteps(element, scenario, 'when')
+                scenario._thens = readSteps(element, scenario, 'then')
+                scenarios.append(scenario)
+            
+            elif tag == 'story' and parentTag == 'epic' and story is not None:
                 
-                for given in story.givens:
-                    givenElement = etree.SubElement(storyElement, "given")
-                    givenElement.text = given.text
-
-                for when in story.whens:
-                    givenElement = etree.SubElement(storyElement, "when")
-                    givenElement.text = given.text
-                    
-                for then in story.thens:
-                    givenElement = etree.SubElement(storyElement, "then")
-                    givenElement.text = given.text
-
-                for scenario in story.scenarios:
-                    
-                    scenarioElement = etree.SubElement(storyElement, "scenario")
-                    scenarioElement.set("name", scenario.name)
-                    
-                    if scenario.status:
-                        scenarioElement.set("testStatus", scenario.status)
-                    
-                    for given in scenario.givens:
-                        givenElement = etree.SubElement(scenarioElement, "given")
-                        givenElement.text = given.text
-                    
-                    for when in scenario.whens:
-                        whenElement = etree.SubElement(scenarioElement, "when")
-                        whenElement.text = when.text
-                    
-                    for then in scenario.thens:
-                        thenElement = etree.SubElement(scenarioElement, "then")
-                        thenElement.text = then.text
+                # Attach the completed story in one go
+                story._givens = readSteps(element, story, 'given')
+                story._whens = readSteps(element, story, 'when')
+                story._thens = readSteps(element, story, 'then')
+                story._scenarios = _NodeList(story, scenarios)
+                if scenarios:
+                    story._scenariosChanged(scenarios, 1)
+                epic.stories.append(story)
+                
+                story = None
+                scenarios = None
+            
+            elif tag == 'epic' and topLevel:
+                epic = None
+            
+            else:
+                continue
+            
+            # Discard what we have processed so that the tree never holds
+            # more than the story currently being read
+            element.clear()
+            parent.remove(element)
         
-        return etree.ElementTree(catalogueElement)
+        if validate:
+            from corejet.core.validate import validateCatalogue
+            from corejet.core.validate import CatalogueValidationError
+            errors = validateCatalogue(self)
+            if errors:
+                raise CatalogueValidationError(errors)
+    
+    def serialize(self):
+        return serializeCatalogue(self)
+    
+    def query(self, epic=None, story=None, scenario=None, prune=False):
+        """Return a ``CatalogueView`` of the epics, stories and scenarios
+        matching the given predicates. See ``corejet.core.query``.
+        """
+        from corejet.core.query import Query
+        return Query(epic, story, scenario, prune)(self)
         
-    def write(self, output):
-        tree = self.serialize()
-        tree.write(output, pretty_print=True)
+    def write(self, output, compression=0):
+        """Write the XML representation to ``output``, which may be a
+        file-like object or a file name. If ``compression`` is given, the
+        output is gzip-compressed at that level.
+        
+        Elements are written out incrementally: no more than one story is
+        held as an lxml tree at any time. The output is the same as
+        pretty-printing the tree returned by ``serialize()``.
+        """
+        writeCatalogue(self, output, compression)
     
 class Epic(object):
+    """An epic. Double quotes in the text passed to the constructor are
+    replaced by apostrophes.
+    """
     implements(IEpic)
     
+    __slots__ = ('_parent', '_fingerprint', '_rollup', '_name', '_title',
+                 '_stories',)
+    
     def __init__(self, name, title, stories=None):
-        self.name = name
-        self.title = title
-        self.stories = stories or []
-
-    def __setattr__(self, name, value):
-        if type(value) in (str, unicode):
-            value = value.replace('"', "'")
-        return super(Epic, self).__setattr__(name, value)
+        self._parent = None
+        self._fingerprint = None
+        self._rollup = Rollup()
+        self._name = _clean(name)
+        self._title = _clean(title)
+        self.stories = stories
+    
+    def __getstate__(self):
+        return dict(name=self.name, title=self.title, stories=self.stories)
+    
+    def __setstate__(self, state):
+        self.__init__(**state)
+    
+    name = _contentProperty('name')
+    title = _contentProperty('title')
+    stories = _nodeListProperty('stories')
+    
+    @property
+    def fingerprint(self):
+        """Hex digest of the epic's id, title and stories
+        """
+        fingerprint = self._fingerprint
+        if fingerprint is None:
+            fingerprint = self._fingerprint = _digest(self._name,
+                self._title, *[story.fingerprint for story in self._stories])
+        return fingerprint
+    
+    def _invalidate(self):
+        if self._fingerprint is not None:
+            self._fingerprint = None
+            if self._parent is not None:
+                self._parent._invalidate()
+    
+    @property
+    def rollup(self):
+        """A ``Rollup`` of the epic's stories and their scenarios
+        """
+        return self._rollup
+    
+    def _rollupChanged(self, delta):
+        self._rollup._add(delta)
+        if self._parent is not None:
+            self._parent._rollupChanged(delta)
+    
+    def _catalogue(self):
+        return self._parent
+    
+    def _nodesAdded(self, nodes, added):
+        catalogue = self._parent
+        for story in added:
+            self._rollup._add(story._rollup)
+            if catalogue is not None:
+                story._index(catalogue)
+                catalogue._rollup._add(story._rollup)
+        self._invalidate()
+    
+    def _nodesRemoved(self, nodes, removed):
+        catalogue = self._parent
+        for story in removed:
+            self._rollup._add(story._rollup, -1)
+            if catalogue is not None:
+                story._unindex(catalogue)
+                catalogue._rollup._add(story._rollup, -1)
+        self._invalidate()
 
 class Story(object):
+    """A story. Double quotes in the text passed to the constructor are
+    replaced by apostrophes.
+    """
     implements(IStory)
     
+    __slots__ = ('_parent', '_fingerprint', '_rollup', '_name', '_title',
+                 '_givens',
+                 '_whens', '_thens', '_scenarios', '_outlines', '_points',
+                 '_status', '_resolution', '_priority', 'epic',)
+    
     def __init__(self, name, title,
         givens=None,
         whens=None,
@@ -195,26 +920,328 @@ class Story(object):
         priority=None,
         epic=None,
     ):
-        self.name = name
-        self.title = title
-        self.givens = givens or []
-        self.whens = whens or []
-        self.thens = thens or []
-        self.scenarios = scenarios or []
-        self.points = points
-        self.status = status
-        self.resolution = resolution
-        self.priority = priority
+        self._parent = None
+        self._fingerprint = None
+        self._name = _clean(name)
+        self._title = _clean(title)
+        self._points = _clean(points)
+        self._status = _clean(status)
+        self._resolution = _clean(resolution)
+        self._priority = _clean(priority)
+        self._rollup = rollup = Rollup()
+        rollup.stories = 1
+        rollup.points = _points(self._points)
+        self._scenarios = None
+        self._outlines = None
+        self.givens = givens
+        self.whens = whens
+        self.thens = thens
+        self.scenarios = scenarios
         self.epic = epic
+    
+    def __getstate__(self):
+        # The scenarios of outlines are pickled as plain scenarios
+        return dict(name=self.name, title=self.title, givens=self.givens,
+            whens=self.whens, thens=self.thens,
+            scenarios=list(self.scenarios), points=self.points,
+            status=self.status, resolution=self.resolution,
+            priority=self.priority, epic=self.epic)
+    
+    def __setstate__(self, state):
+        self.__init__(**state)
+    
+    name = _contentProperty('name', indexed=True)
+    title = _contentProperty('title')
+    points = _contentProperty('points', changed='_pointsChanged')
+    status = _contentProperty('status', indexed=True)
+    resolution = _contentProperty('resolution')
+    priority = _contentProperty('priority', indexed=True)
+    givens = _nodeListProperty('givens')
+    whens = _nodeListProperty('whens')
+    thens = _nodeListProperty('thens')
+    _scenarioList = _nodeListProperty('scenarios')
+    
+    def _getScenarios(self):
+        if self._outlines:
+            return ScenarioSequence(self)
+        return self._scenarios
+    
+    def _setScenarios(self, scenarios):
+        if self._outlines:
+            if isinstance(scenarios, ScenarioSequence) and scenarios.story is self:
+                # As after ``story.scenarios += [...]``, which has already
+                # appended to the story
+                return
+            # Generate the scenarios of the outlines before detaching them
+            scenarios = list(scenarios)
+            self._detachOutlines()
+        Story._scenarioList.fset(self, scenarios)
+    
+    scenarios = property(_getScenarios, _setScenarios)
+    
+    def appendOutline(self, outline):
+        """Append the scenarios of a ``ScenarioOutline``, one per example.
+        Only the outline is kept: its scenarios are generated each time
+        they are read, and looked up by name through the outline. The
+        rollup counts them straight away. The outline should not be
+        changed once it has been appended.
+        """
+        outline.story = self
+        outline._parent = self
+        if self._outlines is None:
+            self._outlines = []
+        self._outlines.append((len(self._scenarios), outline,))
+        self._outlineChanged(outline, 1)
+        self._invalidate()
+    
+    def expandOutlines(self):
+        """Generate and store the scenarios of the story's outlines, in
+        place of the outlines, so that they can be changed like any other
+        scenario
+        """
+        if not self._outlines:
+            return
+        outlines = self._detachOutlines()
+        scenarios = self._scenarios
+        # Last first, so that earlier positions stay valid
+        for position, outline in reversed(outlines):
+            scenarios[position:position] = list(outline._generate(Scenario))
+    
+    def _detachOutlines(self):
+        outlines, self._outlines = self._outlines, None
+        for position, outline in outlines:
+            self._outlineChanged(outline, -1)
+            outline._parent = None
+        self._invalidate()
+        return outlines
+    
+    def _outlineChanged(self, outline, sign):
+        # Add or remove the scenarios of an outline from the rollup
+        count = len(outline)
+        if count:
+            delta = Rollup()
+            delta.scenarios = sign * count
+            for status, number in outline._statusCounts().items():
+                delta.statuses[status] = sign * number
+            self._updateRollup(delta)
+    
+    def _outlineScenario(self, name, default=None):
+        for position, outline in self._outlines or ():
+            scenario = outline.getScenario(name)
+            if scenario is not None:
+                return scenario
+        return default
+    
+    @property
+    def fingerprint(self):
+        """Hex digest of the story's attributes, story-level steps and
+        scenarios
+        """
+        fingerprint = self._fingerprint
+        if fingerprint is None:
+            # The scenarios of outlines are generated one at a time
+            fingerprint = self._fingerprint = _digest(self._name,
+                self._title, self._points, self._status, self._resolution,
+                self._priority, _stepsDigest(self),
+                *[scenario.fingerprint for scenario in self.scenarios])
+        return fingerprint
+    
+    def _invalidate(self):
+        if self._fingerprint is not None:
+            self._fingerprint = None
+            if self._parent is not None:
+                self._parent._invalidate()
+    
+    @property
+    def rollup(self):
+        """A ``Rollup`` of the story and its scenarios
+        """
+        return self._rollup
+    
+    def _updateRollup(self, delta):
+        # Apply ``delta``, a change in points and scenarios, recalculate
+        # completion, then pass the whole change up to the epic
+        rollup = self._rollup
+        completedStories = rollup.completedStories
+        completedPoints = rollup.completedPoints
+        rollup._add(delta)
+        complete = (rollup.scenarios > 0 and
+                    rollup.statuses.get('pass', 0) == rollup.scenarios)
+        rollup.completedStories = complete and 1 or 0
+        rollup.completedPoints = complete and rollup.points or 0
+        if self._parent is not None:
+            delta.completedStories = rollup.completedStories - completedStories
+            delta.completedPoints = rollup.completedPoints - completedPoints
+            self._parent._rollupChanged(delta)
+    
+    def _scenariosChanged(self, scenarios, sign):
+        delta = Rollup()
+        statuses = delta.statuses
+        for scenario in scenarios:
+            statuses[scenario._status] = \
+                statuses.get(scenario._status, 0) + sign
+        delta.scenarios = sign * len(scenarios)
+        self._updateRollup(delta)
+    
+    def _pointsChanged(self, old, new):
+        delta = Rollup()
+        delta.points = _points(new) - self._rollup.points
+        self._updateRollup(delta)
+    
+    def _scenarioStatusChanged(self, old, new):
+        if old == new:
+            return
+        delta = Rollup()
+        delta.statuses[old] = -1
+        delta.statuses[new] = 1
+        self._updateRollup(delta)
+    
+    def _catalogue(self):
+        epic = self._parent
+        if epic is None:
+            return None
+        return epic._catalogue()
+    
+    def _index(self, catalogue):
+        # The scenarios of outlines are not indexed: the catalogue looks
+        # them up through their outlines
+        catalogue._indexStory(self)
+        for scenario in self._scenarios:
+            catalogue._indexScenario(self, scenario)
+    
+    def _unindex(self, catalogue):
+        catalogue._unindexStory(self)
+        for scenario in self._scenarios:
+            catalogue._unindexScenario(self, scenario)
+    
+    def _nodesAdded(self, nodes, added):
+        if nodes is self._scenarios:
+            for scenario in added:
+                if type(scenario) is _ExampleScenario:
+                    # Stored scenarios no longer belong to their outline
+                    scenario._outline = None
+            catalogue = self._catalogue()
+            if catalogue is not None:
+                for scenario in added:
+                    catalogue._indexScenario(self, scenario)
+            if added:
+                self._scenariosChanged(added, 1)
+        self._invalidate()
+    
+    def _nodesRemoved(self, nodes, removed):
+        if nodes is self._scenarios:
+            catalogue = self._catalogue()
+            if catalogue is not None:
+                for scenario in removed:
+                    catalogue._unindexScenario(self, scenario)
+            if removed:
+                self._scenariosChanged(removed, -1)
+        self._invalidate()
 
-    def __setattr__(self, name, value):
-        if type(value) in (str, unicode):
-            value = value.replace('"', "'")
-        return super(Story, self).__setattr__(name, value)
+class ScenarioSequence(collections.MutableSequence):
+    """The scenarios of a story with outlines, as returned by its
+    ``scenarios``: the scenarios stored in the story, with the scenarios of
+    each outline generated in its place as they are read. Each read
+    generates new scenario objects. Only their status is kept, by their
+    outline.
+    
+    Scenarios appended to the sequence are stored after all the others.
+    Any other change first stores the scenarios of the outlines with
+    ``Story.expandOutlines()``, and then applies to those.
+    """
+    
+    __slots__ = ('story',)
+    
+    def __init__(self, story):
+        self.story = story
+    
+    def __reduce__(self):
+        return (list, (list(self),))
+    
+    def __len__(self):
+        story = self.story
+        return len(story._scenarios) + sum([len(outline)
+            for position, outline in story._outlines or ()])
+    
+    def __iter__(self):
+        story = self.story
+        stored = story._scenarios
+        start = 0
+        for position, outline in story._outlines or ():
+            for index in xrange(start, position):
+                yield stored[index]
+            start = position
+            for scenario in outline:
+                yield scenario
+        for index in xrange(start, len(stored)):
+            yield stored[index]
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError(index)
+        story = self.story
+        generated = 0
+        for position, outline in story._outlines or ():
+            if index < position + generated:
+                break
+            count = len(outline)
+            if index < position + generated + count:
+                return outline.scenario(index - position - generated)
+            generated += count
+        return story._scenarios[index - generated]
+    
+    def __eq__(self, other):
+        if isinstance(other, (list, ScenarioSequence,)):
+            return list(self) == list(other)
+        return NotImplemented
+    
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+    
+    def __repr__(self):
+        return repr(list(self))
+    
+    def append(self, scenario):
+        self.story._scenarios.append(scenario)
+    
+    def extend(self, scenarios):
+        self.story._scenarios.extend(scenarios)
+    
+    def _expanded(self):
+        self.story.expandOutlines()
+        return self.story._scenarios
+    
+    def __setitem__(self, index, value):
+        self._expanded()[index] = value
+    
+    def __delitem__(self, index):
+        del self._expanded()[index]
+    
+    def insert(self, index, scenario):
+        self._expanded().insert(index, scenario)
+    
+    def sort(self, *args, **kwargs):
+        self._expanded().sort(*args, **kwargs)
+    
+    def reverse(self):
+        self._expanded().reverse()
 
 class Scenario(object):
+    """A scenario. Double quotes in the text passed to the constructor are
+    replaced by apostrophes.
+    """
     implements(IScenario)
     
+    __slots__ = ('_parent', '_fingerprint', '_name', '_givens', '_whens',
+                 '_thens', '_status', 'story',)
+    
     def __init__(self, name,
         givens=None,
         whens=None,
@@ -222,26 +1249,376 @@ class Scenario(object):
         status=None,
         story=None,
     ):
-        self.name = name
-        self.givens = givens or []
-        self.whens = whens or []
-        self.thens = thens or []
-        self.status = status
+        self._parent = None
+        self._fingerprint = None
+        self._name = _clean(name)
+        self._status = _clean(status)
+        self.givens = givens
+        self.whens = whens
+        self.thens = thens
         self.story = story
+    
+    def __getstate__(self):
+        return dict(name=self.name, givens=self.givens, whens=self.whens,
+            thens=self.thens, status=self.status, story=self.story)
+    
+    def __setstate__(self, state):
+        self.__init__(**state)
+    
+    name = _contentProperty('name', indexed=True)
+    status = _contentProperty('status', changed='_statusChanged')
+    givens = _nodeListProperty('givens')
+    whens = _nodeListProperty('whens')
+    thens = _nodeListProperty('thens')
+    
+    @property
+    def fingerprint(self):
+        """Hex digest of the scenario's name, status and steps
+        """
+        fingerprint = self._fingerprint
+        if fingerprint is None:
+            fingerprint = self._fingerprint = _digest(self._name,
+                self._status, _stepsDigest(self))
+        return fingerprint
+    
+    def _invalidate(self):
+        if self._fingerprint is not None:
+            self._fingerprint = None
+            if self._parent is not None:
+                self._parent._invalidate()
+    
+    def _catalogue(self):
+        story = self._parent
+        if story is None:
+            return None
+        return story._catalogue()
+    
+    def _index(self, catalogue):
+        catalogue._indexScenario(self._parent, self)
+    
+    def _unindex(self, catalogue):
+        catalogue._unindexScenario(self._parent, self)
+    
+    def _statusChanged(self, old, new):
+        if self._parent is not None:
+            self._parent._scenarioStatusChanged(old, new)
+    
+    def _nodesAdded(self, nodes, added):
+        self._invalidate()
+    
+    def _nodesRemoved(self, nodes, removed):
+        self._invalidate()
 
-    def __setattr__(self, name, value):
-        if type(value) in (str, unicode):
-            value = value.replace('"', "'")
-        return super(Scenario, self).__setattr__(name, value)
+class _ExampleScenario(Scenario):
+    """A scenario generated from an example of an outline. Its outline
+    keeps its status, so that the status is not lost when the scenario
+    is generated again. Once the scenario is stored in a story, it has no
+    outline, and is like any other scenario.
+    """
+    
+    __slots__ = ('_outline', '_example',)
+    
+    def __reduce__(self):
+        return (Scenario, (self._name,), self.__getstate__())
+    
+    def _invalidate(self):
+        # The scenario is new, so its story's fingerprint may already
+        # include it even though its own has not been computed
+        self._fingerprint = None
+        if self._parent is not None:
+            self._parent._invalidate()
+    
+    def _index(self, catalogue):
+        if self._outline is None:
+            Scenario._index(self, catalogue)
+    
+    def _unindex(self, catalogue):
+        if self._outline is None:
+            Scenario._unindex(self, catalogue)
+    
+    def _statusChanged(self, old, new):
+        outline = self._outline
+        if outline is None:
+            Scenario._statusChanged(self, old, new)
+            return
+        outline._setStatus(self._example, new)
+        # The story only counts the outline's scenarios while it has the
+        # outline
+        if self._parent is not None and outline._parent is self._parent:
+            self._parent._scenarioStatusChanged(old, new)
+
+class ExampleTable(object):
+    """The examples of a scenario outline. Values are stored by column,
+    one list per column, rather than as a scenario per row.
+    """
+    implements(IExampleTable)
+    
+    __slots__ = ('columns', '_values', '_length',)
+    
+    def __init__(self, columns, rows=()):
+        self.columns = list(columns)
+        self._values = [[] for column in self.columns]
+        self._length = 0
+        for row in rows:
+            self.append(row)
+    
+    def __len__(self):
+        return self._length
+    
+    def __iter__(self):
+        for index in xrange(self._length):
+            yield self.row(index)
+    
+    def append(self, row):
+        if len(row) != len(self.columns):
+            raise ValueError("Expected %d values, got %d" %
+                             (len(self.columns), len(row),))
+        for values, value in zip(self._values, row):
+            values.append(value)
+        self._length += 1
+    
+    def addColumn(self, name):
+        """Return the index of the named column, adding it if necessary.
+        Existing rows have no value (None) for a new column.
+        """
+        if name in self.columns:
+            return self.columns.index(name)
+        self.columns.append(name)
+        self._values.append([None] * self._length)
+        return len(self.columns) - 1
+    
+    def row(self, index):
+        return tuple([values[index] for values in self._values])
+    
+    def column(self, name):
+        return self._values[self.columns.index(name)]
+    
+    def mapping(self, index):
+        """Return a dict of column names to the values of the row at index,
+        leaving out columns without a value
+        """
+        return dict([(name, values[index],)
+                     for name, values in zip(self.columns, self._values)
+                     if values[index] is not None])
+
+class _Template(object):
+    """An outline step text compiled for a table's columns: the literal
+    parts of the text, and between each pair of them the index of the
+    column whose value replaces the placeholder there
+    """
+    
+    __slots__ = ('parts', 'columns', 'placeholders',)
+    
+    def __init__(self, parts, columns, placeholders):
+        self.parts = parts
+        self.columns = columns
+        self.placeholders = placeholders
+    
+    def render(self, values, index):
+        """Return the text for row ``index`` of the table's column lists
+        ``values``. Placeholders for columns without a value are kept.
+        """
+        parts = self.parts
+        pieces = [parts[0]]
+        for column, placeholder, part in zip(self.columns,
+                                             self.placeholders, parts[1:]):
+            value = values[column][index]
+            if value is None:
+                value = placeholder
+            pieces.append(value)
+            pieces.append(part)
+        return u''.join(pieces)
+
+def _compileTemplate(text, columns, placeholder):
+    """Split ``text`` at the placeholders matched by the regex
+    ``placeholder``, which captures the column name, and return a
+    ``_Template``, or the text itself if it has no placeholders
+    """
+    if placeholder is None:
+        return text
+    pieces = placeholder.split(text)
+    if len(pieces) == 1:
+        return text
+    names = pieces[1::2]
+    return _Template(pieces[0::2], [columns.index(name) for name in names],
+                     [u"<%s>" % name for name in names])
+
+class ScenarioOutline(object):
+    """A scenario outline. Its template steps are stored once, and its
+    examples in an ``ExampleTable``. The outline is a sequence of concrete
+    scenarios named ``<name> #01``, ``<name> #02`` and so on, one per
+    example, which are generated each time they are accessed.
+    
+    To generate scenarios, each template step is split once into literal
+    parts and placeholders for the columns of the table, and each example
+    is rendered by joining the parts with its values. A placeholder is
+    replaced by the value in the example only, never by text that another
+    value substituted. Double quotes in the name passed to the constructor
+    are replaced by apostrophes.
+    
+    The status of each generated scenario is kept by the outline, and
+    given to the scenario whenever it is generated again.
+    """
+    implements(IScenarioOutline)
+    
+    __slots__ = ('_parent', '_statuses', '_templates', 'name', 'givens',
+                 'whens', 'thens', 'examples', 'story',)
+    
+    def __init__(self, name,
+        givens=None,
+        whens=None,
+        thens=None,
+        examples=None,
+        story=None,
+    ):
+        # The story the outline has been appended to, if any
+        self._parent = None
+        # Status by example index, for examples with a status
+        self._statuses = {}
+        # The compiled template steps and what they were compiled from
+        self._templates = None
+        self.name = _clean(name)
+        self.givens = list(givens or ())
+        self.whens = list(whens or ())
+        self.thens = list(thens or ())
+        if examples is None:
+            examples = ExampleTable(())
+        self.examples = examples
+        self.story = story
+    
+    def __len__(self):
+        return len(self.examples)
+    
+    def __iter__(self):
+        return self._generate(_ExampleScenario)
+    
+    def _generate(self, factory):
+        templates = self._compiled()
+        for index in xrange(len(self.examples)):
+            yield self._render(templates, index, factory)
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.examples)
+        if not 0 <= index < len(self.examples):
+            raise IndexError(index)
+        return self.scenario(index)
+    
+    def _compiled(self):
+        # Return the compiled template steps, compiling them again only if
+        # a column was added or the steps have changed since
+        key = (self.examples, len(self.examples.columns),
+               tuple([step.text for step in self.givens]),
+               tuple([step.text for step in self.whens]),
+               tuple([step.text for step in self.thens]),)
+        if self._templates is None or self._templates[0] != key:
+            self._templates = (key, self._compile(),)
+        return self._templates[1]
+    
+    def _compile(self):
+        # Return the template steps as (template, previousStep) pairs, with
+        # each text split at the placeholders of the example columns
+        columns = self.examples.columns
+        placeholder = None
+        if columns:
+            placeholder = re.compile(u"<(%s)>" % u"|".join(
+                [re.escape(name) for name in columns]))
+        # Steps are typed by the preceding step, as when they are parsed
+        templates = []
+        previousStep = None
+        for steps, stepType in (
+            (self.givens, 'given',),
+            (self.whens, 'when',),
+            (self.thens, 'then',),
+        ):
+            for step in steps:
+                templates.append((stepType, _compileTemplate(step.text,
+                                  columns, placeholder), previousStep,))
+                previousStep = stepType
+        return templates
+    
+    def _render(self, templates, index, factory=None):
+        values = self.examples._values
+        steps = {'given': [], 'when': [], 'then': []}
+        for stepType, template, previousStep in templates:
+            if isinstance(template, _Template):
+                text = template.render(values, index)
+            else:
+                text = template
+            steps[stepType].append(Step(text, previousStep))
+        scenario = (factory or _ExampleScenario)(
+            u"%s #%02d" % (self.name, index + 1),
+            givens=steps['given'], whens=steps['when'], thens=steps['then'],
+            status=self._statuses.get(index), story=self.story)
+        if isinstance(scenario, _ExampleScenario):
+            scenario._outline = self
+            scenario._example = index
+            scenario._parent = self._parent
+        return scenario
+    
+    def _setStatus(self, index, status):
+        if status is None:
+            self._statuses.pop(index, None)
+        else:
+            self._statuses[index] = status
+    
+    def _statusCounts(self):
+        # The number of examples with each status
+        counts = {None: len(self.examples) - len(self._statuses)}
+        for status in self._statuses.itervalues():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+    
+    def scenario(self, index, plain=False):
+        if plain:
+            return self._render(self._compiled(), index, Scenario)
+        return self._render(self._compiled(), index)
+    
+    def getScenario(self, name, default=None):
+        prefix, separator, number = name.rpartition(u" #")
+        if prefix != self.name or not number.isdigit():
+            return default
+        index = int(number) - 1
+        if (not 0 <= index < len(self.examples) or
+            u"%02d" % (index + 1) != number
+        ):
+            return default
+        return self.scenario(index)
 
 class Step(object):
+    """A step. Double quotes in the text passed to the constructor are
+    replaced by apostrophes.
+    
+    Steps do not cache their fingerprint: their parent's fingerprint is
+    computed from the step text directly.
+    """
     implements(IStep)
     
+    __slots__ = ('_parent', '_text', 'step_type',)
+    
     def __init__(self, text, step_type):
-        self.text = text
+        self._parent = None
+        self._text = _clean(text)
         self.step_type = step_type
-
-    def __setattr__(self, name, value):
-        if type(value) in (str, unicode):
-            value = value.replace('"', "'")
-        return super(Step, self).__setattr__(name, value)
+    
+    def __getstate__(self):
+        return dict(text=self.text, step_type=self.step_type)
+    
+    def __setstate__(self, state):
+        self.__init__(**state)
+    
+    def _getText(self):
+        return self._text
+    
+    def _setText(self, value):
+        self._text = value
+        if self._parent is not None:
+            self._parent._invalidate()
+    
+    text = property(_getText, _setText)
+    
+    @property
+    def fingerprint(self):
+        """Hex digest of the step text
+        """
+        return _digest(self._text)
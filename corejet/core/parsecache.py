@@ -0,0 +1,192 @@
+"""Content-addressed cache of parsed acceptance criteria.
+
+A catalogue source that fetches acceptance criteria from a requirements
+management system on every run parses the same, rarely changed, text each
+time. A ``ParseCache`` keeps the result of parsing each text, keyed by a
+hash of the text, its default language and the parser version, in memory
+and optionally on disk, and appends it to stories without parsing again.
+"""
+
+import os
+import sys
+import marshal
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+from corejet.core import cache
+from corejet.core.cache import dumpScenario, loadScenario
+from corejet.core.cache import dumpSteps, loadSteps
+from corejet.core.model import ScenarioOutline, ExampleTable
+from corejet.core.parser import PARSER_VERSION, Criteria, parseCriteria
+
+# Bump whenever the tuple layout below changes
+FORMAT_VERSION = 1
+
+def _dumpOutline(outline):
+    examples = outline.examples
+    return (outline.name,
+            dumpSteps(outline.givens, 'given'),
+            dumpSteps(outline.whens, 'when'),
+            dumpSteps(outline.thens, 'then'),
+            tuple(examples.columns),
+            tuple([tuple(examples.column(name))
+                   for name in examples.columns]),)
+
+def _loadOutline(data, story, pool):
+    name, givens, whens, thens, columns, values = data
+    if pool is not None:
+        name = pool(name)
+    examples = ExampleTable(columns)
+    # Restore the columns as they were stored rather than row by row
+    examples._values = [list(column) for column in values]
+    examples._length = values and len(values[0]) or 0
+    return ScenarioOutline(name, story=story, examples=examples,
+        givens=loadSteps(givens, 'given', pool),
+        whens=loadSteps(whens, 'when', pool),
+        thens=loadSteps(thens, 'then', pool),
+    )
+
+def dumpCriteria(text, default_language='en'):
+    """Parse the acceptance criteria in 'text' and return the story-level
+    steps and the scenarios and outlines as nested tuples of primitive
+    values
+    """
+    return dumpParsedCriteria(parseCriteria(text, default_language))
+
+def dumpParsedCriteria(criteria):
+    """Return the given ``corejet.core.parser.Criteria`` as nested tuples
+    of primitive values, as ``dumpCriteria()`` does
+    """
+    items = []
+    for item in criteria.items:
+        if isinstance(item, ScenarioOutline):
+            items.append((True, _dumpOutline(item),))
+        else:
+            items.append((False, dumpScenario(item),))
+    return (dumpSteps(criteria.givens, 'given'),
+            dumpSteps(criteria.whens, 'when'),
+            dumpSteps(criteria.thens, 'then'),
+            tuple(items),)
+
+def loadCriteria(story, data, pool=None):
+    """Append the steps, scenarios and outlines in the output of
+    ``dumpCriteria()`` to the given IStory, like
+    ``corejet.core.parser.appendScenarios()``
+    """
+    loadParsedCriteria(data, pool).appendTo(story)
+
+def loadParsedCriteria(data, pool=None):
+    """Build ``corejet.core.parser.Criteria`` from the output of
+    ``dumpCriteria()``, sharing names and step texts through ``pool`` if
+    given
+    """
+    givens, whens, thens, items = data
+    return Criteria(
+        givens=loadSteps(givens, 'given', pool),
+        whens=loadSteps(whens, 'when', pool),
+        thens=loadSteps(thens, 'then', pool),
+        items=[_loadOutline(item, None, pool) if isOutline else
+               loadScenario(item, None, pool)
+               for isOutline, item in items],
+    )
+
+class ParseCache(object):
+    """Parses acceptance criteria with ``corejet.core.parser``, keeping the
+    result for each distinct text in memory and, if ``directory`` is
+    given, on disk.
+
+    At most ``size`` results are kept in memory, discarding the least
+    recently used first. The cache may be shared between threads, and a
+    directory between processes. Results on disk are never expired: remove
+    the directory to reclaim the space. Languages added or changed after a
+    text was cached are not taken into account.
+    """
+
+    def __init__(self, directory=None, size=1024):
+        self.directory = directory
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def appendScenarios(self, story, text, default_language='en', pool=None):
+        """Append the story-level steps and the scenarios parsed from 'text'
+        to the given IStory, like ``corejet.core.parser.appendScenarios()``,
+        parsing only if the text has not been seen before
+        """
+        loadCriteria(story, self.parse(text, default_language), pool)
+
+    def parse(self, text, default_language='en'):
+        """Return the result of ``dumpCriteria()`` for the given text, from
+        the cache if possible
+        """
+        key = self._key(text, default_language)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                # Move to the most recently used end
+                self._entries[key] = entry
+                self.hits += 1
+                return entry
+
+        # Parse outside the lock, so that threads parsing different texts
+        # do not wait for each other
+        entry = hit = self._read(key)
+        if entry is None:
+            entry = dumpCriteria(text, default_language)
+            self._write(key, entry)
+
+        with self._lock:
+            if hit is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._entries[key] = entry
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        """Discard the results held in memory
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _key(self, text, default_language):
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        digest = hashlib.sha1('%s\0%s\0' % (PARSER_VERSION, default_language,))
+        digest.update(text)
+        return digest.hexdigest()
+
+    def _header(self):
+        # marshal's format is only stable for a given Python version
+        return (FORMAT_VERSION, cache.FORMAT_VERSION, marshal.version,
+                sys.version_info[:2],)
+
+    def _cachePath(self, key):
+        return os.path.join(self.directory, key + '.parse')
+
+    def _read(self, key):
+        if self.directory is None:
+            return None
+        cachePath = self._cachePath(key)
+        if not os.path.exists(cachePath):
+            return None
+        try:
+            with open(cachePath, 'rb') as f:
+                if marshal.load(f) != self._header():
+                    return None
+                return marshal.load(f)
+        except (EOFError, ValueError, TypeError,):
+            # Truncated or otherwise unreadable: treat as a miss
+            return None
+
+    def _write(self, key, entry):
+        if self.directory is None:
+            return
+        cache.writeRecords(self.directory, self._cachePath(key),
+                           (self._header(), entry,))
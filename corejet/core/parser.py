@@ -4,40 +4,229 @@ import gettext
 DOMAIN = 'gherkin'
 LOCALEDIR = os.path.dirname(__file__) + '/locales'
 
+# Other packages can provide languages with an entry point in this group,
+# named by the language code and pointing to a locale directory which
+# contains <language>/LC_MESSAGES/gherkin.mo
+ENTRY_POINT_GROUP = 'corejet.core.locales'
+
+# Bump whenever the scenarios or steps parsed from the same text change, so
+# that parse caches keyed by it are invalidated
+PARSER_VERSION = 1
+
 gettext.bindtextdomain(DOMAIN, LOCALEDIR)
 gettext.textdomain(DOMAIN)
 _ = lambda x: x  # dummy func for translatable strings; we translate manually
 
 import re
+import threading
+
+from corejet.core.model import Scenario, ScenarioOutline, Step
+from corejet.core.pool import imapJobs
+
+class LocaleRegistry(object):
+    """The translations of the Gherkin keywords and patterns, by language
+    code. Catalogues are only looked up, and loaded, when a language is
+    first used: from the locale directories given, then from the locale
+    directories registered with register(), and then from entry points in
+    ENTRY_POINT_GROUP. Languages that are not found are remembered as such.
+
+    English needs no catalogue: if none is found, the untranslated
+    keywords and patterns are used.
+
+    The registry also caches the compiled Classifier for each language.
+
+    A registry may be used from several threads at once. Its tables are
+    never changed once published: loading a language or registering a
+    catalogue replaces them with updated copies while holding a lock, so
+    looking up a language that has already been loaded takes no lock.
+    """
+
+    def __init__(self, localeDirs=(LOCALEDIR,), entryPointGroup=ENTRY_POINT_GROUP):
+        self._localeDirs = list(localeDirs)
+        self._registered = {}
+        self._entryPointGroup = entryPointGroup
+        self._translations = {}
+        self._classifiers = {}
+        # Reentrant, because compiling a Classifier looks up translations
+        self._lock = threading.RLock()
+
+    def register(self, language, localeDir):
+        """Use the catalogue for the language in the given locale directory,
+        replacing any loaded before
+        """
+        with self._lock:
+            self._registered = _updated(self._registered, language, localeDir)
+            self._translations = _updated(self._translations, language)
+            self._classifiers = _updated(self._classifiers, language)
+
+    def _load(self, language):
+        localeDirs = list(self._localeDirs)
+        if language in self._registered:
+            localeDirs.insert(0, self._registered[language])
+        for localeDir in localeDirs:
+            translation = self._loadFrom(localeDir, language)
+            if translation is not None:
+                return translation
+
+        if self._entryPointGroup:
+            for localeDir in self._entryPoints(language):
+                translation = self._loadFrom(localeDir, language)
+                if translation is not None:
+                    return translation
+
+        if language == 'en':
+            return gettext.NullTranslations()
+        return None
+
+    def _loadFrom(self, localeDir, language):
+        path = os.path.join(localeDir, language, 'LC_MESSAGES', DOMAIN + '.mo')
+        if not os.path.isfile(path):
+            return None
+        fp = open(path, 'rb')
+        try:
+            return gettext.GNUTranslations(fp)
+        finally:
+            fp.close()
+
+    def _entryPoints(self, language):
+        try:
+            import pkg_resources
+        except ImportError:
+            return
+        for entryPoint in pkg_resources.iter_entry_points(
+            self._entryPointGroup, language
+        ):
+            yield entryPoint.load()
+
+    def get(self, language, default=None):
+        """Return the gettext translations for the language, or default
+        """
+        try:
+            translation = self._translations[language]
+        except KeyError:
+            with self._lock:
+                # Another thread may have loaded it in the meantime
+                try:
+                    translation = self._translations[language]
+                except KeyError:
+                    translation = self._load(language)
+                    self._translations = _updated(self._translations,
+                                                  language, translation)
+        if translation is None:
+            return default
+        return translation
 
-from corejet.core.model import Scenario, Step
+    def __getitem__(self, language):
+        translation = self.get(language)
+        if translation is None:
+            raise KeyError(language)
+        return translation
+
+    def __contains__(self, language):
+        return self.get(language) is not None
+
+    def classifier(self, language='en'):
+        """Return the Classifier for the language, or for English if the
+        language is not known. Classifiers are compiled on first use.
+        """
+        classifier = self._classifiers.get(language)
+        if classifier is not None:
+            return classifier
+        with self._lock:
+            classifier = self._classifiers.get(language)
+            if classifier is None:
+                if language not in self:
+                    return self.classifier('en')
+                classifier = Classifier(language, self)
+                self._classifiers = _updated(self._classifiers, language,
+                                             classifier)
+        return classifier
+
+    def languages(self):
+        """Return the codes of all available languages, without loading
+        their catalogues
+        """
+        languages = set(['en'])
+        languages.update(self._registered)
+        for localeDir in self._localeDirs:
+            if not os.path.isdir(localeDir):
+                continue
+            for language in os.listdir(localeDir):
+                if os.path.isfile(os.path.join(
+                    localeDir, language, 'LC_MESSAGES', DOMAIN + '.mo')
+                ):
+                    languages.add(language)
+        if self._entryPointGroup:
+            try:
+                import pkg_resources
+            except ImportError:
+                pass
+            else:
+                for entryPoint in pkg_resources.iter_entry_points(
+                    self._entryPointGroup
+                ):
+                    languages.add(entryPoint.name)
+        return sorted(languages)
+
+def _updated(table, key, *value):
+    # A copy of the dict with key set to value, or removed if no value is
+    # given, for tables that are replaced rather than changed in place
+    table = dict(table)
+    if value:
+        table[key] = value[0]
+    else:
+        table.pop(key, None)
+    return table
+
+locales = LocaleRegistry()
 
 class RegEx(object):
 
-    translations = {
-        'en': gettext.translation(DOMAIN, LOCALEDIR, languages=['en']),
-        'fi': gettext.translation(DOMAIN, LOCALEDIR, languages=['fi']),
-        }
+    translations = locales
+
+    # Guards replacing the compiled expressions of any RegEx
+    _lock = threading.Lock()
 
     def __init__(self, pattern, keyword):
         self._expressions = {}
         self._pattern = pattern
         self._keyword = keyword
 
+    def pattern(self, language='en', translations=None):
+        """Return the regular expression source for the given language,
+        translated with the given LocaleRegistry, by default the
+        module's locales
+        """
+        if translations is None:
+            translations = self.translations
+        return self._source(translations.get(language) or translations['en'])
+
+    def _source(self, translation):
+        keyword = translation.ugettext(self._keyword)
+        pattern = translation.ugettext(self._pattern)
+        try:
+            return pattern.format(keyword=keyword)
+        except AttributeError:
+            # 'str' object has no attribute 'format' in Python < 2.6
+            return pattern.replace("{keyword}", keyword)
+
     def match(self, line, language='en'):
-        if language not in self.translations:
-            language = 'en'
-        if language not in self._expressions:
-            keyword = self.translations[language].ugettext(self._keyword)
-            pattern = self.translations[language].ugettext(self._pattern)
-            try:
-                self._expressions[language] =\
-                    re.compile(pattern.format(keyword=keyword), re.I)
-            except AttributeError:
-                # 'str' object has no attribute 'format' in Python < 2.6
-                self._expressions[language] =\
-                    re.compile(pattern.replace("{keyword}", keyword), re.I)
-        return self._expressions[language].match(line)
+        translation = self.translations.get(language)
+        if translation is None:
+            language, translation = 'en', self.translations['en']
+        # Each expression is kept with the translation it was compiled
+        # from, so that registering a new catalogue for a language takes
+        # effect
+        entry = self._expressions.get(language)
+        if entry is None or entry[0] is not translation:
+            with self._lock:
+                entry = self._expressions.get(language)
+                if entry is None or entry[0] is not translation:
+                    entry = (translation,
+                             re.compile(self._source(translation), re.I),)
+                    self._expressions = _updated(self._expressions,
+                                                 language, entry)
+        return entry[1].match(line)
 
 language_regex = re.compile(r'^#\s+language:\s+(\w{0,2})\s*', re.I)
 scenario_regex = RegEx(_(r'^\s*{keyword}(?: \d+)?: (.+)'), _('Scenario'))
@@ -50,156 +239,322 @@ then_regex = RegEx(_(r'^\s*{keyword} (.+)'), _('Then'))
 and_regex = RegEx(_(r'^\s*{keyword} (.+)'), _('And'))
 but_regex = RegEx(_(r'^\s*{keyword} (.+)'), _('But'))
 
-def appendScenarios(story, text, default_language='en'):
-    """Parse the acceptance criteria in the string 'text' and append the
-    relevant scenarios to the given IStory.
+# Line types, in the order they are tried. 'but' lines are reported as
+# 'and'.
+LINE_TYPES = (
+    ('scenario', scenario_regex,),
+    ('outline', outline_regex,),
+    ('examples', examples_regex,),
+    ('given', given_regex,),
+    ('when', when_regex,),
+    ('then', then_regex,),
+    ('and', and_regex,),
+    ('and', but_regex,),
+)
+
+class Classifier(object):
+    """Identifies the type of a line of acceptance criteria in one
+    language, and captures its text, with a single regular expression
+    match. The expression is an alternation of the language regex and the
+    patterns in LINE_TYPES, in that order, so the first alternative that
+    matches wins, just as if they were tried one by one. A Classifier is
+    not changed once it has been compiled, so threads can share it.
     """
 
-    language = default_language
-    scenarios = []
+    def __init__(self, language='en', translations=None):
+        alternatives = [(u'language', language_regex.pattern,)]
+        for lineType, regex in LINE_TYPES:
+            alternatives.append((lineType,
+                                 regex.pattern(language, translations),))
+
+        parts = []
+        self._groups = {}
+        group = 1
+        for lineType, pattern in alternatives:
+            groups = re.compile(pattern).groups
+            # The group wrapping the alternative is the last to close, so
+            # it is the match's lastindex; its text is in the first group
+            # within it, if any
+            self._groups[group] = (lineType, groups and group + 1 or None,)
+            parts.append(u'(%s)' % pattern)
+            group += 1 + groups
+        self._match = re.compile(u'|'.join(parts), re.I).match
+
+    def classify(self, line):
+        """Return a tuple (lineType, text) for the line, where lineType is
+        one of 'language', 'scenario', 'outline', 'examples', 'given',
+        'when', 'then' or 'and', or (None, None) for any other line.
+        """
+        match = self._match(line)
+        if match is None:
+            return None, None
+        lineType, group = self._groups[match.lastindex]
+        if group is None:
+            return lineType, None
+        return lineType, match.group(group)
+
+def getClassifier(language='en'):
+    """Return the Classifier for the given language, or for English if the
+    language is not known
+    """
+    return locales.classifier(language)
+
+def _unshared(text):
+    return text
+
+def iterScenarios(story, lines, default_language='en', pool=None,
+                  outlines=False):
+    """Parse the acceptance criteria in 'lines', which may be a string or
+    any iterable of lines, such as a file object, and yield the scenarios
+    of the given IStory one by one, as soon as each is complete. Scenarios
+    are created with their story set, but are not appended to it; steps
+    that come before the first scenario are appended to the story as they
+    are read. If a TextPool is given as 'pool', scenario names and step
+    texts are shared through it.
+
+    Each example of a scenario outline is yielded as a scenario as soon as
+    its row has been read. If 'outlines' is true, the ScenarioOutline is
+    yielded instead, once all its examples have been read, and no
+    scenarios are generated for them.
+    """
+
+    if isinstance(lines, basestring):
+        lines = lines.splitlines()
+
+    share = pool
+    if share is None:
+        share = _unshared
+
+    classify = getClassifier(default_language).classify
     scenario = None
     outline = None
     outline_variables = None
-    outline_examples = 0
     previousStep = None
 
-    for line in text.splitlines():
+    for line in lines:
 
-        languageMatch = language_regex.match(line)
-        if languageMatch:
-            language = languageMatch.group(1)
+        line = line.rstrip('\r\n')
+        lineType, lineText = classify(line)
 
-        scenarioMatch = scenario_regex.match(line, language)
-        if scenarioMatch:
-            scenario = Scenario(scenarioMatch.group(1), story=story)
+        if lineType == 'language':
+            classify = getClassifier(lineText).classify
+            lineType = None
+
+        if lineType == 'scenario':
+            if scenario is not None:
+                yield scenario
+            if outline is not None and outlines:
+                yield outline
+            scenario = Scenario(share(lineText), story=story)
             outline = None
             outline_variables = None
-            outline_examples = 0
             previousStep = None
-            scenarios.append(scenario)
             continue
 
-        outlineMatch = outline_regex.match(line, language)
-        if outlineMatch:
+        if lineType == 'outline':
+            if scenario is not None:
+                yield scenario
+            if outline is not None and outlines:
+                yield outline
             scenario = None
-            outline = Scenario(outlineMatch.group(1))
+            outline = ScenarioOutline(share(lineText), story=story)
             outline_variables = None
-            outline_examples = 0
             previousStep = None
             continue
 
-        examplesMatch = examples_regex.match(line, language)
-        if outline and examplesMatch:
+        if outline is not None and lineType == 'examples':
             outline_variables = []
             continue
 
         if outline_variables is not None:
             values = examples_table_cell_regex.findall(line.strip())
+            examples = outline.examples
             if values and not outline_variables:
-                # First row is a table header
-                outline_variables = [name.strip() for name in values]
+                # First row is a table header, naming the table column of
+                # each cell
+                outline_variables = [examples.addColumn(name.strip())
+                                     for name in values]
             elif values:
-                # Preceding rows are transformed into scenarios
+                # Preceding rows are examples
                 if len(values) < len(outline_variables):
                     raise ValueError("Not enough values in %s" % line)
                 elif len(values) > len(outline_variables):
                     raise ValueError("Too many values in %s" % line)
 
-                mapping = {}
-                for idx in range(len(values)):
-                    mapping[outline_variables[idx]] = values[idx].strip()
-                def translate(s, mapping):
-                    for key in mapping:
-                        s = s.replace(u"<%s>" % key, mapping[key])
-                    return s
-
-                outline_examples += 1
-                example = Scenario(
-                    u"%s #%02d" % (outline.name, outline_examples), story=story)
-                previousStep = None
-                for given in outline.givens:
-                    example.givens.append(given.__class__(
-                        translate(given.text, mapping), previousStep))
-                    previousStep = "given"
-                for when in outline.whens:
-                    example.whens.append(when.__class__(
-                        translate(when.text, mapping), previousStep))
-                    previousStep = "when"
-                for then in outline.thens:
-                    example.thens.append(then.__class__(
-                        translate(then.text, mapping), previousStep))
-                    previousStep = "then"
-                scenarios.append(example)
+                row = [None] * len(examples.columns)
+                for column, value in zip(outline_variables, values):
+                    row[column] = value.strip()
+                examples.append(row)
+                if not outlines:
+                    yield outline.scenario(len(examples) - 1, plain=True)
             continue
 
-        givenMatch = given_regex.match(line, language)
-        if givenMatch:
+        if lineType == 'given':
             if previousStep:
                 raise ValueError("Found %s, but previous step was %s" % (line, previousStep,))
 
             if scenario:
-                scenario.givens.append(Step(givenMatch.group(1), previousStep))
-            elif outline:
-                outline.givens.append(Step(givenMatch.group(1), previousStep))
+                scenario.givens.append(Step(share(lineText), previousStep))
+            elif outline is not None:
+                outline.givens.append(Step(share(lineText), previousStep))
             else:
-                story.givens.append(Step(givenMatch.group(1), previousStep))
+                story.givens.append(Step(share(lineText), previousStep))
             previousStep = "given"
             continue
 
-        whenMatch = when_regex.match(line, language)
-        if whenMatch:
+        if lineType == 'when':
             if previousStep not in ('given', None):
                 raise ValueError("Found %s, but previous step was %s" % (line, previousStep,))
 
             if scenario:
-                scenario.whens.append(Step(whenMatch.group(1), previousStep))
-            elif outline:
-                outline.whens.append(Step(whenMatch.group(1), previousStep))
+                scenario.whens.append(Step(share(lineText), previousStep))
+            elif outline is not None:
+                outline.whens.append(Step(share(lineText), previousStep))
             else:
-                story.whens.append(Step(whenMatch.group(1), previousStep))
+                story.whens.append(Step(share(lineText), previousStep))
             previousStep = "when"
             continue
 
-        thenMatch = then_regex.match(line, language)
-        if thenMatch:
+        if lineType == 'then':
             if previousStep != 'when':
                 raise ValueError("Found %s, but previous step was %s" % (line, previousStep,))
 
             if scenario:
-                scenario.thens.append(Step(thenMatch.group(1), previousStep))
-            elif outline:
-                outline.thens.append(Step(thenMatch.group(1), previousStep))
+                scenario.thens.append(Step(share(lineText), previousStep))
+            elif outline is not None:
+                outline.thens.append(Step(share(lineText), previousStep))
             else:
-                story.thens.append(Step(thenMatch.group(1), previousStep))
+                story.thens.append(Step(share(lineText), previousStep))
             previousStep = "then"
             continue
 
-        andMatch = and_regex.match(line, language) or but_regex.match(line, language)
-        if andMatch:
+        if lineType == 'and':
             if previousStep is None:
                 raise ValueError("Found %s, but no previous step found" % line)
 
             if scenario:
                 if previousStep == "given":
-                    scenario.givens.append(Step(andMatch.group(1), previousStep))
+                    scenario.givens.append(Step(share(lineText), previousStep))
                 elif previousStep == "when":
-                    scenario.whens.append(Step(andMatch.group(1), previousStep))
+                    scenario.whens.append(Step(share(lineText), previousStep))
                 elif previousStep == "then":
-                    scenario.thens.append(Step(andMatch.group(1), previousStep))
-            elif outline:
+                    scenario.thens.append(Step(share(lineText), previousStep))
+            elif outline is not None:
                 if previousStep == "given":
-                    outline.givens.append(Step(andMatch.group(1), previousStep))
+                    outline.givens.append(Step(share(lineText), previousStep))
                 elif previousStep == "when":
-                    outline.whens.append(Step(andMatch.group(1), previousStep))
+                    outline.whens.append(Step(share(lineText), previousStep))
                 elif previousStep == "then":
-                    outline.thens.append(Step(andMatch.group(1), previousStep))
+                    outline.thens.append(Step(share(lineText), previousStep))
             else:
                 if previousStep == "given":
-                    story.givens.append(Step(andMatch.group(1), previousStep))
+                    story.givens.append(Step(share(lineText), previousStep))
                 elif previousStep == "when":
-                    story.whens.append(Step(andMatch.group(1), previousStep))
+                    story.whens.append(Step(share(lineText), previousStep))
                 elif previousStep == "then":
-                    story.thens.append(Step(andMatch.group(1), previousStep))
+                    story.thens.append(Step(share(lineText), previousStep))
             continue
 
+    if scenario is not None:
+        yield scenario
+    if outline is not None and outlines:
+        yield outline
+
+def appendScenarios(story, text, default_language='en', pool=None):
+    """Parse the acceptance criteria in the string 'text' and append the
+    relevant scenarios to the given IStory. See iterScenarios(). If the
+    story has an appendOutline() method, outlines are appended with it, so
+    that their scenarios are generated lazily. Nothing is appended unless
+    the whole text can be parsed.
+    """
+    parseCriteria(text, default_language, pool).appendTo(story)
+
+def _appendItems(story, items):
+    # Append scenarios and outlines to the story in order, through its
+    # public scenarios list, so that any IStory will do. Outlines are
+    # appended as their scenarios if the story has no appendOutline().
+    appendOutline = getattr(story, 'appendOutline', None)
+    scenarios = []
+    for item in items:
+        if isinstance(item, ScenarioOutline):
+            if appendOutline is None:
+                scenarios.extend(item)
+                continue
+            # Keep the order: scenarios read before the outline come first
+            story.scenarios.extend(scenarios)
+            scenarios = []
+            appendOutline(item)
+        else:
+            scenarios.append(item)
     story.scenarios.extend(scenarios)
+
+def appendAllScenarios(pairs, default_language='en', pool=None,
+                       processes=None):
+    """Parse the acceptance criteria of many stories and append the
+    relevant scenarios to each, as appendScenarios() does. 'pairs' is an
+    iterable of (story, text) tuples.
+
+    Texts are parsed in a pool of 'processes' worker processes, by default
+    one per CPU, and the results are appended to the stories in this
+    process, in the order they were given. With one process, or only one
+    story, texts are parsed in this process instead. If the criteria of a
+    story cannot be parsed, the ValueError is raised once the stories
+    before it have been appended.
+    """
+    from corejet.core.parsecache import dumpParsedCriteria
+    from corejet.core.parsecache import loadParsedCriteria
+
+    pairs = list(pairs)
+    jobs = [(text, default_language, pool,) for story, text in pairs]
+    results = imapJobs(_parseJob, jobs, processes,
+                       send=(_dumpJob, _loadJob),
+                       receive=(dumpParsedCriteria,
+                                lambda data: loadParsedCriteria(data, pool)))
+    for index, criteria in enumerate(results):
+        criteria.appendTo(pairs[index][0])
+
+class Criteria(object):
+    """The story-level steps, and the scenarios and outlines, parsed from
+    one text, to be appended to a story. It stands in for the story while
+    the text is parsed.
+    """
+
+    __slots__ = ('givens', 'whens', 'thens', 'items',)
+
+    def __init__(self, givens=None, whens=None, thens=None, items=None):
+        self.givens = givens or []
+        self.whens = whens or []
+        self.thens = thens or []
+        self.items = items or []
+
+    def appendTo(self, story):
+        """Append the steps, scenarios and outlines to the given IStory, as
+        appendScenarios() does
+        """
+        story.givens.extend(self.givens)
+        story.whens.extend(self.whens)
+        story.thens.extend(self.thens)
+        for item in self.items:
+            item.story = story
+        _appendItems(story, self.items)
+
+def parseCriteria(text, default_language='en', pool=None):
+    """Parse the acceptance criteria in the string 'text' and return them
+    as Criteria, without appending them to a story
+    """
+    criteria = Criteria()
+    criteria.items = list(iterScenarios(criteria, text, default_language,
+                                        pool, outlines=True))
+    return criteria
+
+def _parseJob(job):
+    return parseCriteria(*job)
+
+def _dumpJob(job):
+    # The text pool is only used in this process
+    text, default_language, pool = job
+    return (text, default_language,)
+
+def _loadJob(data):
+    text, default_language = data
+    return (text, default_language, None,)
@@ -0,0 +1,75 @@
+"""Running jobs in a pool of worker processes.
+
+``imapJobs(func, jobs)`` calls a function for each of a list of jobs, in
+a ``multiprocessing`` pool or, with a single process or job, in this
+process, and yields the results in order. Loading, parsing and writing
+catalogues in ``corejet.core.merge``, ``corejet.core.parser`` and
+``corejet.core.shard`` all use it.
+
+In a pool, results are sent back to this process with ``marshal``, which
+is much cheaper than pickling a model, so they must be primitive values.
+The ``send`` and ``receive`` arguments convert jobs and results, only
+when they are sent between processes: each is a ``(dump, load)`` pair of
+functions turning a job or result into primitive values and back. Jobs
+are marshalled if ``send`` is given, and pickled otherwise. Functions
+run in the workers must be defined at module level.
+"""
+
+import marshal
+import multiprocessing
+
+def imapJobs(func, jobs, processes=None, send=None, receive=None):
+    """Yield ``func(job)`` for each of ``jobs``, in order, running the
+    jobs in a pool of ``processes`` worker processes, by default one per
+    CPU, or in this process if there is one process or only one job
+    """
+    jobs = list(jobs)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, len(jobs)))
+
+    if processes == 1:
+        for job in jobs:
+            yield func(job)
+        return
+
+    loadJob = dumpResult = loadResult = None
+    if send is not None:
+        dumpJob, loadJob = send
+        jobs = [marshal.dumps(dumpJob(job), marshal.version) for job in jobs]
+    if receive is not None:
+        dumpResult, loadResult = receive
+    calls = [(func, loadJob, dumpResult, job,) for job in jobs]
+    # Send the jobs to the workers in chunks, as Pool.map() does
+    chunksize = max(1, len(calls) // (processes * 4))
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        for data in pool.imap(_call, calls, chunksize):
+            result = marshal.loads(data)
+            if loadResult is not None:
+                result = loadResult(result)
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+def runJobs(func, jobs, processes=None, send=None):
+    """Call ``func(job)`` for each of ``jobs`` for its side effects, as
+    ``imapJobs()`` does, and return once all the jobs are done
+    """
+    for result in imapJobs(func, jobs, processes, send):
+        pass
+
+def _call(call):
+    # Runs in a worker process
+    func, loadJob, dumpResult, job = call
+    if loadJob is not None:
+        job = loadJob(marshal.loads(job))
+    result = func(job)
+    if dumpResult is not None:
+        result = dumpResult(result)
+    return marshal.dumps(result, marshal.version)
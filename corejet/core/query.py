@@ -0,0 +1,244 @@
+"""Queries over requirements catalogues.
+
+A ``Query`` selects epics, stories and scenarios by their fields. Each of
+its ``epic``, ``story`` and ``scenario`` arguments is either a function
+taking a node and returning true for nodes to keep, or a dict mapping
+field names to
+
+* a value, which the field must equal,
+* a list, tuple or set of values, one of which the field must equal, or
+* a function taking the field value and returning true to keep the node.
+
+For example::
+
+    query = Query(story={'priority': 'Critical'},
+                  scenario={'status': ('fail', 'mismatch',)},
+                  prune=True)
+    view = query(catalogue)
+
+The conditions are compiled into one predicate per kind of node when the
+query is created. Applying the query returns a ``CatalogueView``: no nodes
+are copied, and the filters are applied each time the view's ``epics`` are
+read, so a view always reflects the current contents of its catalogue. Each
+read evaluates the predicates at most once per node, and the epic and
+story views it returns keep the result.
+
+With ``prune``, stories without any selected scenarios and epics without
+any selected stories are left out as well.
+"""
+
+from corejet.core.model import serializeCatalogue, writeCatalogue
+
+def _fieldTest(field, expected):
+    if callable(expected):
+        def test(node):
+            return expected(getattr(node, field))
+    elif isinstance(expected, (list, tuple, set, frozenset,)):
+        expected = frozenset(expected)
+        def test(node):
+            return getattr(node, field) in expected
+    else:
+        def test(node):
+            return getattr(node, field) == expected
+    return test
+
+def compilePredicate(spec):
+    """Return a predicate function for a query argument as described
+    above, or ``None`` if ``spec`` is ``None``
+    """
+    if spec is None:
+        return None
+    if not isinstance(spec, dict):
+        return spec
+
+    tests = [_fieldTest(field, expected)
+             for field, expected in sorted(spec.items())]
+    if not tests:
+        return None
+    if len(tests) == 1:
+        return tests[0]
+
+    def predicate(node):
+        for test in tests:
+            if not test(node):
+                return False
+        return True
+    return predicate
+
+class Query(object):
+    """A compiled query. Call it with a catalogue to get a view.
+    """
+
+    def __init__(self, epic=None, story=None, scenario=None, prune=False):
+        self.epic = compilePredicate(epic)
+        self.story = compilePredicate(story)
+        self.scenario = compilePredicate(scenario)
+        self.prune = prune
+
+    def __call__(self, catalogue):
+        return CatalogueView(catalogue, self)
+
+    def scenarios(self, story):
+        """Return the selected scenarios of ``story``
+        """
+        if self.scenario is None:
+            return list(story.scenarios)
+        return filter(self.scenario, story.scenarios)
+
+    def stories(self, epic):
+        """Return the selected stories of ``epic``
+        """
+        return [story for story, scenarios in self._stories(epic)]
+
+    def _stories(self, epic):
+        # Return (story, scenarios) pairs for the selected stories of epic.
+        # Without prune, the scenarios are not selected until they are read,
+        # and are None.
+        selected = []
+        for story in epic.stories:
+            if self.story is not None and not self.story(story):
+                continue
+            scenarios = None
+            if self.prune:
+                scenarios = self.scenarios(story)
+                if not scenarios:
+                    continue
+            selected.append((story, scenarios,))
+        return selected
+
+    def epics(self, catalogue):
+        """Return the selected epics of ``catalogue``
+        """
+        return [epic for epic, stories in self._epics(catalogue)]
+
+    def _epics(self, catalogue):
+        # Return (epic, stories) pairs for the selected epics of catalogue,
+        # with stories as returned by _stories(), or None without prune
+        selected = []
+        for epic in catalogue.epics:
+            if self.epic is not None and not self.epic(epic):
+                continue
+            stories = None
+            if self.prune:
+                stories = self._stories(epic)
+                if not stories:
+                    continue
+            selected.append((epic, stories,))
+        return selected
+
+def _delegate(name):
+    def get(self):
+        return getattr(self._node, name)
+    return property(get)
+
+class CatalogueView(object):
+    """The parts of a catalogue selected by a query. ``epics`` holds views
+    of the selected epics. Views can be serialised and written like a
+    catalogue.
+    """
+
+    __slots__ = ('_node', 'query',)
+
+    def __init__(self, catalogue, query):
+        self._node = catalogue
+        self.query = query
+
+    project = _delegate('project')
+    extractTime = _delegate('extractTime')
+    testTime = _delegate('testTime')
+
+    @property
+    def catalogue(self):
+        return self._node
+
+    @property
+    def epics(self):
+        query = self.query
+        return [EpicView(epic, query, stories)
+                for epic, stories in query._epics(self._node)]
+
+    def iterStories(self):
+        """Yield the selected stories, as views
+        """
+        for epic in self.epics:
+            for story in epic.stories:
+                yield story
+
+    def iterScenarios(self):
+        """Yield the selected scenarios
+        """
+        for story in self.iterStories():
+            for scenario in story.scenarios:
+                yield scenario
+
+    def serialize(self):
+        return serializeCatalogue(self)
+
+    def write(self, output, compression=0):
+        """Write the XML representation of the view. See
+        ``RequirementsCatalogue.write()``.
+        """
+        writeCatalogue(self, output, compression)
+
+class EpicView(object):
+    """An epic with only the stories selected by a query. They are selected
+    when first read, unless given as ``(story, scenarios)`` pairs.
+    """
+
+    __slots__ = ('_node', '_stories', 'query',)
+
+    def __init__(self, epic, query, stories=None):
+        self._node = epic
+        self._stories = None
+        if stories is not None:
+            self._stories = [StoryView(story, query, scenarios)
+                             for story, scenarios in stories]
+        self.query = query
+
+    name = _delegate('name')
+    title = _delegate('title')
+
+    @property
+    def epic(self):
+        return self._node
+
+    @property
+    def stories(self):
+        if self._stories is None:
+            query = self.query
+            self._stories = [StoryView(story, query, scenarios)
+                             for story, scenarios in query._stories(self._node)]
+        return list(self._stories)
+
+class StoryView(object):
+    """A story with only the scenarios selected by a query. They are
+    selected when first read, unless given.
+    """
+
+    __slots__ = ('_node', '_scenarios', 'query',)
+
+    def __init__(self, story, query, scenarios=None):
+        self._node = story
+        self._scenarios = scenarios
+        self.query = query
+
+    name = _delegate('name')
+    title = _delegate('title')
+    points = _delegate('points')
+    status = _delegate('status')
+    resolution = _delegate('resolution')
+    priority = _delegate('priority')
+    givens = _delegate('givens')
+    whens = _delegate('whens')
+    thens = _delegate('thens')
+    epic = _delegate('epic')
+
+    @property
+    def story(self):
+        return self._node
+
+    @property
+    def scenarios(self):
+        if self._scenarios is None:
+            self._scenarios = self.query.scenarios(self._node)
+        return list(self._scenarios)
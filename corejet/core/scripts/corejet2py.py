@@ -13,6 +13,9 @@ import argparse
 import pkg_resources
 import lxml.etree
 
+from corejet.core.model import RequirementsCatalogue
+from corejet.core.query import Query
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -43,34 +46,24 @@ def main():
                  % (sys.argv[0], args.filename))
 
     # Load the test report
-    report_tree = None
+    catalogue = RequirementsCatalogue()
     with open(args.filename) as report_file:
-        report_tree = lxml.etree.parse(report_file)
+        catalogue.populate(report_file)
 
-    # Filter the test report by the given arguments
+    # Select scenarios by the given arguments, leaving out empty stories
+    # and epics
     if args.story:
-        for story in report_tree.xpath("//story[not(@id='%s')]" % args.story):
-            story.getparent().remove(story)
+        query = Query(story={'name': args.story}, prune=True)
     elif args.all:
-        pass
+        query = Query(prune=True)
     elif args.pending:
-        for scenario in report_tree.xpath('//scenario'):
-            if scenario.get('testStatus') != 'pending':
-                scenario.getparent().remove(scenario)
+        query = Query(scenario={'status': 'pending'}, prune=True)
     elif args.mismatch:
-        for scenario in report_tree.xpath('//scenario'):
-            if scenario.get('testStatus') != 'mismatch':
-                scenario.getparent().remove(scenario)
+        query = Query(scenario={'status': 'mismatch'}, prune=True)
     else:
-        for scenario in report_tree.xpath('//scenario'):
-            if scenario.get('testStatus') not in ['pending', 'mismatch']:
-                scenario.getparent().remove(scenario)
-    # Filter empty stories
-    for story in report_tree.xpath('//story[not(child::scenario)]'):
-        story.getparent().remove(story)
-    # Filter empty epics
-    for epic in report_tree.xpath('//epic[not(child::story)]'):
-        epic.getparent().remove(epic)
+        query = Query(scenario={'status': ('pending', 'mismatch',)},
+                      prune=True)
+    report_tree = query(catalogue).serialize()
 
     # Load the XSLT
     xslt_tree = None
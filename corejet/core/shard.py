@@ -0,0 +1,239 @@
+"""Sharded catalogue output.
+
+``writeShards(catalogue, directory)`` writes each epic of a catalogue to
+its own XML file, plus a small manifest listing the shards. Each shard is
+a complete ``<requirementscatalogue />`` document with a single epic, so
+existing tools can read it on its own. The manifest is an XML file named
+``manifest.xml``::
+
+    <manifest version="1" project="..." extractTime="..." testTime="...">
+      <shard epic="E1" title="..." file="E1.xml" stories="12"
+             fingerprint="..."/>
+      ...
+    </manifest>
+
+Each shard's ``fingerprint`` is the fingerprint of its epic. When shards
+are written to a directory which already has a manifest, only the epics
+whose fingerprints have changed are written again, and shards of epics
+which no longer exist are removed. The extract and test times are kept in
+the manifest only, so that a new test run does not touch unchanged shards.
+
+``ShardedCatalogue(directory)`` reads the manifest and loads epics from
+their shards only when asked for them.
+"""
+
+import os
+import re
+
+from lxml import etree
+import dateutil.parser
+
+from corejet.core.model import RequirementsCatalogue
+from corejet.core.model import writeCatalogue
+from corejet.core.cache import dumpEpic, loadEpic
+from corejet.core.cache import makeDirectory, replaceFile
+from corejet.core.pool import runJobs
+
+MANIFEST = 'manifest.xml'
+MANIFEST_VERSION = '1'
+
+class Shard(object):
+    """A manifest entry
+    """
+
+    def __init__(self, epic, title, file, fingerprint, stories=0):
+        self.epic = epic
+        self.title = title
+        self.file = file
+        self.fingerprint = fingerprint
+        self.stories = stories
+
+    def __repr__(self):
+        return "<Shard %s in %s>" % (self.epic, self.file,)
+
+def writeShards(catalogue, directory, processes=None):
+    """Write ``catalogue`` to ``directory`` as one XML file per epic plus a
+    manifest, and return the ids of the epics whose shards were written.
+
+    Shards that are up to date according to an existing manifest are left
+    alone. Changed shards are written in a pool of ``processes`` worker
+    processes, by default one per CPU. Epic ids must be unique.
+    """
+    makeDirectory(directory)
+
+    old = {}
+    oldProject = None
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        oldProject, extractTime, testTime, shards = _readManifest(directory)
+        for shard in shards:
+            old[shard.epic] = shard
+
+    shards = []
+    jobs = []
+    taken = set()
+    used = set([name.lower() for name in os.listdir(directory)])
+    for epic in catalogue.epics:
+        if epic.name in taken:
+            raise ValueError("Duplicate epic id %r" % (epic.name,))
+        previous = old.pop(epic.name, None)
+        if previous is not None:
+            file = previous.file
+        else:
+            file = _fileName(epic.name, used)
+        taken.add(epic.name)
+
+        shard = Shard(epic.name, epic.title, file, epic.fingerprint,
+                      len(epic.stories))
+        shards.append(shard)
+
+        if (previous is None or
+            previous.fingerprint != shard.fingerprint or
+            (oldProject or None) != (catalogue.project or None) or
+            not os.path.exists(os.path.join(directory, file))
+        ):
+            jobs.append((os.path.join(directory, file), catalogue.project,
+                         epic,))
+
+    runJobs(_writeShard, jobs, processes, send=(_dumpJob, _loadJob))
+
+    # The manifest is written last, so that a manifest never lists a
+    # shard which has not been written
+    _writeManifest(directory, catalogue, shards)
+
+    for shard in old.values():
+        path = os.path.join(directory, shard.file)
+        if os.path.exists(path):
+            os.remove(path)
+
+    return [epic.name for path, project, epic in jobs]
+
+class ShardedCatalogue(object):
+    """A catalogue written by ``writeShards()``. The manifest is read when
+    the object is created; shards are parsed only when their epics are
+    requested.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        (self.project, self.extractTime, self.testTime,
+         self.shards,) = _readManifest(directory)
+        self._shardsByEpic = dict([(shard.epic, shard,)
+                                   for shard in self.shards])
+
+    def epicIds(self):
+        """Return the ids of all epics, in order
+        """
+        return [shard.epic for shard in self.shards]
+
+    def getShard(self, epicId, default=None):
+        """Return the manifest entry for the epic with the given id
+        """
+        return self._shardsByEpic.get(epicId, default)
+
+    def loadEpic(self, epicId):
+        """Parse and return the epic with the given id. Raises ``KeyError``
+        if there is no such epic.
+        """
+        shard = self._shardsByEpic[epicId]
+        catalogue = RequirementsCatalogue()
+        catalogue.populate(os.path.join(self.directory, shard.file))
+        epic = catalogue.epics[0]
+        catalogue.epics = []
+        return epic
+
+    def iterEpics(self, epicIds=None):
+        """Parse and yield the epics with the given ids, or all epics, one
+        shard at a time
+        """
+        if epicIds is None:
+            epicIds = self.epicIds()
+        for epicId in epicIds:
+            yield self.loadEpic(epicId)
+
+    def load(self, epicIds=None):
+        """Return a ``RequirementsCatalogue`` with the epics with the given
+        ids, or all epics
+        """
+        return RequirementsCatalogue(project=self.project,
+            extractTime=self.extractTime,
+            testTime=self.testTime,
+            epics=list(self.iterEpics(epicIds)),
+        )
+
+def _fileName(epicId, used):
+    # Shard files are named after their epics where possible. ``used``
+    # holds the lower-cased names already taken, since file systems may
+    # be case insensitive.
+    base = re.sub(r'[^A-Za-z0-9_.-]', '_', epicId or '') or 'epic'
+    name = base + '.xml'
+    counter = 1
+    while name.lower() in used or name.lower() == MANIFEST:
+        name = '%s-%d.xml' % (base, counter,)
+        counter += 1
+    used.add(name.lower())
+    return name
+
+class _ShardDocument(object):
+    # What a shard holds: one epic, and the project of its catalogue. The
+    # extract and test times are kept in the manifest only.
+    extractTime = None
+    testTime = None
+
+    def __init__(self, project, epic):
+        self.project = project
+        self.epics = [epic]
+
+def _writeShard(job):
+    path, project, epic = job
+    document = _ShardDocument(project, epic)
+    replaceFile(path, lambda f: writeCatalogue(document, f))
+
+def _dumpJob(job):
+    path, project, epic = job
+    return (path, project, dumpEpic(epic),)
+
+def _loadJob(data):
+    path, project, epic = data
+    return (path, project, loadEpic(epic),)
+
+def _writeManifest(directory, catalogue, shards):
+    root = etree.Element("manifest")
+    root.set("version", MANIFEST_VERSION)
+    if catalogue.project:
+        root.set("project", catalogue.project)
+    if catalogue.extractTime:
+        root.set("extractTime", catalogue.extractTime.isoformat())
+    if catalogue.testTime:
+        root.set("testTime", catalogue.testTime.isoformat())
+
+    for shard in shards:
+        element = etree.SubElement(root, "shard")
+        element.set("epic", shard.epic)
+        if shard.title:
+            element.set("title", shard.title)
+        element.set("file", shard.file)
+        element.set("stories", str(shard.stories))
+        element.set("fingerprint", shard.fingerprint)
+
+    replaceFile(os.path.join(directory, MANIFEST), lambda f:
+        etree.ElementTree(root).write(f, pretty_print=True,
+            xml_declaration=True, encoding='utf-8'))
+
+def _readManifest(directory):
+    root = etree.parse(os.path.join(directory, MANIFEST)).getroot()
+    if root.tag != "manifest" or root.get("version") != MANIFEST_VERSION:
+        raise ValueError("Unsupported manifest in %s" % (directory,))
+
+    extractTime = root.get("extractTime")
+    if extractTime:
+        extractTime = dateutil.parser.parse(extractTime)
+    testTime = root.get("testTime")
+    if testTime:
+        testTime = dateutil.parser.parse(testTime)
+
+    shards = [Shard(element.get("epic"), element.get("title"),
+                    element.get("file"), element.get("fingerprint"),
+                    int(element.get("stories", 0)))
+              for element in root.iterchildren(tag="shard")]
+
+    return root.get("project"), extractTime or None, testTime or None, shards
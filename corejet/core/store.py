@@ -0,0 +1,282 @@
+"""SQLite storage for requirements catalogues.
+
+A ``CatalogueStore`` keeps one catalogue in a SQLite database, with a table
+each for epics, stories, scenarios and steps. Stories are indexed by id,
+status and priority, and scenarios by status, so a subset of a large
+catalogue can be loaded without reading the rest of it::
+
+    store = CatalogueStore('corejet.db')
+    store.save(catalogue)
+    ...
+    failing = store.load(priority='Critical', scenarioStatus='fail')
+"""
+
+import sqlite3
+
+import dateutil.parser
+
+from corejet.core.model import RequirementsCatalogue
+from corejet.core.model import Epic, Story, Scenario, Step
+
+# Bump whenever the schema below changes
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalogue (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    project TEXT,
+    extractTime TEXT,
+    testTime TEXT
+);
+CREATE TABLE IF NOT EXISTS epic (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS story (
+    id INTEGER PRIMARY KEY,
+    epic INTEGER NOT NULL REFERENCES epic (id),
+    name TEXT,
+    title TEXT,
+    points INTEGER,
+    status TEXT,
+    resolution TEXT,
+    priority TEXT
+);
+CREATE TABLE IF NOT EXISTS scenario (
+    id INTEGER PRIMARY KEY,
+    story INTEGER NOT NULL REFERENCES story (id),
+    name TEXT,
+    status TEXT
+);
+CREATE TABLE IF NOT EXISTS step (
+    id INTEGER PRIMARY KEY,
+    story INTEGER NOT NULL REFERENCES story (id),
+    scenario INTEGER REFERENCES scenario (id),
+    type TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS story_epic ON story (epic);
+CREATE INDEX IF NOT EXISTS story_name ON story (name);
+CREATE INDEX IF NOT EXISTS story_status ON story (status);
+CREATE INDEX IF NOT EXISTS story_priority ON story (priority);
+CREATE INDEX IF NOT EXISTS scenario_story ON scenario (story);
+CREATE INDEX IF NOT EXISTS scenario_status ON scenario (status);
+CREATE INDEX IF NOT EXISTS step_story ON step (story);
+"""
+
+# Step lists, in the order they are stored
+STEP_TYPES = (('givens', 'given',), ('whens', 'when',), ('thens', 'then',),)
+
+def _time(value):
+    if value:
+        return dateutil.parser.parse(value)
+    return None
+
+def _condition(column, value, conditions, parameters):
+    # ``value`` is a single value or a sequence of alternatives
+    if value is None:
+        return
+    if isinstance(value, basestring):
+        value = [value]
+    value = list(value)
+    conditions.append('%s IN (%s)' % (column, ', '.join(['?'] * len(value)),))
+    parameters.extend(value)
+
+def openDatabase(path, schema, version):
+    """Connect to the SQLite database at ``path``, creating the tables in
+    ``schema`` if necessary. Databases with another schema version than
+    ``version`` are refused with a ``ValueError``.
+    """
+    connection = sqlite3.connect(path)
+    found = connection.execute('PRAGMA user_version').fetchone()[0]
+    if found not in (0, version,):
+        connection.close()
+        raise ValueError("Unsupported schema version %d in %s" %
+                         (found, path,))
+    with connection:
+        connection.executescript(schema)
+        connection.execute('PRAGMA user_version = %d' % version)
+    return connection
+
+class CatalogueStore(object):
+    """A requirements catalogue stored in the SQLite database at ``path``.
+    The database is created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = openDatabase(path, SCHEMA, SCHEMA_VERSION)
+
+    def close(self):
+        self.connection.close()
+
+    def save(self, catalogue):
+        """Replace the stored catalogue with ``catalogue``
+        """
+        epics = []
+        stories = []
+        scenarios = []
+        steps = []
+
+        def addSteps(node, storyId, scenarioId):
+            for listName, stepType in STEP_TYPES:
+                for step in getattr(node, listName):
+                    steps.append((storyId, scenarioId, stepType, step.text,))
+
+        for epic in catalogue.epics:
+            epicId = len(epics) + 1
+            epics.append((epicId, epic.name, epic.title,))
+            for story in epic.stories:
+                storyId = len(stories) + 1
+                points = story.points
+                if points is not None:
+                    try:
+                        points = int(points)
+                    except (TypeError, ValueError,):
+                        points = None
+                stories.append((storyId, epicId, story.name, story.title,
+                                points, story.status, story.resolution,
+                                story.priority,))
+                addSteps(story, storyId, None)
+                for scenario in story.scenarios:
+                    scenarioId = len(scenarios) + 1
+                    scenarios.append((scenarioId, storyId, scenario.name,
+                                      scenario.status,))
+                    addSteps(scenario, storyId, scenarioId)
+
+        with self.connection as connection:
+            for table in ('step', 'scenario', 'story', 'epic', 'catalogue',):
+                connection.execute('DELETE FROM %s' % table)
+            connection.execute('INSERT INTO catalogue VALUES (1, ?, ?, ?)', (
+                catalogue.project,
+                catalogue.extractTime and catalogue.extractTime.isoformat(),
+                catalogue.testTime and catalogue.testTime.isoformat(),))
+            connection.executemany('INSERT INTO epic VALUES (?, ?, ?)', epics)
+            connection.executemany(
+                'INSERT INTO story VALUES (?, ?, ?, ?, ?, ?, ?, ?)', stories)
+            connection.executemany(
+                'INSERT INTO scenario VALUES (?, ?, ?, ?)', scenarios)
+            connection.executemany(
+                'INSERT INTO step (story, scenario, type, text) '
+                'VALUES (?, ?, ?, ?)', steps)
+
+    def load(self, epic=None, story=None, status=None, priority=None,
+             scenarioStatus=None):
+        """Return the stored catalogue as a ``RequirementsCatalogue``.
+
+        The arguments restrict which parts are loaded. Each may be a
+        single value or a sequence of alternatives:
+
+        * ``epic``, ``story``: epic and story ids
+        * ``status``, ``priority``: story status and priority
+        * ``scenarioStatus``: scenario status. Only matching scenarios are
+          loaded, and only stories with at least one matching scenario.
+
+        Only epics with matching stories are included when any of the
+        story or scenario arguments are given.
+        """
+        connection = self.connection
+
+        row = connection.execute('SELECT project, extractTime, testTime '
+                                 'FROM catalogue').fetchone()
+        catalogue = RequirementsCatalogue()
+        if row is None:
+            return catalogue
+        project, extractTime, testTime = row
+        catalogue.project = project
+        catalogue.extractTime = _time(extractTime)
+        catalogue.testTime = _time(testTime)
+
+        conditions = []
+        parameters = []
+        _condition('epic.name', epic, conditions, parameters)
+        _condition('story.name', story, conditions, parameters)
+        _condition('story.status', status, conditions, parameters)
+        _condition('story.priority', priority, conditions, parameters)
+
+        scenarioConditions = []
+        scenarioParameters = []
+        _condition('scenario.status', scenarioStatus, scenarioConditions,
+                   scenarioParameters)
+        if scenarioConditions:
+            conditions.append('story.id IN (SELECT scenario.story FROM '
+                              'scenario WHERE %s)' % scenarioConditions[0])
+            parameters.extend(scenarioParameters)
+
+        storyFilter = conditions and ' WHERE ' + ' AND '.join(conditions) or ''
+        scenarioFilter = (scenarioConditions and
+                          ' AND ' + scenarioConditions[0] or '')
+
+        # Select the matching stories and scenarios into temporary tables,
+        # then read each table once, joining on the selection
+        with connection:
+            connection.execute('CREATE TEMP TABLE IF NOT EXISTS '
+                               'selected_story (id INTEGER PRIMARY KEY)')
+            connection.execute('CREATE TEMP TABLE IF NOT EXISTS '
+                               'selected_scenario (id INTEGER PRIMARY KEY)')
+            connection.execute('DELETE FROM selected_story')
+            connection.execute('DELETE FROM selected_scenario')
+            connection.execute('INSERT INTO selected_story SELECT story.id '
+                               'FROM story JOIN epic ON story.epic = epic.id'
+                               + storyFilter, parameters)
+            connection.execute('INSERT INTO selected_scenario SELECT '
+                               'scenario.id FROM scenario JOIN selected_story '
+                               'ON scenario.story = selected_story.id'
+                               ' WHERE 1' + scenarioFilter,
+                               scenarioParameters)
+
+        steps = {}
+        for storyId, scenarioId, stepType, text in connection.execute(
+            'SELECT step.story, step.scenario, step.type, step.text '
+            'FROM step JOIN selected_story ON step.story = selected_story.id '
+            'WHERE step.scenario IS NULL OR step.scenario IN '
+            '(SELECT id FROM selected_scenario) ORDER BY step.id'
+        ):
+            lists = steps.get((storyId, scenarioId,))
+            if lists is None:
+                lists = steps[(storyId, scenarioId,)] = dict(
+                    given=[], when=[], then=[])
+            lists[stepType].append(Step(text, stepType))
+
+        empty = dict(given=(), when=(), then=())
+
+        scenarios = {}
+        for scenarioId, storyId, name, scenarioStatus in connection.execute(
+            'SELECT scenario.id, scenario.story, scenario.name, '
+            'scenario.status FROM scenario JOIN selected_scenario '
+            'ON scenario.id = selected_scenario.id ORDER BY scenario.id'
+        ):
+            lists = steps.get((storyId, scenarioId,), empty)
+            scenarios.setdefault(storyId, []).append(Scenario(name,
+                status=scenarioStatus, givens=lists['given'],
+                whens=lists['when'], thens=lists['then']))
+
+        epics = {}
+        for epicId, name, title in connection.execute(
+            'SELECT epic.id, epic.name, epic.title FROM epic ' +
+            (conditions and 'WHERE epic.id IN (SELECT story.epic FROM story '
+             'JOIN selected_story ON story.id = selected_story.id) ' or '') +
+            'ORDER BY epic.id'
+        ):
+            epics[epicId] = Epic(name, title)
+            catalogue.epics.append(epics[epicId])
+
+        for (storyId, epicId, name, title, points, storyStatus, resolution,
+             storyPriority,) in connection.execute(
+            'SELECT story.* FROM story JOIN selected_story '
+            'ON story.id = selected_story.id ORDER BY story.id'
+        ):
+            epicNode = epics[epicId]
+            lists = steps.get((storyId, None,), empty)
+            storyNode = Story(name, title, points=points, status=storyStatus,
+                resolution=resolution, priority=storyPriority, epic=epicNode,
+                givens=lists['given'], whens=lists['when'],
+                thens=lists['then'])
+            storyScenarios = scenarios.get(storyId, ())
+            for scenario in storyScenarios:
+                scenario.story = storyNode
+            storyNode.scenarios = storyScenarios
+            epicNode.stories.append(storyNode)
+
+        return catalogue
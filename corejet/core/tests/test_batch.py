@@ -0,0 +1,90 @@
+import unittest2 as unittest
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+TEXT = u"""\
+Given a logged-in user
+
+Scenario: Adding item %(n)d
+When the user adds item %(n)d
+Then the basket holds item %(n)d
+
+Scenario Outline: Adding items %(n)d
+Given <start> items
+When the user adds <added> items
+Then there are <total> items
+
+Examples:
+| start | added | total |
+| 1     | 2     | 3     |
+| 4     | 5     | 9     |
+"""
+
+def stories(count):
+    from corejet.core.model import Story
+    return [Story(u'S%d' % n, u'Story %d' % n) for n in range(count)]
+
+@story(id="batch-1", title="As a developer, I can parse the criteria of many stories at once")
+class Batch(unittest.TestCase):
+
+    @given("The criteria of several stories")
+    def create(self):
+        self.texts = [TEXT % {'n': n} for n in range(10)]
+
+    @scenario("Parsing in worker processes")
+    class Parallel(Scenario):
+
+        @when("The criteria are parsed serially and in parallel")
+        def parse(self):
+            from corejet.core.model import TextPool
+            from corejet.core.parser import appendScenarios
+            from corejet.core.parser import appendAllScenarios
+            self.expected = stories(len(self.texts))
+            for target, text in zip(self.expected, self.texts):
+                appendScenarios(target, text)
+            self.serial = stories(len(self.texts))
+            appendAllScenarios(zip(self.serial, self.texts), processes=1)
+            self.pool = TextPool()
+            self.parallel = stories(len(self.texts))
+            appendAllScenarios(zip(self.parallel, self.texts), processes=2,
+                               pool=self.pool)
+
+        @then("Each story gets the scenarios of its own criteria")
+        def check(self):
+            for result in (self.serial, self.parallel,):
+                for target, expected in zip(result, self.expected):
+                    self.assertEqual(target.fingerprint, expected.fingerprint)
+                    self.assertEqual([s.name for s in target.scenarios],
+                                     [s.name for s in expected.scenarios])
+                    self.assertEqual(
+                        [step.step_type for step in target.scenarios[0].thens],
+                        [step.step_type for step in expected.scenarios[0].thens])
+                    self.assertTrue(target.scenarios[2].story is target)
+            self.assertEqual(self.parallel[3].scenarios[0].name,
+                             u'Adding item 3')
+
+        @then("Text is shared through the pool")
+        def pool(self):
+            self.assertTrue(self.parallel[0].givens[0].text is
+                            self.parallel[1].givens[0].text)
+            self.assertTrue(self.parallel[0].givens[0].text in self.pool)
+
+    @scenario("Invalid criteria")
+    class Invalid(Scenario):
+
+        @given("Criteria that cannot be parsed")
+        def create(self):
+            self.texts[5] = u"Scenario: Bad\nThen nothing happened"
+
+        @when("The criteria are parsed in parallel")
+        def parse(self):
+            from corejet.core.parser import appendAllScenarios
+            self.targets = stories(len(self.texts))
+            with self.assertRaises(ValueError):
+                appendAllScenarios(zip(self.targets, self.texts),
+                                   processes=2)
+
+        @then("The stories before the invalid criteria have their scenarios")
+        def check(self):
+            self.assertEqual(len(self.targets[4].scenarios), 3)
+            self.assertEqual(len(self.targets[5].scenarios), 0)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import datetime
+import unittest2 as unittest
+import lxml.etree
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+XML = """\
+<requirementscatalogue project="Test project" extractTime="2011-01-02T12:01:00+02:00" testTime="2011-01-02T12:05:00">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story" points="3" requirementStatus="open" priority="high">
+      <given>some background</given>
+      <scenario name="First scenario" testStatus="pass">
+        <given>something</given>
+        <when>something happens</when>
+        <then>do something</then>
+        <then>and something else</then>
+      </scenario>
+    </story>
+    <story id="S2" title="Second story" points="3" requirementStatus="closed" requirementResolution="fixed" priority="high"/>
+  </epic>
+  <epic id="E2" title="Second epic"/>
+</requirementscatalogue>
+"""
+
+@story(id="cache-1", title="As a developer, I can cache parsed catalogues")
+class Caching(unittest.TestCase):
+
+    @given("A working directory with a catalogue file")
+    def workingDirectory(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpdir, 'corejet.xml')
+        self.cacheDir = os.path.join(self.tmpdir, 'cache')
+        with open(self.source, 'w') as f:
+            f.write(XML)
+
+    @then("Clean up")
+    def cleanUp(self):
+        shutil.rmtree(self.tmpdir)
+
+    @scenario("Binary round trip")
+    class RoundTrip(Scenario):
+
+        @given("A populated catalogue")
+        def create(self):
+            from corejet.core.model import RequirementsCatalogue
+            from corejet.core.model import Step
+            self.catalogue = RequirementsCatalogue()
+            with open(self.source) as f:
+                self.catalogue.populate(f)
+            # Steps as created by the parser may have an unexpected type
+            self.catalogue.epics[0].stories[0].whens.append(Step("odd", None))
+
+        @when("It is dumped and loaded again")
+        def roundTrip(self):
+            from corejet.core.cache import dumps, loads
+            self.copy = loads(dumps(self.catalogue))
+
+        @then("The copy serializes identically")
+        def check(self):
+            self.assertEqual(lxml.etree.tostring(self.copy.serialize()),
+                             lxml.etree.tostring(self.catalogue.serialize()))
+            self.assertEqual(self.copy.extractTime, self.catalogue.extractTime)
+            self.assertEqual(self.copy.extractTime.utcoffset(), datetime.timedelta(hours=2))
+            self.assertEqual(self.copy.epics[0].stories[0].whens[0].step_type, None)
+            self.assertEqual(self.copy.epics[0].stories[0].scenarios[0].thens[1].step_type, 'then')
+            self.assertTrue(self.copy.getScenario("S1", "First scenario").story is self.copy.getStory("S1"))
+
+    @scenario("Warm load")
+    class WarmLoad(Scenario):
+
+        @given("A catalogue loaded once through the cache")
+        def cold(self):
+            from corejet.core.cache import CatalogueCache
+            self.cold = CatalogueCache(self.cacheDir).load(self.source)
+
+        @when("The catalogue is loaded again without XML parsing")
+        def warm(self):
+            from corejet.core import model
+            from corejet.core.cache import CatalogueCache
+            populate = model.RequirementsCatalogue.populate
+            def fail(*args, **kwargs):
+                raise AssertionError("populate() called")
+            model.RequirementsCatalogue.populate = fail
+            try:
+                self.warm = CatalogueCache(self.cacheDir).load(self.source)
+            finally:
+                model.RequirementsCatalogue.populate = populate
+
+        @then("The cached copy is used")
+        def check(self):
+            self.assertEqual(lxml.etree.tostring(self.warm.serialize()),
+                             lxml.etree.tostring(self.cold.serialize()))
+
+    @scenario("Invalidation")
+    class Invalidation(Scenario):
+
+        @given("A catalogue loaded once through the cache")
+        def cold(self):
+            from corejet.core.cache import CatalogueCache
+            CatalogueCache(self.cacheDir, checksum=True).load(self.source)
+
+        @when("The source file changes")
+        def change(self):
+            stat = os.stat(self.source)
+            with open(self.source, 'w') as f:
+                f.write(XML.replace('First epic', 'Other epic'))
+            # Same size and timestamp: only the checksum can tell
+            os.utime(self.source, (stat.st_atime, stat.st_mtime,))
+
+        @then("The new contents are loaded")
+        def check(self):
+            from corejet.core.cache import CatalogueCache
+            catalogue = CatalogueCache(self.cacheDir, checksum=True).load(self.source)
+            self.assertEqual(catalogue.epics[0].title, "Other epic")
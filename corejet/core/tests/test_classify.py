@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import unittest2 as unittest
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+LINES = [
+    u"# language: fi",
+    u"Scenario: Logging in",
+    u"  scenario 2: Logging out",
+    u"Scenario Outline: Counting apples",
+    u"Examples:",
+    u"Given a user",
+    u"When the user logs in",
+    u"Then the user is logged in",
+    u"  And the user is happy",
+    u"  But nobody else is",
+    u"| a | b |",
+    u"",
+    u"Scenario:",
+]
+
+@story(id="classify-1", title="As a developer, I can classify lines of acceptance criteria in one match")
+class Classifying(unittest.TestCase):
+
+    @scenario("English lines")
+    class English(Scenario):
+
+        @given("The English classifier")
+        def create(self):
+            from corejet.core.parser import getClassifier
+            self.classify = getClassifier('en').classify
+
+        @when("Lines of each type are classified")
+        def classifyLines(self):
+            self.result = [self.classify(line) for line in LINES]
+
+        @then("Each line gets its type and text")
+        def check(self):
+            self.assertEqual(self.result, [
+                (u'language', u'fi'),
+                (u'scenario', u'Logging in'),
+                (u'scenario', u'Logging out'),
+                (u'outline', u'Counting apples'),
+                (u'examples', None),
+                (u'given', u'a user'),
+                (u'when', u'the user logs in'),
+                (u'then', u'the user is logged in'),
+                (u'and', u'the user is happy'),
+                (u'and', u'nobody else is'),
+                (None, None),
+                (None, None),
+                (None, None),
+            ])
+
+        @then("The result agrees with the individual regexes")
+        def agree(self):
+            from corejet.core.parser import LINE_TYPES
+            for line, (lineType, text) in zip(LINES[1:], self.result[1:]):
+                for candidate, regex in LINE_TYPES:
+                    match = regex.match(line, 'en')
+                    if match:
+                        self.assertEqual(candidate, lineType)
+                        self.assertEqual(match.groups() and match.group(1)
+                                         or None, text)
+                        break
+                else:
+                    self.assertEqual(lineType, None)
+
+    @scenario("Finnish lines")
+    class Finnish(Scenario):
+
+        @when("Finnish lines are classified")
+        def classifyLines(self):
+            from corejet.core.parser import getClassifier
+            classify = getClassifier('fi').classify
+            self.result = [classify(line) for line in [
+                u"Tapaus: Ensimmäinen tapaus",
+                u"Oletetaan, että ajan polkupyörällä,",
+                u"  mutta minulla ei ole pyöräilykypärää.",
+                u"niin minulle käy tosi huonosti,",
+            ]]
+
+        @then("Their translated patterns are used")
+        def check(self):
+            self.assertEqual(self.result, [
+                (u'scenario', u'Ensimmäinen tapaus'),
+                (u'given', u'ajan polkupyörällä'),
+                (u'and', u'minulla ei ole pyöräilykypärää'),
+                (u'then', u'minulle käy tosi huonosti'),
+            ])
+
+        @then("Unknown languages fall back to English")
+        def fallback(self):
+            from corejet.core.parser import getClassifier
+            self.assertTrue(getClassifier('xx') is getClassifier('en'))
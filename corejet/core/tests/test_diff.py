@@ -0,0 +1,122 @@
+import datetime
+import unittest2 as unittest
+import lxml.etree
+
+from corejet.core import Scenario, story, scenario, given, when, then
+from corejet.core.parser import appendScenarios
+
+def buildCatalogue(storyStatus, criteria, otherEpic):
+    from corejet.core.model import RequirementsCatalogue, Epic, Story
+
+    catalogue = RequirementsCatalogue(project="Test project",
+        extractTime=datetime.datetime(2011, 1, 2, 12, 1, 0))
+
+    epic1 = Epic("E1", "First epic")
+    catalogue.epics.append(epic1)
+
+    story1 = Story("S1", "First story", points=3, status=storyStatus,
+        priority="high", epic=epic1)
+    epic1.stories.append(story1)
+    appendScenarios(story1, criteria)
+
+    story2 = Story("S2", "Second story", epic=epic1)
+    epic1.stories.append(story2)
+
+    catalogue.epics.append(Epic(otherEpic, "Other epic"))
+    return catalogue
+
+OLD = """\
+Given some background
+  And more background
+
+Scenario: First scenario
+Given something
+When something happens
+Then do something
+
+Scenario: Second scenario
+Given something
+When something happens
+Then do something
+"""
+
+NEW = """\
+Given some background
+
+Scenario: First scenario
+Given something else
+When something happens
+Then do something
+  And something more
+
+Scenario: Third scenario
+Given something
+When something happens
+Then do something
+"""
+
+@story(id="diff-1", title="As a developer, I can compare two catalogues")
+class Diff(unittest.TestCase):
+
+    @given("Two versions of a requirements catalogue")
+    def create(self):
+        self.old = buildCatalogue("open", OLD, "E2")
+        self.new = buildCatalogue("closed", NEW, "E3")
+        self.new.epics[0].stories[0].scenarios[0].status = "pass"
+
+    @when("The catalogues are compared")
+    def diff(self):
+        from corejet.core.diff import diffCatalogues
+        self.changes = diffCatalogues(self.old, self.new)
+
+    @scenario("Identical catalogues")
+    class Identical(Scenario):
+
+        @then("A catalogue compared with itself has no changes")
+        def check(self):
+            from corejet.core.diff import diffCatalogues
+            self.assertFalse(diffCatalogues(self.old, self.old))
+            self.assertEqual(len(diffCatalogues(self.new, self.new)), 0)
+
+    @scenario("Change set")
+    class ChangeSet(Scenario):
+
+        @then("All differences are reported in document order")
+        def check(self):
+            self.assertEqual([(c.action, c.kind, c.path,) for c in self.changes], [
+                ('removed', 'epic', ('E2',)),
+                ('changed', 'story', ('E1', 'S1',)),
+                ('removed', 'step', ('E1', 'S1', None, 'givens', 1,)),
+                ('removed', 'scenario', ('E1', 'S1', 'Second scenario',)),
+                ('changed', 'scenario', ('E1', 'S1', 'First scenario',)),
+                ('changed', 'step', ('E1', 'S1', 'First scenario', 'givens', 0,)),
+                ('added', 'step', ('E1', 'S1', 'First scenario', 'thens', 1,)),
+                ('added', 'scenario', ('E1', 'S1', 'Third scenario',)),
+                ('added', 'epic', ('E3',)),
+            ])
+
+        @then("Changed fields carry their old and new values")
+        def checkFields(self):
+            from corejet.core.diff import CHANGED
+            changed = self.changes.filter(CHANGED)
+            self.assertEqual(changed[0].fields, {'status': ('open', 'closed',)})
+            self.assertEqual(changed[1].fields, {'status': (None, 'pass',)})
+            self.assertEqual(changed[2].fields, {'text': ('something', 'something else',)})
+
+    @scenario("Applying a change set")
+    class Apply(Scenario):
+
+        @when("The change set is applied to a copy of the old catalogue")
+        def apply(self):
+            from corejet.core.cache import dumps, loads
+            self.patched = loads(dumps(self.old))
+            self.changes.apply(self.patched)
+
+        @then("The copy serializes like the new catalogue")
+        def check(self):
+            self.assertEqual(lxml.etree.tostring(self.patched.serialize()),
+                             lxml.etree.tostring(self.new.serialize()))
+            self.assertTrue(self.patched.getScenario("S1", "Third scenario") is not
+                            self.new.getScenario("S1", "Third scenario"))
+            self.assertEqual(self.patched.storiesByStatus("closed"),
+                             [self.patched.getStory("S1")])
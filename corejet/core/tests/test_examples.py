@@ -0,0 +1,350 @@
+import unittest2 as unittest
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+TEXT = u"""\
+Scenario: Before
+When something happens
+Then something is done
+
+Scenario Outline: Counting apples
+Given I have <start> apples
+When I get <more> more
+Then I have <total> apples
+
+Examples:
+| start | more | total |
+| 1     | 2    | 3     |
+| 2     | 2    | 4     |
+
+Examples:
+| more | start |
+| 5    | 5     |
+
+Scenario: After
+When something else happens
+Then something else is done
+"""
+
+def table(rows):
+    lines = [u"Scenario Outline: Adding", u"Given <a> and <b>",
+             u"When adding", u"Then the sum is <sum>", u"Examples:",
+             u"| a | b | sum |"]
+    for n in xrange(rows):
+        lines.append(u"| %d | %d | %d |" % (n, 1, n + 1,))
+    return u"\n".join(lines)
+
+@story(id="examples-1", title="As a developer, I can parse outlines with many examples without generating all their scenarios")
+class Examples(unittest.TestCase):
+
+    @given("A story")
+    def create(self):
+        from corejet.core.model import Story
+        self.target = Story(u'S1', u'First story')
+
+    @scenario("Reading an outline")
+    class Outline(Scenario):
+
+        @when("Criteria are parsed into outlines")
+        def parse(self):
+            from corejet.core.parser import iterScenarios
+            self.items = list(iterScenarios(self.target, TEXT, outlines=True))
+
+        @then("The outline keeps its examples by column")
+        def check(self):
+            before, outline, after = self.items
+            self.assertEqual(len(outline), 3)
+            self.assertEqual(outline.examples.columns, [u'start', u'more', u'total'])
+            self.assertEqual(outline.examples.column(u'start'), [u'1', u'2', u'5'])
+            self.assertEqual(outline.examples.row(2), (u'5', u'5', None))
+            self.assertEqual([step.text for step in outline.givens],
+                             [u'I have <start> apples'])
+
+        @then("Scenarios are generated on access")
+        def generate(self):
+            outline = self.items[1]
+            scenario = outline[1]
+            self.assertEqual(scenario.name, u'Counting apples #02')
+            self.assertTrue(scenario.story is self.target)
+            self.assertEqual([step.text for step in scenario.thens],
+                             [u'I have 4 apples'])
+            self.assertEqual([step.step_type for step in scenario.thens],
+                             ['when'])
+            self.assertEqual([step.text for step in outline[-1].thens],
+                             [u'I have <total> apples'])
+            self.assertEqual(outline.getScenario(u'Counting apples #01').fingerprint,
+                             outline[0].fingerprint)
+            self.assertEqual(outline.getScenario(u'Counting apples #1'), None)
+            self.assertEqual(outline.getScenario(u'Counting apples #04'), None)
+            self.assertEqual([s.name for s in outline][2], u'Counting apples #03')
+
+    @scenario("Appending outlines to a story")
+    class Append(Scenario):
+
+        @when("Criteria with a large outline are appended")
+        def parse(self):
+            from corejet.core.parser import appendScenarios
+            appendScenarios(self.target, TEXT)
+            appendScenarios(self.target, table(1000))
+
+        @then("The scenarios are counted but not generated")
+        def pending(self):
+            self.assertEqual(self.target.rollup.scenarios, 1005)
+            self.assertEqual(self.target.rollup.count(None), 1005)
+            self.assertEqual(len(self.target._scenarios), 2)
+
+        @then("Reading the scenarios generates them in order")
+        def check(self):
+            names = [s.name for s in self.target.scenarios]
+            self.assertEqual(len(names), 1005)
+            self.assertEqual(len(self.target.scenarios), 1005)
+            self.assertEqual(len(self.target._scenarios), 2)
+            self.assertEqual(names[:5], [u'Before', u'Counting apples #01',
+                u'Counting apples #02', u'Counting apples #03', u'After'])
+            self.assertEqual(names[-1], u'Adding #1000')
+            self.assertEqual(self.target.rollup.scenarios, 1005)
+            self.assertEqual([step.text for step in self.target.scenarios[-1].givens],
+                             [u'999 and 1'])
+            self.assertEqual(self.target.scenarios[4].name, u'After')
+            self.assertEqual(self.target.scenarios[-1000].name, u'Adding #01')
+
+        @then("Appended scenarios are stored after the outlines")
+        def append(self):
+            from corejet.core.model import Scenario
+            self.target.scenarios.append(Scenario(u'Last'))
+            self.assertEqual(self.target.scenarios[-1].name, u'Last')
+            self.assertEqual(len(self.target._scenarios), 3)
+            self.assertEqual(self.target.rollup.scenarios, 1006)
+
+    @scenario("Assigning the scenarios of a story with outlines")
+    class Assign(Scenario):
+
+        @given("A story with an outline and a scenario status")
+        def parse(self):
+            from corejet.core.parser import appendScenarios
+            appendScenarios(self.target, TEXT)
+            self.target.scenarios[2].status = 'pass'
+
+        @when("Scenarios are added with += and assigned to themselves")
+        def extend(self):
+            from corejet.core.model import Scenario
+            self.target.scenarios += [Scenario(u'Extra')]
+            self.target.scenarios = self.target.scenarios
+
+        @then("The outline's scenarios are kept")
+        def check(self):
+            self.assertEqual([s.name for s in self.target.scenarios], [
+                u'Before', u'Counting apples #01', u'Counting apples #02',
+                u'Counting apples #03', u'After', u'Extra'])
+            self.assertEqual(len(self.target._outlines), 1)
+            self.assertEqual(self.target.rollup.scenarios, 6)
+            self.assertEqual(self.target.rollup.count('pass'), 1)
+
+        @then("Assigning a list stores the generated scenarios")
+        def store(self):
+            self.target.scenarios = list(self.target.scenarios)
+            self.assertEqual(self.target._outlines, None)
+            self.assertEqual(len(self.target._scenarios), 6)
+            self.assertEqual(self.target.rollup.scenarios, 6)
+            self.assertEqual(self.target.rollup.count('pass'), 1)
+            self.target.scenarios[2].status = 'fail'
+            self.target.scenarios[3].status = 'pass'
+            self.assertEqual(self.target.rollup.count('pass'), 1)
+            self.assertEqual(self.target.rollup.count('fail'), 1)
+            self.assertEqual(self.target.rollup.count(None), 4)
+
+    @scenario("Streaming the scenarios of an outline")
+    class Stream(Scenario):
+
+        @when("Scenarios yielded one by one are appended to a story")
+        def parse(self):
+            from corejet.core.parser import iterScenarios
+            self.target.scenarios.extend(iterScenarios(self.target, TEXT))
+
+        @then("Their statuses are counted by the story")
+        def check(self):
+            self.assertEqual(len(self.target.scenarios), 5)
+            for scenario in self.target.scenarios[1:4]:
+                scenario.status = 'pass'
+            self.assertEqual(self.target.rollup.count('pass'), 3)
+            self.assertEqual(self.target.rollup.count(None), 2)
+
+    @scenario("Appending outlines to a story in a catalogue")
+    class Catalogue(Scenario):
+
+        @when("Criteria are appended to a story in a catalogue")
+        def parse(self):
+            from corejet.core.model import RequirementsCatalogue, Epic
+            from corejet.core.parser import appendScenarios
+            self.catalogue = RequirementsCatalogue()
+            self.catalogue.epics.append(Epic(u'E1', u'First epic'))
+            self.catalogue.epics[0].stories.append(self.target)
+            appendScenarios(self.target, TEXT)
+
+        @then("The scenarios are found through their outline and counted")
+        def check(self):
+            scenario = self.catalogue.getScenario(u'S1', u'Counting apples #02')
+            self.assertEqual(scenario.thens[0].text, u'I have 4 apples')
+            self.assertEqual(self.catalogue.getScenario(u'S1', u'Counting apples #04'),
+                             None)
+            self.assertEqual(self.catalogue.rollup.scenarios, 5)
+            self.assertEqual(len(self.target._scenarios), 2)
+            self.assertEqual(len(self.catalogue._scenariosByKey), 2)
+
+        @then("The status of a generated scenario is kept")
+        def status(self):
+            fingerprint = self.target.fingerprint
+            self.catalogue.getScenario(u'S1', u'Counting apples #02').status = 'pass'
+            self.assertEqual(self.catalogue.getScenario(u'S1', u'Counting apples #02').status,
+                             'pass')
+            self.assertEqual(self.target.scenarios[2].status, 'pass')
+            self.assertEqual(self.catalogue.rollup.count('pass'), 1)
+            self.assertEqual(self.catalogue.rollup.count(None), 4)
+            self.assertNotEqual(self.target.fingerprint, fingerprint)
+
+        @then("Stories keep their outlines when added to a catalogue")
+        def attach(self):
+            from corejet.core.model import Story
+            from corejet.core.parser import appendScenarios
+            story = Story(u'S2', u'Second story')
+            appendScenarios(story, table(3))
+            self.catalogue.epics[0].stories.append(story)
+            self.assertEqual(len(story._outlines), 1)
+            self.assertEqual(self.catalogue.getScenario(u'S2', u'Adding #03').name,
+                             u'Adding #03')
+            self.assertEqual(self.catalogue.rollup.scenarios, 8)
+            self.assertEqual(len(self.catalogue._scenariosByKey), 2)
+
+        @then("Outlines can be expanded into stored scenarios")
+        def expand(self):
+            self.target.expandOutlines()
+            self.assertEqual(self.target._outlines, None)
+            self.assertEqual(len(self.target._scenarios), 5)
+            self.assertEqual(self.target.scenarios[2].status, 'pass')
+            self.assertEqual(len(self.catalogue._scenariosByKey), 5)
+            self.assertEqual(self.catalogue.rollup.scenarios, 8)
+            self.assertEqual(self.catalogue.rollup.count('pass'), 1)
+
+    @scenario("Applying changes to generated scenarios")
+    class Apply(Scenario):
+
+        @given("Two catalogues with an outline")
+        def create(self):
+            from corejet.core.model import RequirementsCatalogue, Epic, Story
+            from corejet.core.parser import appendScenarios
+            self.catalogues = []
+            for n in range(2):
+                story = Story(u'S1', u'First story')
+                appendScenarios(story, TEXT)
+                catalogue = RequirementsCatalogue(epics=[Epic(u'E1', u'First epic')])
+                catalogue.epics[0].stories.append(story)
+                self.catalogues.append(catalogue)
+            old, new = self.catalogues
+            del new.getStory(u'S1').scenarios[1]
+            new.getScenario(u'S1', u'Counting apples #03').status = 'fail'
+
+        @when("The differences are applied to the old catalogue")
+        def apply(self):
+            from corejet.core.diff import diffCatalogues
+            old, new = self.catalogues
+            diffCatalogues(old, new).apply(old)
+
+        @then("The catalogues are the same")
+        def check(self):
+            old, new = self.catalogues
+            self.assertEqual(old.fingerprint, new.fingerprint)
+            self.assertEqual([s.name for s in old.getStory(u'S1').scenarios],
+                             [u'Before', u'Counting apples #02',
+                              u'Counting apples #03', u'After'])
+
+    @scenario("Appending outlines to another kind of story")
+    class Other(Scenario):
+
+        @given("A story without appendOutline()")
+        def create(self):
+            class Other(object):
+                def __init__(self):
+                    self.givens, self.whens, self.thens = [], [], []
+                    self.scenarios = []
+            self.other = Other()
+
+        @when("Criteria with an outline are appended")
+        def parse(self):
+            from corejet.core.parser import appendScenarios
+            appendScenarios(self.other, TEXT)
+
+        @then("The scenarios of the outline are appended in its place")
+        def check(self):
+            self.assertEqual([s.name for s in self.other.scenarios], [
+                u'Before', u'Counting apples #01', u'Counting apples #02',
+                u'Counting apples #03', u'After'])
+
+@story(id="examples-2", title="As a developer, I can substitute example values into outline steps")
+class Templates(unittest.TestCase):
+
+    @given("An outline with awkward placeholders")
+    def create(self):
+        from corejet.core.model import ScenarioOutline, ExampleTable, Step
+        self.outline = ScenarioOutline(u'Odd', givens=[
+            Step(u'<a> then <b> and <a.*> and <c>', None),
+            Step(u'no placeholders', 'given'),
+        ], examples=ExampleTable([u'a', u'b', u'a.*'], [
+            (u'<b>', u'B', u'star',),
+            (u'x', None, u'y',),
+        ]))
+
+    @scenario("Rendering examples")
+    class Render(Scenario):
+
+        @when("The scenarios are generated")
+        def generate(self):
+            self.scenarios = list(self.outline)
+
+        @then("Each placeholder is replaced by its own value only")
+        def check(self):
+            self.assertEqual([s.givens[0].text for s in self.scenarios], [
+                u'<b> then B and star and <c>',
+                u'x then <b> and y and <c>',
+            ])
+            self.assertEqual(self.outline.scenario(1).givens[0].text,
+                             self.scenarios[1].givens[0].text)
+
+        @then("Steps without placeholders share their text")
+        def shared(self):
+            self.assertTrue(self.scenarios[0].givens[1].text is
+                            self.outline.givens[1].text)
+
+    @scenario("Reusing compiled templates")
+    class Reuse(Scenario):
+
+        @when("Scenarios are generated one at a time")
+        def generate(self):
+            self.first = self.outline.scenario(0)
+            self.templates = self.outline._compiled()
+
+        @then("The templates are compiled once")
+        def check(self):
+            self.outline.scenario(1)
+            self.outline.getScenario(u'Odd #01')
+            list(self.outline)
+            self.assertTrue(self.outline._compiled() is self.templates)
+
+        @then("They are compiled again when a column is added")
+        def column(self):
+            self.outline.examples.addColumn(u'c')
+            self.assertEqual(self.outline.scenario(0).givens[0].text,
+                             u'<b> then B and star and <c>')
+            self.assertFalse(self.outline._compiled() is self.templates)
+            self.outline.examples.column(u'c')[0] = u'C'
+            self.assertEqual(self.outline.scenario(0).givens[0].text,
+                             u'<b> then B and star and C')
+
+        @then("They are compiled again when a step changes")
+        def steps(self):
+            from corejet.core.model import Step
+            self.outline.givens[1].text = u'<b> at last'
+            self.assertEqual(self.outline.scenario(0).givens[1].text,
+                             u'B at last')
+            self.outline.thens.append(Step(u'then <a>', 'given'))
+            self.assertEqual(self.outline.scenario(1).thens[0].text,
+                             u'then x')
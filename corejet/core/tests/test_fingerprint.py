@@ -0,0 +1,141 @@
+import unittest2 as unittest
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+def buildCatalogue(text=str):
+    from corejet.core.model import RequirementsCatalogue, Epic, Story
+    from corejet.core.model import Scenario, Step
+
+    catalogue = RequirementsCatalogue(project=text('Test'))
+    for e in range(2):
+        epic = Epic(text('E%d' % e), text('Epic %d' % e))
+        catalogue.epics.append(epic)
+        for s in range(2):
+            story = Story(text('E%d-S%d' % (e, s,)), text('Story %d' % s),
+                          points=1, status=text('open'))
+            epic.stories.append(story)
+            for n in range(2):
+                story.scenarios.append(Scenario(text('Scenario %d' % n),
+                    status=text('pass'),
+                    givens=[Step(text('a given'), 'given')],
+                    whens=[Step(text('a when'), 'when')],
+                    thens=[Step(text('a then %d' % n), 'then')],
+                ))
+    return catalogue
+
+@story(id="fingerprint-1", title="As a developer, I can tell which parts of a catalogue changed")
+class Fingerprints(unittest.TestCase):
+
+    @scenario("Equal catalogues")
+    class Equal(Scenario):
+
+        @given("Two catalogues built from the same content")
+        def build(self):
+            self.first = buildCatalogue()
+            self.second = buildCatalogue()
+            self.third = buildCatalogue(unicode)
+
+        @then("They have the same fingerprint, whether their text is str or unicode")
+        def check(self):
+            self.assertEqual(self.first.fingerprint, self.second.fingerprint)
+            self.assertEqual(self.first.fingerprint, self.third.fingerprint)
+            self.assertEqual(self.first.epics[1].stories[0].fingerprint,
+                             self.third.epics[1].stories[0].fingerprint)
+
+    @scenario("Changing a step")
+    class ChangeStep(Scenario):
+
+        @given("A catalogue whose fingerprints have been computed")
+        def build(self):
+            self.catalogue = buildCatalogue()
+            self.before = self.fingerprints()
+
+        @when("The text of a step in one scenario is changed")
+        def change(self):
+            self.catalogue.epics[0].stories[1].scenarios[0].thens[0].text = 'changed'
+
+        @then("The fingerprints of the scenario and its ancestors change")
+        def checkChanged(self):
+            after = self.fingerprints()
+            for key in ('catalogue', 'epic0', 'story1', 'scenario0',):
+                self.assertNotEqual(self.before[key], after[key], key)
+
+        @then("The fingerprints of its siblings do not")
+        def checkUnchanged(self):
+            after = self.fingerprints()
+            for key in ('epic1', 'story0', 'scenario1',):
+                self.assertEqual(self.before[key], after[key], key)
+
+        def fingerprints(self):
+            epic = self.catalogue.epics[0]
+            story = epic.stories[1]
+            return dict(
+                catalogue=self.catalogue.fingerprint,
+                epic0=epic.fingerprint,
+                epic1=self.catalogue.epics[1].fingerprint,
+                story0=epic.stories[0].fingerprint,
+                story1=story.fingerprint,
+                scenario0=story.scenarios[0].fingerprint,
+                scenario1=story.scenarios[1].fingerprint,
+            )
+
+    @scenario("Changing attributes and children")
+    class ChangeNodes(Scenario):
+
+        @given("A catalogue whose fingerprint has been computed")
+        def build(self):
+            self.catalogue = buildCatalogue()
+            self.fingerprint = self.catalogue.fingerprint
+
+        @then("Changing a scenario status changes the fingerprint")
+        def status(self):
+            self.catalogue.epics[1].stories[1].scenarios[1].status = 'fail'
+            self.assertChanged()
+
+        @then("Changing story points changes the fingerprint")
+        def points(self):
+            self.catalogue.epics[0].stories[0].points = 3
+            self.assertChanged()
+
+        @then("Appending a step changes the fingerprint")
+        def appendStep(self):
+            from corejet.core.model import Step
+            self.catalogue.epics[0].stories[0].givens.append(Step('new', 'given'))
+            self.assertChanged()
+
+        @then("Removing a scenario changes the fingerprint")
+        def removeScenario(self):
+            del self.catalogue.epics[1].stories[0].scenarios[0]
+            self.assertChanged()
+
+        @then("Reordering stories changes the fingerprint")
+        def reorder(self):
+            self.catalogue.epics[1].stories.reverse()
+            self.assertChanged()
+
+        @then("Changing the test time does not change the fingerprint")
+        def testTime(self):
+            import datetime
+            self.catalogue.testTime = datetime.datetime(2016, 1, 1)
+            self.assertEqual(self.catalogue.fingerprint, self.fingerprint)
+
+        def assertChanged(self):
+            fingerprint = self.catalogue.fingerprint
+            self.assertNotEqual(fingerprint, self.fingerprint)
+            self.fingerprint = fingerprint
+
+    @scenario("Fingerprints survive caching")
+    class Cache(Scenario):
+
+        @given("A catalogue")
+        def build(self):
+            self.catalogue = buildCatalogue()
+
+        @when("It is round-tripped through the binary cache format")
+        def roundTrip(self):
+            from corejet.core.cache import dumps, loads
+            self.copy = loads(dumps(self.catalogue))
+
+        @then("The copy has the same fingerprint")
+        def check(self):
+            self.assertEqual(self.copy.fingerprint, self.catalogue.fingerprint)
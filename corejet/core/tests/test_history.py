@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import datetime
+import unittest2 as unittest
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+def catalogue(day, statuses):
+    """Build a catalogue tested on the given day of January 2011.
+    ``statuses`` maps (epic, story, scenario) to a status.
+    """
+    from corejet.core.model import RequirementsCatalogue, Epic, Story
+    from corejet.core.model import Scenario
+    result = RequirementsCatalogue(project='Test',
+        testTime=datetime.datetime(2011, 1, day, 12, 0))
+    epics = {}
+    stories = {}
+    for (epicId, storyId, name), status in sorted(statuses.items()):
+        if epicId not in epics:
+            epics[epicId] = Epic(epicId, 'Epic')
+            result.epics.append(epics[epicId])
+        if storyId not in stories:
+            stories[storyId] = Story(storyId, 'Story')
+            epics[epicId].stories.append(stories[storyId])
+        stories[storyId].scenarios.append(Scenario(name, status=status))
+    return result
+
+RUNS = [
+    {('E1', 'S1', 'A'): 'pass', ('E1', 'S1', 'B'): 'pass', ('E2', 'S2', 'C'): 'pending'},
+    {('E1', 'S1', 'A'): 'fail', ('E1', 'S1', 'B'): 'pass', ('E2', 'S2', 'C'): 'pass'},
+    {('E1', 'S1', 'A'): 'fail', ('E1', 'S1', 'B'): 'fail', ('E2', 'S2', 'C'): 'pass'},
+    {('E1', 'S1', 'A'): 'pass', ('E1', 'S1', 'B'): 'pass', ('E2', 'S2', 'C'): None},
+]
+
+@story(id="history-1", title="As a developer, I can query the history of test runs")
+class History(unittest.TestCase):
+
+    @given("A history with four recorded runs")
+    def record(self):
+        from corejet.core.history import RunHistory
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'history.db')
+        history = RunHistory(self.path)
+        for day, statuses in enumerate(RUNS):
+            history.record(catalogue(day + 1, statuses))
+        history.close()
+        self.history = RunHistory(self.path)
+
+    @then("Clean up")
+    def cleanUp(self):
+        self.history.close()
+        shutil.rmtree(self.tmpdir)
+
+    @scenario("Runs")
+    class Runs(Scenario):
+
+        @then("Runs are listed oldest first")
+        def runs(self):
+            self.assertEqual([t.day for t in self.history.runs()], [1, 2, 3, 4])
+            self.assertEqual([t.day for t in self.history.runs(lastRuns=2)], [3, 4])
+
+        @then("A run cannot be recorded twice")
+        def appendOnly(self):
+            self.assertRaises(ValueError, self.history.record,
+                              catalogue(4, RUNS[0]))
+
+        @then("Times with a timezone are stored in UTC")
+        def utc(self):
+            from dateutil import tz
+            time = datetime.datetime(2011, 1, 10, 14, 0,
+                                     tzinfo=tz.tzoffset(None, 7200))
+            stored = self.history.record(catalogue(10, RUNS[0]), time=time)
+            self.assertEqual(stored, datetime.datetime(2011, 1, 10, 12, 0))
+
+    @scenario("Pass rates")
+    class PassRates(Scenario):
+
+        @then("Pass rates per epic cover all runs or the last few")
+        def rates(self):
+            self.assertEqual(self.history.passRates(),
+                             {'E1': 5 / 8.0, 'E2': 2 / 3.0})
+            self.assertEqual(self.history.passRates(lastRuns=2),
+                             {'E1': 2 / 4.0, 'E2': 1.0})
+
+        @then("Pass rates can be listed per run")
+        def byRun(self):
+            self.assertEqual([(t.day, rate) for t, rate in
+                              self.history.passRatesByRun('E1')],
+                             [(1, 1.0), (2, 0.5), (3, 0.0), (4, 1.0)])
+            self.assertEqual([(t.day, rate) for t, rate in
+                              self.history.passRatesByRun('E2', lastRuns=3)],
+                             [(2, 1.0), (3, 1.0)])
+
+    @scenario("Scenario history")
+    class Scenarios(Scenario):
+
+        @then("The first failure of a scenario can be found")
+        def firstFailure(self):
+            self.assertEqual(self.history.firstFailure('S1', 'A').day, 2)
+            self.assertEqual(self.history.firstFailure('S1', 'B').day, 3)
+            self.assertEqual(self.history.firstFailure('S2', 'C'), None)
+
+        @then("The statuses of a scenario can be listed")
+        def statuses(self):
+            self.assertEqual([(t.day, s) for t, s in
+                              self.history.statuses('S2', 'C', lastRuns=3)],
+                             [(2, 'pass'), (3, 'pass'), (4, None)])
@@ -0,0 +1,103 @@
+import unittest2 as unittest
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+@story(id="index-1", title="As a developer, I can look up stories and scenarios in a catalogue")
+class Lookup(unittest.TestCase):
+
+    @given("A requirements catalogue containing user requirements")
+    def create(self):
+        from corejet.core.model import RequirementsCatalogue
+        from corejet.core.model import Epic, Story, Scenario
+
+        self.catalogue = RequirementsCatalogue(project="Test project")
+
+        self.epic1 = Epic("E1", "First epic")
+        self.catalogue.epics.append(self.epic1)
+
+        self.story1 = Story("S1", "First story", status="open",
+            priority="high", epic=self.epic1)
+        self.epic1.stories.append(self.story1)
+
+        self.story2 = Story("S2", "Second story", status="closed",
+            priority="high", epic=self.epic1)
+        self.epic1.stories.append(self.story2)
+
+        self.scenario1 = Scenario("First scenario", story=self.story1)
+        self.story1.scenarios.append(self.scenario1)
+
+    @scenario("Lookup after construction")
+    class Constructed(Scenario):
+
+        @when("Nothing else happens")
+        def nothing(self):
+            pass
+
+        @then("Stories and scenarios can be found by key")
+        def check(self):
+            self.assertTrue(self.catalogue.getStory("S1") is self.story1)
+            self.assertTrue(self.catalogue.getStory("S2") is self.story2)
+            self.assertEqual(self.catalogue.getStory("S3"), None)
+            self.assertTrue(self.catalogue.getScenario("S1", "First scenario") is self.scenario1)
+            self.assertEqual(self.catalogue.getScenario("S2", "First scenario"), None)
+            self.assertEqual(self.catalogue.storiesByStatus("open"), [self.story1])
+            self.assertEqual(self.catalogue.storiesByPriority("high"), [self.story1, self.story2])
+            self.assertEqual(self.catalogue.storiesByPriority("low"), [])
+
+    @scenario("Appending epics, stories and scenarios")
+    class Appending(Scenario):
+
+        @when("An epic with a story is appended and a scenario is added to an existing story")
+        def append(self):
+            from corejet.core.model import Epic, Story, Scenario
+            self.story3 = Story("S3", "Third story", status="open")
+            self.catalogue.epics.append(Epic("E2", "Second epic", stories=[self.story3]))
+            self.scenario2 = Scenario("Second scenario", story=self.story2)
+            self.story2.scenarios.append(self.scenario2)
+
+        @then("The new nodes can be found")
+        def check(self):
+            self.assertTrue(self.catalogue.getStory("S3") is self.story3)
+            self.assertTrue(self.catalogue.getScenario("S2", "Second scenario") is self.scenario2)
+            self.assertEqual(self.catalogue.storiesByStatus("open"), [self.story1, self.story3])
+
+    @scenario("Removing and changing nodes")
+    class Changing(Scenario):
+
+        @when("A story is removed, another story's status changes and a scenario is renamed")
+        def change(self):
+            self.epic1.stories.remove(self.story2)
+            self.story1.status = "closed"
+            self.scenario1.name = "Renamed scenario"
+
+        @then("The indexes reflect the changes")
+        def check(self):
+            self.assertEqual(self.catalogue.getStory("S2"), None)
+            self.assertEqual(self.catalogue.storiesByStatus("open"), [])
+            self.assertEqual(self.catalogue.storiesByStatus("closed"), [self.story1])
+            self.assertEqual(self.catalogue.getScenario("S1", "First scenario"), None)
+            self.assertTrue(self.catalogue.getScenario("S1", "Renamed scenario") is self.scenario1)
+
+    @scenario("Populating from XML")
+    class Populating(Scenario):
+
+        @when("The catalogue is populated from XML")
+        def populate(self):
+            from StringIO import StringIO
+            self.catalogue.populate(StringIO("""\
+<requirementscatalogue>
+  <epic id="E9" title="Other epic">
+    <story id="S9" title="Other story" priority="low">
+      <scenario name="Other scenario" />
+    </story>
+  </epic>
+</requirementscatalogue>
+"""))
+
+        @then("Only the populated nodes can be found")
+        def check(self):
+            self.assertEqual(self.catalogue.getStory("S1"), None)
+            self.assertEqual(self.catalogue.getStory("S9").title, "Other story")
+            self.assertEqual(self.catalogue.getScenario("S9", "Other scenario").name, "Other scenario")
+            self.assertEqual(self.catalogue.storiesByPriority("high"), [])
+            self.assertEqual(len(self.catalogue.storiesByPriority("low")), 1)
@@ -0,0 +1,93 @@
+import os
+import gzip
+import shutil
+import tempfile
+import unittest2 as unittest
+import lxml.etree
+from StringIO import StringIO
+
+from corejet.core import Scenario, story, scenario, given, when, then
+from corejet.core.model import lzma
+
+XML = """\
+<requirementscatalogue project="Test project" extractTime="2011-01-02T12:01:00">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story" points="3" requirementStatus="open" priority="high">
+      <scenario name="First scenario" testStatus="pass">
+        <given>something</given>
+        <when>something happens</when>
+        <then>do something</then>
+      </scenario>
+    </story>
+  </epic>
+</requirementscatalogue>
+"""
+
+def serialized(input):
+    from corejet.core.model import RequirementsCatalogue
+    catalogue = RequirementsCatalogue()
+    catalogue.populate(input)
+    return lxml.etree.tostring(catalogue.serialize())
+
+@story(id="input-1", title="As a developer, I can populate a catalogue from a file name")
+class FileInput(unittest.TestCase):
+
+    @given("A working directory and a catalogue read from a file-like object")
+    def workingDirectory(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.expected = serialized(StringIO(XML))
+
+    @then("Clean up")
+    def cleanUp(self):
+        shutil.rmtree(self.tmpdir)
+
+    @scenario("Uncompressed file")
+    class Plain(Scenario):
+
+        @when("A catalogue is written to an uncompressed file")
+        def write(self):
+            self.path = os.path.join(self.tmpdir, 'corejet.xml')
+            with open(self.path, 'wb') as f:
+                f.write(XML)
+
+        @then("It can be populated from the file name")
+        def populate(self):
+            self.assertEqual(serialized(self.path), self.expected)
+
+        @then("An empty file is reported as a parse error")
+        def empty(self):
+            from corejet.core.model import RequirementsCatalogue
+            path = os.path.join(self.tmpdir, 'empty.xml')
+            open(path, 'wb').close()
+            self.assertRaises(lxml.etree.XMLSyntaxError,
+                              RequirementsCatalogue().populate, path)
+
+    @scenario("Gzip-compressed file")
+    class Gzip(Scenario):
+
+        @when("A catalogue is written to a gzip-compressed file")
+        def write(self):
+            self.path = os.path.join(self.tmpdir, 'corejet.xml.gz')
+            f = gzip.open(self.path, 'wb')
+            f.write(XML)
+            f.close()
+
+        @then("It can be populated from the file name")
+        def populate(self):
+            self.assertEqual(serialized(self.path), self.expected)
+
+    @scenario("Xz-compressed file")
+    class Xz(Scenario):
+
+        @when("A catalogue is written to an xz-compressed file")
+        def write(self):
+            if lzma is None:
+                self.story.skipTest("lzma is not available")
+            self.path = os.path.join(self.tmpdir, 'corejet.xml.xz')
+            f = lzma.LZMAFile(self.path, 'wb')
+            f.write(XML)
+            f.close()
+
+        @then("It can be populated from the file name")
+        def populate(self):
+            self.assertEqual(serialized(self.path), self.expected)
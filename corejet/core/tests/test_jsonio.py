@@ -0,0 +1,123 @@
+import json
+import unittest2 as unittest
+import lxml.etree
+from StringIO import StringIO
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+XML = """\
+<requirementscatalogue project="Test project" extractTime="2011-01-02T12:01:00+02:00" testTime="2011-01-02T12:05:00">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story" points="3" requirementStatus="open" priority="high">
+      <given>some background</given>
+      <when>a story-level event</when>
+      <scenario name="First scenario" testStatus="pass">
+        <given>something</given>
+        <when>something happens</when>
+        <then>do something</then>
+        <then>and something \xc3\xa9lse</then>
+      </scenario>
+      <scenario name="Second scenario"/>
+    </story>
+    <story id="S2" title="Second story" points="3" requirementStatus="closed" requirementResolution="fixed" priority="high"/>
+  </epic>
+  <epic id="E2" title="Second epic"/>
+  <epic id="E3" title="Third epic">
+    <story id="S3" title="Third story"/>
+  </epic>
+</requirementscatalogue>
+"""
+
+def parse(xml):
+    from corejet.core.model import RequirementsCatalogue
+    catalogue = RequirementsCatalogue()
+    catalogue.populate(StringIO(xml))
+    return catalogue
+
+def toXML(catalogue):
+    return lxml.etree.tostring(catalogue.serialize(), encoding='utf-8')
+
+@story(id="json-1", title="As a developer, I can exchange catalogues as JSON")
+class JSONFormats(unittest.TestCase):
+
+    @given("A catalogue parsed from XML")
+    def create(self):
+        self.catalogue = parse(XML)
+
+    @scenario("JSON round trip")
+    class JSON(Scenario):
+
+        @when("It is written as JSON")
+        def write(self):
+            from corejet.core.jsonio import writeJSON
+            out = StringIO()
+            writeJSON(self.catalogue, out)
+            self.output = out.getvalue()
+
+        @then("The output is a valid JSON document using the XML attribute names")
+        def valid(self):
+            data = json.loads(self.output)
+            self.assertEqual(data['project'], 'Test project')
+            story = data['epics'][0]['stories'][1]
+            self.assertEqual(story['requirementResolution'], 'fixed')
+            self.assertEqual(story['points'], 3)
+            self.assertEqual(data['epics'][1]['stories'], [])
+
+        @then("Reading it back gives the same XML")
+        def roundTrip(self):
+            from corejet.core.jsonio import readJSON
+            copy = readJSON(StringIO(self.output))
+            self.assertEqual(toXML(copy), toXML(self.catalogue))
+            self.assertEqual(copy.extractTime, self.catalogue.extractTime)
+            self.assertEqual(copy.fingerprint, self.catalogue.fingerprint)
+
+    @scenario("JSON Lines round trip")
+    class JSONLines(Scenario):
+
+        @when("It is written as JSON Lines")
+        def write(self):
+            from corejet.core.jsonio import writeJSONLines
+            out = StringIO()
+            writeJSONLines(self.catalogue, out)
+            self.output = out.getvalue()
+
+        @then("There is one line for the catalogue, each epic and each story")
+        def lines(self):
+            lines = [json.loads(line) for line in self.output.splitlines()]
+            self.assertEqual([line['type'] for line in lines],
+                ['catalogue', 'epic', 'story', 'story', 'epic', 'epic', 'story'])
+
+        @then("Reading it back gives the same XML")
+        def roundTrip(self):
+            from corejet.core.jsonio import readJSONLines
+            copy = readJSONLines(StringIO(self.output))
+            self.assertEqual(toXML(copy), toXML(self.catalogue))
+            self.assertEqual(copy.getStory('S3').epic.name, 'E3')
+
+        @then("It can be read one story at a time")
+        def stream(self):
+            from corejet.core.jsonio import JSONLinesReader
+            reader = JSONLinesReader(StringIO(self.output))
+            self.assertEqual(reader.project, 'Test project')
+            stories = [(story.epic.name, story.name, len(story.epic.stories),)
+                       for story in reader]
+            self.assertEqual(stories,
+                [('E1', 'S1', 0,), ('E1', 'S2', 0,), ('E3', 'S3', 0,)])
+
+        @then("Stories can be written one at a time")
+        def writer(self):
+            from corejet.core.model import Epic
+            from corejet.core.jsonio import JSONLinesWriter, JSONLinesReader
+            out = StringIO()
+            writer = JSONLinesWriter(out, project='Streamed')
+            for item in JSONLinesReader(StringIO(self.output)).iterItems():
+                if isinstance(item, Epic):
+                    writer.writeEpic(item)
+                else:
+                    writer.writeStory(item)
+            from corejet.core.jsonio import readJSONLines
+            copy = readJSONLines(StringIO(out.getvalue()))
+            self.assertEqual(copy.project, 'Streamed')
+            self.assertEqual(copy.testTime, None)
+            self.assertEqual([e.fingerprint for e in copy.epics],
+                             [e.fingerprint for e in self.catalogue.epics])
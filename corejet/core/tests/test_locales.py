@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import os
+import struct
+import shutil
+import tempfile
+import unittest2 as unittest
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+SWEDISH = {
+    u'Scenario': u'Scenario',
+    u'Scenario Outline': u'Abstrakt Scenario',
+    u'Examples': u'Exempel',
+    u'Given': u'Givet',
+    u'When': u'När',
+    u'Then': u'Så',
+    u'And': u'Och',
+    u'But': u'Men',
+}
+
+def writeCatalogue(localeDir, language, messages):
+    """Write a minimal gettext .mo file for the given messages
+    """
+    directory = os.path.join(localeDir, language, 'LC_MESSAGES')
+    os.makedirs(directory)
+    messages = dict(messages)
+    messages[u''] = u'Content-Type: text/plain; charset=utf-8\n'
+    keys = sorted(messages.keys())
+    ids = strs = ''
+    offsets = []
+    for key in keys:
+        msgid, msgstr = key.encode('utf-8'), messages[key].encode('utf-8')
+        offsets.append((len(ids), len(msgid), len(strs), len(msgstr),))
+        ids += msgid + '\0'
+        strs += msgstr + '\0'
+    keyStart = 7 * 4 + 16 * len(keys)
+    valueStart = keyStart + len(ids)
+    keyOffsets = []
+    valueOffsets = []
+    for o1, l1, o2, l2 in offsets:
+        keyOffsets += [l1, o1 + keyStart]
+        valueOffsets += [l2, o2 + valueStart]
+    output = struct.pack('Iiiiiii', 0x950412deL, 0, len(keys),
+                         7 * 4, 7 * 4 + len(keys) * 8, 0, 0)
+    output += struct.pack('%di' % len(keyOffsets), *keyOffsets)
+    output += struct.pack('%di' % len(valueOffsets), *valueOffsets)
+    f = open(os.path.join(directory, 'gherkin.mo'), 'wb')
+    try:
+        f.write(output + ids + strs)
+    finally:
+        f.close()
+
+@story(id="locales-1", title="As a developer, I can add languages to the scenario parser")
+class Locales(unittest.TestCase):
+
+    @given("A locale directory with a Swedish catalogue")
+    def create(self):
+        self.localeDir = tempfile.mkdtemp()
+        writeCatalogue(self.localeDir, 'sv', SWEDISH)
+
+    @then("Clean up")
+    def cleanUp(self):
+        shutil.rmtree(self.localeDir)
+
+    @scenario("Discovering locales lazily")
+    class Discovery(Scenario):
+
+        @when("A registry is created for the locale directory")
+        def create(self):
+            from corejet.core.parser import LocaleRegistry
+            self.registry = LocaleRegistry([self.localeDir], None)
+
+        @then("Languages are listed without loading them")
+        def languages(self):
+            self.assertEqual(self.registry.languages(), ['en', 'sv'])
+            self.assertEqual(self.registry._translations, {})
+
+        @then("A language is loaded and compiled on first use")
+        def load(self):
+            classifier = self.registry.classifier('sv')
+            self.assertTrue(classifier is self.registry.classifier('sv'))
+            self.assertEqual(sorted(self.registry._translations), ['sv'])
+            self.assertEqual(classifier.classify(u'Givet en användare'),
+                             (u'given', u'en användare'))
+            self.assertEqual(classifier.classify(u'Abstrakt Scenario: Äpplen'),
+                             (u'outline', u'Äpplen'))
+
+        @then("English works without a catalogue")
+        def english(self):
+            self.assertTrue('en' in self.registry)
+            self.assertFalse('de' in self.registry)
+            self.assertTrue(self.registry.classifier('de') is
+                            self.registry.classifier('en'))
+            self.assertEqual(self.registry.classifier().classify(u'Given x'),
+                             (u'given', u'x'))
+
+    @scenario("Registering locales")
+    class Register(Scenario):
+
+        @when("A locale directory is registered for a language")
+        def register(self):
+            from corejet.core.parser import LocaleRegistry
+            self.registry = LocaleRegistry([], None)
+            self.before = 'sv' in self.registry
+            self.registry.register('sv', self.localeDir)
+
+        @then("The language becomes available")
+        def check(self):
+            self.assertFalse(self.before)
+            self.assertTrue('sv' in self.registry)
+            self.assertEqual(self.registry.languages(), ['en', 'sv'])
+            self.assertEqual(self.registry.classifier('sv').classify(u'Så klart'),
+                             (u'then', u'klart'))
+
+    @scenario("Locales from entry points")
+    class EntryPoints(Scenario):
+
+        @when("A distribution provides a locale with an entry point")
+        def install(self):
+            import pkg_resources
+            import corejet.core.tests
+            from corejet.core.parser import LocaleRegistry
+            corejet.core.tests.SWEDISH_LOCALES = self.localeDir
+            dist = pkg_resources.Distribution(self.localeDir,
+                project_name='corejet.core.tests.locales', version='1.0')
+            entryPoint = pkg_resources.EntryPoint.parse(
+                'sv = corejet.core.tests:SWEDISH_LOCALES', dist=dist)
+            dist._ep_map = {'corejet.core.locales': {'sv': entryPoint}}
+            # A separate working set, so the distribution is not installed
+            # for real
+            workingSet = pkg_resources.WorkingSet([])
+            workingSet.add(dist)
+            self.iterEntryPoints = pkg_resources.iter_entry_points
+            pkg_resources.iter_entry_points = workingSet.iter_entry_points
+            self.registry = LocaleRegistry([])
+
+        @then("The language is found through the entry point")
+        def check(self):
+            import pkg_resources
+            try:
+                self.assertEqual(self.registry.languages(), ['en', 'sv'])
+                self.assertEqual(
+                    self.registry.classifier('sv').classify(u'Och y'),
+                    (u'and', u'y'))
+            finally:
+                pkg_resources.iter_entry_points = self.iterEntryPoints
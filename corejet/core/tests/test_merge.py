@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import unittest2 as unittest
+import lxml.etree
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+FIRST = """\
+<requirementscatalogue project="Team A" extractTime="2011-01-02T12:01:00">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story" points="3" requirementStatus="open">
+      <scenario name="First scenario" testStatus="pass">
+        <given>something</given>
+      </scenario>
+    </story>
+    <story id="S2" title="Second story" points="1" requirementStatus="open"/>
+    <story id="S3" title="Third story" points="1" requirementStatus="open"/>
+  </epic>
+  <epic id="E2" title="Second epic">
+    <story id="S4" title="Fourth story"/>
+  </epic>
+</requirementscatalogue>
+"""
+
+SECOND = """\
+<requirementscatalogue project="Team B" testTime="2011-01-03T12:01:00">
+  <epic id="E3" title="Third epic">
+    <story id="S3" title="Third story, moved" points="2" requirementStatus="open"/>
+  </epic>
+  <epic id="E1" title="First epic, renamed">
+    <story id="S2" title="Second story, updated" points="5" requirementStatus="closed"/>
+    <story id="S5" title="Fifth story"/>
+  </epic>
+</requirementscatalogue>
+"""
+
+def parse(xml):
+    from StringIO import StringIO
+    from corejet.core.model import RequirementsCatalogue
+    catalogue = RequirementsCatalogue()
+    catalogue.populate(StringIO(xml))
+    return catalogue
+
+def outline(catalogue):
+    return [(epic.name, epic.title,
+             [(story.name, story.title,) for story in epic.stories],)
+            for epic in catalogue.epics]
+
+EXPECTED = [
+    ('E1', 'First epic, renamed', [
+        ('S1', 'First story',),
+        ('S2', 'Second story, updated',),
+        ('S5', 'Fifth story',),
+    ]),
+    ('E2', 'Second epic', [
+        ('S4', 'Fourth story',),
+    ]),
+    ('E3', 'Third epic', [
+        ('S3', 'Third story, moved',),
+    ]),
+]
+
+@story(id="merge-1", title="As a developer, I can merge several catalogues into one")
+class Merging(unittest.TestCase):
+
+    @scenario("Merging catalogues in memory")
+    class InMemory(Scenario):
+
+        @given("Two catalogues with overlapping epics and stories")
+        def create(self):
+            self.first = parse(FIRST)
+            self.second = parse(SECOND)
+
+        @when("They are merged")
+        def merge(self):
+            from corejet.core.merge import mergeCatalogues
+            self.merged = mergeCatalogues([self.first, self.second])
+
+        @then("Epics are de-duplicated by id, keeping their first position")
+        def epics(self):
+            self.assertEqual([e.name for e in self.merged.epics],
+                             ['E1', 'E2', 'E3'])
+
+        @then("Later stories replace earlier ones with the same id")
+        def stories(self):
+            self.assertEqual(outline(self.merged), EXPECTED)
+            self.assertEqual(self.merged.getStory('S2').points, 5)
+            self.assertTrue(self.merged.getStory('S3').epic is self.merged.epics[2])
+            self.assertEqual(len(self.merged.storiesByStatus('closed')), 1)
+            self.assertEqual(self.merged.getScenario('S1', 'First scenario').givens[0].text,
+                             'something')
+
+        @then("Catalogue attributes come from the last catalogue that sets them")
+        def attributes(self):
+            self.assertEqual(self.merged.project, 'Team B')
+            self.assertEqual(self.merged.extractTime.year, 2011)
+            self.assertEqual(self.merged.testTime.day, 3)
+
+    @scenario("Loading files in parallel")
+    class Parallel(Scenario):
+
+        @given("Catalogue files on disk")
+        def create(self):
+            self.tmpdir = tempfile.mkdtemp()
+            self.paths = []
+            for index, xml in enumerate((FIRST, SECOND,)):
+                path = os.path.join(self.tmpdir, 'team%d.xml' % index)
+                with open(path, 'w') as f:
+                    f.write(xml)
+                self.paths.append(path)
+
+        @when("They are loaded in a process pool and in this process")
+        def load(self):
+            from corejet.core.merge import loadCatalogues
+            from corejet.core.cache import CatalogueCache
+            try:
+                self.parallel = loadCatalogues(self.paths, processes=2)
+                self.serial = loadCatalogues(self.paths, processes=1)
+                self.cached = loadCatalogues(self.paths, processes=2,
+                    cache=CatalogueCache(os.path.join(self.tmpdir, 'cache')))
+            finally:
+                shutil.rmtree(self.tmpdir)
+
+        @then("The results are the same as merging in memory")
+        def check(self):
+            for catalogue in (self.parallel, self.serial, self.cached,):
+                self.assertEqual(outline(catalogue), EXPECTED)
+            self.assertEqual(lxml.etree.tostring(self.parallel.serialize()),
+                             lxml.etree.tostring(self.serial.serialize()))
+            self.assertEqual(lxml.etree.tostring(self.cached.serialize()),
+                             lxml.etree.tostring(self.serial.serialize()))
@@ -0,0 +1,42 @@
+import unittest2 as unittest
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+@story(id="model-1", title="As a developer, I can build a compact model")
+class CompactModel(unittest.TestCase):
+
+    @scenario("Quotes are replaced on construction")
+    class Quotes(Scenario):
+
+        @when("Model nodes are constructed with text containing double quotes")
+        def create(self):
+            from corejet.core.model import Epic, Story, Scenario, Step
+            self.epic = Epic('E"1', 'The "first" epic')
+            self.storyNode = Story('S"1', 'The "first" story', status='"open"')
+            self.scenario = Scenario('The "first" scenario', status='"pass"')
+            self.step = Step('a "quoted" step', 'given')
+
+        @then("Double quotes are replaced by apostrophes")
+        def check(self):
+            self.assertEqual(self.epic.name, "E'1")
+            self.assertEqual(self.epic.title, "The 'first' epic")
+            self.assertEqual(self.storyNode.name, "S'1")
+            self.assertEqual(self.storyNode.title, "The 'first' story")
+            self.assertEqual(self.storyNode.status, "'open'")
+            self.assertEqual(self.scenario.name, "The 'first' scenario")
+            self.assertEqual(self.scenario.status, "'pass'")
+            self.assertEqual(self.step.text, "a 'quoted' step")
+
+    @scenario("Nodes have no instance dictionary")
+    class Slots(Scenario):
+
+        @when("Model nodes are constructed")
+        def create(self):
+            from corejet.core.model import Epic, Story, Scenario, Step
+            self.nodes = [Epic('E1', 'Epic'), Story('S1', 'Story'),
+                          Scenario('Scenario'), Step('step', 'given')]
+
+        @then("They do not carry a __dict__")
+        def check(self):
+            for node in self.nodes:
+                self.assertFalse(hasattr(node, '__dict__'))
@@ -219,3 +219,46 @@ class XMLParsing(unittest.TestCase):
             self.assertEqual(self.catalogue.epics[0].stories[0].scenarios[1].thens[0].text, "do something")
             self.assertEqual(self.catalogue.epics[0].stories[0].scenarios[1].thens[1].text, "and something else")
 
+
+    @scenario("Story-level steps")
+    class StoryLevelSteps(Scenario):
+
+        @given("A requirements catalogue file with story-level steps")
+        def create(self):
+            with open(os.path.join(self.tmpdir, 'input.xml'), 'w') as f:
+                f.write("""\
+<requirementscatalogue project="Test project">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story">
+      <given>some background</given>
+      <when>something always happens</when>
+      <then>something is always true</then>
+      <scenario name="First scenario">
+        <given>something</given>
+        <when>something happens</when>
+        <then>do something</then>
+      </scenario>
+    </story>
+  </epic>
+</requirementscatalogue>
+""")
+
+        @when("The populate() method is called")
+        def serialize(self):
+            from corejet.core.model import RequirementsCatalogue
+            self.catalogue = RequirementsCatalogue()
+            with open(os.path.join(self.tmpdir, 'input.xml'), 'r') as f:
+                self.catalogue.populate(f)
+
+        @then("Story-level steps are kept apart from scenario steps")
+        def checkInput(self):
+            story = self.catalogue.epics[0].stories[0]
+
+            self.assertEqual([s.text for s in story.givens], ["some background"])
+            self.assertEqual([s.text for s in story.whens], ["something always happens"])
+            self.assertEqual([s.text for s in story.thens], ["something is always true"])
+
+            self.assertEqual(len(story.scenarios), 1)
+            self.assertEqual([s.text for s in story.scenarios[0].givens], ["something"])
+            self.assertEqual([s.text for s in story.scenarios[0].whens], ["something happens"])
+            self.assertEqual([s.text for s in story.scenarios[0].thens], ["do something"])
@@ -0,0 +1,146 @@
+import shutil
+import tempfile
+import unittest2 as unittest
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+TEXT = u"""\
+Given a logged-in user
+
+Scenario: Logging out
+When the user logs out
+Then the login page is shown
+
+Scenario Outline: Adding items
+Given <start> items
+When the user adds <added> items
+Then there are <total> items
+
+Examples:
+| start | added | total |
+| 1     | 2     | 3     |
+| 4     | 5     | 9     |
+
+Scenario: Closing the basket
+When the user closes the basket
+ And the user logs out
+Then the basket is closed
+"""
+
+def stepTypes(steps):
+    return [(step.text, step.step_type,) for step in steps]
+
+@story(id="parsecache-1", title="As a developer, I can parse unchanged acceptance criteria only once")
+class ParseCaching(unittest.TestCase):
+
+    @given("A cache directory")
+    def create(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    @then("Clean up")
+    def cleanUp(self):
+        shutil.rmtree(self.tmpdir)
+
+    @scenario("Parsing once")
+    class Memory(Scenario):
+
+        @given("A parse cache without a directory")
+        def create(self):
+            from corejet.core.parsecache import ParseCache
+            self.cache = ParseCache()
+
+        @when("The same text is appended to two stories")
+        def append(self):
+            from corejet.core.model import Story
+            from corejet.core.parser import appendScenarios
+            self.parsed = Story(u'S1', u'First story')
+            appendScenarios(self.parsed, TEXT)
+            self.first = Story(u'S1', u'First story')
+            self.second = Story(u'S1', u'First story')
+            self.cache.appendScenarios(self.first, TEXT)
+            self.cache.appendScenarios(self.second, TEXT)
+
+        @then("The text is parsed once")
+        def counts(self):
+            self.assertEqual(self.cache.misses, 1)
+            self.assertEqual(self.cache.hits, 1)
+
+        @then("Both stories get the same steps and scenarios as the parser gives")
+        def check(self):
+            for target in (self.first, self.second,):
+                self.assertEqual(target.fingerprint, self.parsed.fingerprint)
+                self.assertEqual(stepTypes(target.givens),
+                                 stepTypes(self.parsed.givens))
+                self.assertEqual([s.name for s in target.scenarios], [
+                    u'Logging out', u'Adding items #01', u'Adding items #02',
+                    u'Closing the basket'])
+                for scenario, expected in zip(target.scenarios,
+                                              self.parsed.scenarios):
+                    self.assertTrue(scenario.story is target)
+                    self.assertEqual(stepTypes(scenario.whens),
+                                     stepTypes(expected.whens))
+            self.assertFalse(self.first.scenarios[0] is
+                             self.second.scenarios[0])
+
+    @scenario("Least recently used texts are discarded")
+    class Evict(Scenario):
+
+        @given("A parse cache holding two results")
+        def create(self):
+            from corejet.core.parsecache import ParseCache
+            self.cache = ParseCache(size=2)
+
+        @when("Three texts are parsed, using the first one again before the third")
+        def parse(self):
+            self.texts = [u"Scenario: %d\nWhen %d\nThen %d" % (n, n, n)
+                          for n in range(3)]
+            self.cache.parse(self.texts[0])
+            self.cache.parse(self.texts[1])
+            self.cache.parse(self.texts[0])
+            self.cache.parse(self.texts[2])
+
+        @then("The second text is parsed again, but not the first")
+        def check(self):
+            self.assertEqual((self.cache.hits, self.cache.misses,), (1, 3,))
+            self.cache.parse(self.texts[0])
+            self.assertEqual((self.cache.hits, self.cache.misses,), (2, 3,))
+            self.cache.parse(self.texts[1])
+            self.assertEqual((self.cache.hits, self.cache.misses,), (2, 4,))
+
+    @scenario("Results on disk")
+    class Disk(Scenario):
+
+        @given("A text parsed through a cache with a directory")
+        def create(self):
+            from corejet.core.parsecache import ParseCache
+            ParseCache(self.tmpdir).parse(TEXT)
+
+        @when("It is parsed through a new cache for the same directory")
+        def parse(self):
+            from corejet.core.model import Story
+            from corejet.core.parsecache import ParseCache
+            self.cache = ParseCache(self.tmpdir)
+            self.target = Story(u'S1', u'First story')
+            self.cache.appendScenarios(self.target, TEXT)
+
+        @then("The result is read from disk")
+        def check(self):
+            self.assertEqual((self.cache.hits, self.cache.misses,), (1, 0,))
+            self.assertEqual(len(self.target.scenarios), 4)
+            self.assertEqual(self.target.scenarios[2].thens[0].text,
+                             u'there are 9 items')
+
+        @then("Another default language or parser version is parsed again")
+        def key(self):
+            from corejet.core import parsecache
+            cache = parsecache.ParseCache(self.tmpdir)
+            cache.parse(TEXT, 'fi')
+            self.assertEqual(cache.misses, 1)
+            version = parsecache.PARSER_VERSION
+            parsecache.PARSER_VERSION = version + 1
+            try:
+                cache.clear()
+                cache.parse(TEXT)
+            finally:
+                parsecache.PARSER_VERSION = version
+            self.assertEqual(cache.misses, 2)
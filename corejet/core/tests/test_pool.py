@@ -0,0 +1,70 @@
+import unittest2 as unittest
+from StringIO import StringIO
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+XML = """\
+<requirementscatalogue project="Test project">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story" priority="Critical">
+      <scenario name="Logging in" testStatus="pass">
+        <given>a "logged-in" user</given>
+        <when>the user logs out</when>
+      </scenario>
+    </story>
+    <story id="S2" title="Second story" priority="Critical">
+      <scenario name="Logging in" testStatus="pass">
+        <given>a "logged-in" user</given>
+        <when>the user logs out</when>
+      </scenario>
+    </story>
+  </epic>
+</requirementscatalogue>
+"""
+
+TEXT = u"""\
+Scenario: Logging in
+Given a 'logged-in' user
+When the user logs out
+Then the user sees the login page
+"""
+
+@story(id="pool-1", title="As a developer, I can share repeated text in a catalogue")
+class Pooling(unittest.TestCase):
+
+    @given("A text pool")
+    def create(self):
+        from corejet.core.model import TextPool
+        self.pool = TextPool()
+
+    @scenario("Populating a catalogue")
+    class Populate(Scenario):
+
+        @when("A catalogue with repeated text is populated using the pool")
+        def populate(self):
+            from corejet.core.model import RequirementsCatalogue
+            self.catalogue = RequirementsCatalogue()
+            self.catalogue.populate(StringIO(XML), pool=self.pool)
+
+        @then("Equal text is held by one object")
+        def check(self):
+            first = self.catalogue.getStory('S1').scenarios[0]
+            second = self.catalogue.getStory('S2').scenarios[0]
+            self.assertEqual(first.givens[0].text, "a 'logged-in' user")
+            self.assertTrue(first.givens[0].text is second.givens[0].text)
+            self.assertTrue(first.whens[0].text is second.whens[0].text)
+            self.assertTrue(first.name is second.name)
+            self.assertTrue(first.story.priority is second.story.priority)
+
+        @then("Text is shared with scenarios parsed later")
+        def parse(self):
+            from corejet.core.model import Story
+            from corejet.core.parser import appendScenarios
+            story = Story(u'S3', u'Third story')
+            appendScenarios(story, TEXT, pool=self.pool)
+            first = self.catalogue.getStory('S1').scenarios[0]
+            self.assertTrue(story.scenarios[0].name is first.name)
+            self.assertTrue(story.scenarios[0].givens[0].text is
+                            first.givens[0].text)
+            self.assertEqual(story.scenarios[0].thens[0].text,
+                             u'the user sees the login page')
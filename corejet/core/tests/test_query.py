@@ -0,0 +1,153 @@
+import unittest2 as unittest
+import lxml.etree
+from StringIO import StringIO
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+XML = """\
+<requirementscatalogue project="Test project">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story" points="3" requirementStatus="open" priority="Critical">
+      <given>some background</given>
+      <scenario name="First scenario" testStatus="fail"/>
+      <scenario name="Second scenario" testStatus="pass"/>
+      <scenario name="Third scenario" testStatus="mismatch"/>
+    </story>
+    <story id="S2" title="Second story" points="1" requirementStatus="closed" priority="Critical">
+      <scenario name="Fourth scenario" testStatus="pass"/>
+    </story>
+    <story id="S3" title="Third story" points="5" priority="Minor"/>
+  </epic>
+  <epic id="E2" title="Second epic">
+    <story id="S4" title="Fourth story" priority="Minor">
+      <scenario name="Fifth scenario" testStatus="fail"/>
+    </story>
+  </epic>
+  <epic id="E3" title="Third epic"/>
+</requirementscatalogue>
+"""
+
+def outline(view):
+    return [(epic.name, [(story.name, [scenario.name for scenario in story.scenarios],)
+                         for story in epic.stories],)
+            for epic in view.epics]
+
+@story(id="query-1", title="As a developer, I can query a catalogue")
+class Querying(unittest.TestCase):
+
+    @given("A catalogue")
+    def create(self):
+        from corejet.core.model import RequirementsCatalogue
+        self.catalogue = RequirementsCatalogue()
+        self.catalogue.populate(StringIO(XML))
+
+    @scenario("Field conditions")
+    class Fields(Scenario):
+
+        @when("Stories and scenarios are selected by field values")
+        def query(self):
+            self.view = self.catalogue.query(
+                story={'priority': 'Critical'},
+                scenario={'status': ('fail', 'mismatch',)})
+
+        @then("Only matching stories and scenarios are in the view")
+        def check(self):
+            self.assertEqual(outline(self.view), [
+                ('E1', [('S1', ['First scenario', 'Third scenario']),
+                        ('S2', [])]),
+                ('E2', []),
+                ('E3', []),
+            ])
+
+        @then("The view delegates to the catalogue's nodes")
+        def delegate(self):
+            epic = self.view.epics[0]
+            story = epic.stories[0]
+            self.assertEqual(self.view.project, 'Test project')
+            self.assertEqual(epic.title, 'First epic')
+            self.assertEqual(story.points, 3)
+            self.assertEqual(story.givens[0].text, 'some background')
+            self.assertTrue(story.story is self.catalogue.getStory('S1'))
+            self.assertTrue(story.scenarios[0] is
+                self.catalogue.getScenario('S1', 'First scenario'))
+
+    @scenario("Pruning and functions")
+    class Pruning(Scenario):
+
+        @when("A pruned query uses functions as conditions")
+        def query(self):
+            from corejet.core.query import Query
+            self.query = Query(epic=lambda epic: epic.name != 'E2',
+                               story={'points': lambda points: points >= 3},
+                               prune=True)
+
+        @then("Empty stories and epics are left out")
+        def check(self):
+            self.assertEqual(outline(self.query(self.catalogue)), [
+                ('E1', [('S1', ['First scenario', 'Second scenario',
+                                'Third scenario'])]),
+            ])
+
+        @then("The view reflects later changes to the catalogue")
+        def live(self):
+            view = self.query(self.catalogue)
+            self.catalogue.getStory('S2').points = 8
+            self.assertEqual([s.name for s in view.iterStories()], ['S1', 'S2'])
+            self.assertEqual(len(list(view.iterScenarios())), 4)
+
+    @scenario("Serialising views")
+    class Serialise(Scenario):
+
+        @when("A view is serialised and written")
+        def serialise(self):
+            view = self.catalogue.query(scenario={'status': 'pass'}, prune=True)
+            self.tree = view.serialize()
+            out = StringIO()
+            view.write(out)
+            self.written = out.getvalue()
+
+        @then("The output holds only the selected parts")
+        def check(self):
+            self.assertEqual(
+                [e.get('id') for e in self.tree.xpath('//story')], ['S1', 'S2'])
+            self.assertEqual(
+                [e.get('name') for e in self.tree.xpath('//scenario')],
+                ['Second scenario', 'Fourth scenario'])
+            self.assertEqual(self.written,
+                lxml.etree.tostring(self.tree, pretty_print=True))
+
+    @scenario("Evaluating predicates once")
+    class Once(Scenario):
+
+        @given("A pruned query that counts its predicate calls")
+        def create(self):
+            from collections import Counter
+            from corejet.core.query import Query
+            self.calls = calls = Counter()
+            def count(kind):
+                def predicate(node):
+                    calls[kind] += 1
+                    return True
+                return predicate
+            self.query = Query(epic=count('epic'), story=count('story'),
+                               scenario=count('scenario'), prune=True)
+
+        @when("The view is traversed and serialised")
+        def traverse(self):
+            view = self.query(self.catalogue)
+            self.outline = outline(view)
+            self.traversal = dict(self.calls)
+            view.serialize()
+
+        @then("Each node is tested once per traversal")
+        def check(self):
+            self.assertEqual(self.outline, [
+                ('E1', [('S1', ['First scenario', 'Second scenario',
+                                'Third scenario']),
+                        ('S2', ['Fourth scenario'])]),
+                ('E2', [('S4', ['Fifth scenario'])]),
+            ])
+            self.assertEqual(self.traversal,
+                             {'epic': 3, 'story': 4, 'scenario': 5})
+            self.assertEqual(dict(self.calls),
+                             {'epic': 6, 'story': 8, 'scenario': 10})
@@ -0,0 +1,131 @@
+import unittest2 as unittest
+from StringIO import StringIO
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+XML = """\
+<requirementscatalogue project="Test project">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story" points="3">
+      <scenario name="First scenario" testStatus="pass"/>
+      <scenario name="Second scenario" testStatus="fail"/>
+    </story>
+    <story id="S2" title="Second story" points="5">
+      <scenario name="Third scenario" testStatus="pass"/>
+    </story>
+    <story id="S3" title="Third story" points="2"/>
+  </epic>
+  <epic id="E2" title="Second epic">
+    <story id="S4" title="Fourth story">
+      <scenario name="Fourth scenario" testStatus="pending"/>
+      <scenario name="Fifth scenario"/>
+    </story>
+  </epic>
+</requirementscatalogue>
+"""
+
+def walk(node):
+    """Compute the rollup of a catalogue or epic the slow way
+    """
+    from corejet.core.model import Rollup
+    stories = hasattr(node, 'epics') and \
+        [s for epic in node.epics for s in epic.stories] or node.stories
+    result = Rollup()
+    for story in stories:
+        statuses = [scenario.status for scenario in story.scenarios]
+        complete = bool(statuses) and all(s == 'pass' for s in statuses)
+        points = int(story.points or 0)
+        result.stories += 1
+        result.points += points
+        result.completedStories += complete and 1 or 0
+        result.completedPoints += complete and points or 0
+        result.scenarios += len(statuses)
+        for status in statuses:
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+    return result
+
+def summary(rollup):
+    return (rollup.stories, rollup.completedStories, rollup.points,
+            rollup.completedPoints, rollup.scenarios, rollup.statuses,)
+
+@story(id="rollup-1", title="As a developer, I can read aggregate statistics without walking the model")
+class Rollups(unittest.TestCase):
+
+    @given("A populated catalogue")
+    def create(self):
+        from corejet.core.model import RequirementsCatalogue
+        self.catalogue = RequirementsCatalogue()
+        self.catalogue.populate(StringIO(XML))
+
+    @scenario("Rollups after parsing")
+    class Parsed(Scenario):
+
+        @then("The catalogue, epics and stories have rollups")
+        def check(self):
+            rollup = self.catalogue.rollup
+            self.assertEqual(summary(rollup),
+                (4, 1, 10, 5, 5, {'pass': 2, 'fail': 1, 'pending': 1, None: 1}))
+            self.assertEqual(rollup.completion, 0.5)
+            self.assertEqual(rollup.passRate, 0.4)
+            self.assertEqual(rollup.count('fail'), 1)
+            self.assertEqual(rollup.count('mismatch'), 0)
+            self.assertEqual(summary(self.catalogue.epics[0].rollup),
+                             summary(walk(self.catalogue.epics[0])))
+            self.assertEqual(summary(self.catalogue.getStory('S2').rollup),
+                             (1, 1, 5, 5, 1, {'pass': 1}))
+
+    @scenario("Incremental updates")
+    class Updates(Scenario):
+
+        @when("Statuses, points and the structure of the catalogue change")
+        def change(self):
+            from corejet.core.model import Epic, Story, Scenario
+            catalogue = self.catalogue
+            catalogue.getScenario('S1', 'Second scenario').status = 'pass'
+            catalogue.getStory('S2').points = 8
+            catalogue.getStory('S4').points = '1'
+            del catalogue.epics[0].stories[2]
+            story = Story('S5', 'Fifth story', points=13, scenarios=[
+                Scenario('Sixth scenario', status='pass')])
+            catalogue.epics[1].stories.append(story)
+            catalogue.getStory('S4').scenarios.pop()
+            catalogue.epics.append(Epic('E3', 'Third epic', stories=[
+                Story('S6', 'Sixth story', points=1)]))
+            catalogue.getScenario('S4', 'Fourth scenario').status = 'pass'
+
+        @then("The rollups match a full walk of the model")
+        def check(self):
+            for node in [self.catalogue] + list(self.catalogue.epics):
+                self.assertEqual(summary(node.rollup), summary(walk(node)))
+            self.assertEqual(summary(self.catalogue.rollup),
+                (5, 4, 26, 25, 5, {'pass': 5}))
+
+        @then("Removed epics no longer count")
+        def remove(self):
+            del self.catalogue.epics[0]
+            self.assertEqual(summary(self.catalogue.rollup),
+                             summary(walk(self.catalogue)))
+
+    @scenario("Rollups are computed once per story while parsing")
+    class Bulk(Scenario):
+
+        @when("A catalogue is populated")
+        def populate(self):
+            from corejet.core.model import RequirementsCatalogue, Story
+            self.updates = []
+            updateRollup = Story._updateRollup
+            def countingUpdate(story, delta):
+                self.updates.append(story.name)
+                updateRollup(story, delta)
+            Story._updateRollup = countingUpdate
+            try:
+                self.catalogue = RequirementsCatalogue()
+                self.catalogue.populate(StringIO(XML))
+            finally:
+                Story._updateRollup = updateRollup
+
+        @then("Each story with scenarios updates its rollup once")
+        def check(self):
+            self.assertEqual(self.updates, ['S1', 'S2', 'S4'])
+            self.assertEqual(summary(self.catalogue.rollup),
+                             summary(walk(self.catalogue)))
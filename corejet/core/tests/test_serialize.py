@@ -242,3 +242,57 @@ class XMLSerialization(unittest.TestCase):
         @then("Clean up")
         def cleanUp(self):
             shutil.rmtree(self.tmpdir)
+
+    @scenario("Incremental and compressed writing")
+    class IncrementalWriting(Scenario):
+
+        @given("A requirements catalogue with story-level steps, empty epics and non-ASCII text")
+        def create(self):
+            from corejet.core.model import RequirementsCatalogue
+            from corejet.core.model import Epic, Story, Scenario, Step
+
+            self.catalogue = RequirementsCatalogue(project=u"Test project \xe9",
+                extractTime=datetime.datetime(2011,1,2,12,1,0))
+
+            epic1 = Epic("E1", u"First epic & more")
+            self.catalogue.epics.append(epic1)
+            self.catalogue.epics.append(Epic("E2", "Second epic"))
+
+            story1 = Story("S1", "First story", points=3, epic=epic1,
+                givens=[Step("some background", 'given')],
+                whens=[Step("something always happens", 'when')],
+                thens=[Step("something is always true", 'then')],
+            )
+            epic1.stories.append(story1)
+            epic1.stories.append(Story("S2", "Second story", epic=epic1))
+
+            story1.scenarios.append(Scenario(u"First scenario \xe9", story=story1,
+                    givens=[Step(u"something <odd>", 'given')],
+                    whens=[Step("something happens", 'when')],
+                    thens=[Step("a multi-line\nresult", 'then')],
+                    status="pass",
+                ))
+            story1.scenarios.append(Scenario("Empty scenario", story=story1))
+
+        @when("The write() method is called, with and without compression")
+        def write(self):
+            from StringIO import StringIO
+            self.plain = StringIO()
+            self.catalogue.write(self.plain)
+            self.compressed = StringIO()
+            self.catalogue.write(self.compressed, compression=9)
+
+        @then("The output is identical to pretty-printing the serialized tree")
+        def checkOutput(self):
+            from StringIO import StringIO
+            expected = StringIO()
+            self.catalogue.serialize().write(expected, pretty_print=True)
+            self.assertEqual(self.plain.getvalue(), expected.getvalue())
+
+        @then("The compressed output decompresses to the same XML")
+        def checkCompressed(self):
+            import gzip
+            from StringIO import StringIO
+            self.assertEqual(
+                gzip.GzipFile(fileobj=StringIO(self.compressed.getvalue())).read(),
+                self.plain.getvalue())
@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import datetime
+import unittest2 as unittest
+import lxml.etree
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+XML = """\
+<requirementscatalogue project="Test project" extractTime="2011-01-02T12:01:00" testTime="2011-01-02T12:05:00">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story" points="3" requirementStatus="open" priority="high">
+      <given>some background</given>
+      <scenario name="First scenario" testStatus="pass">
+        <given>something</given>
+        <when>something happens</when>
+        <then>do something</then>
+      </scenario>
+    </story>
+  </epic>
+  <epic id="E/2" title="Second epic">
+    <story id="S2" title="Second story"/>
+  </epic>
+  <epic id="E_2" title="Third epic"/>
+</requirementscatalogue>
+"""
+
+def parse(xml):
+    from StringIO import StringIO
+    from corejet.core.model import RequirementsCatalogue
+    catalogue = RequirementsCatalogue()
+    catalogue.populate(StringIO(xml))
+    return catalogue
+
+@story(id="shard-1", title="As a developer, I can write a catalogue as one file per epic")
+class Sharding(unittest.TestCase):
+
+    @given("An empty output directory")
+    def directory(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmpdir, 'shards')
+
+    @then("Clean up")
+    def cleanUp(self):
+        shutil.rmtree(self.tmpdir)
+
+    @scenario("Writing and reading shards")
+    class WriteAndRead(Scenario):
+
+        @given("A catalogue")
+        def create(self):
+            self.catalogue = parse(XML)
+
+        @when("It is written as shards in worker processes")
+        def write(self):
+            from corejet.core.shard import writeShards
+            self.written = writeShards(self.catalogue, self.directory,
+                                       processes=2)
+
+        @then("There is one shard per epic and a manifest")
+        def files(self):
+            self.assertEqual(self.written, ['E1', 'E/2', 'E_2'])
+            self.assertEqual(sorted(os.listdir(self.directory)),
+                ['E1.xml', 'E_2-1.xml', 'E_2.xml', 'manifest.xml'])
+
+        @then("Each shard is a catalogue with one epic")
+        def shard(self):
+            shard = parse(open(os.path.join(self.directory, 'E1.xml')).read())
+            self.assertEqual(shard.project, 'Test project')
+            self.assertEqual(shard.testTime, None)
+            self.assertEqual([epic.name for epic in shard.epics], ['E1'])
+
+        @then("The shards can be loaded back into an equal catalogue")
+        def load(self):
+            from corejet.core.shard import ShardedCatalogue
+            sharded = ShardedCatalogue(self.directory)
+            self.assertEqual(sharded.epicIds(), ['E1', 'E/2', 'E_2'])
+            self.assertEqual(sharded.getShard('E1').fingerprint,
+                             self.catalogue.epics[0].fingerprint)
+            copy = sharded.load()
+            self.assertEqual(lxml.etree.tostring(copy.serialize()),
+                             lxml.etree.tostring(self.catalogue.serialize()))
+
+        @then("Epics can be loaded selectively")
+        def selective(self):
+            from corejet.core.shard import ShardedCatalogue
+            sharded = ShardedCatalogue(self.directory)
+            epic = sharded.loadEpic('E/2')
+            self.assertEqual(epic.stories[0].name, 'S2')
+            catalogue = sharded.load(['E_2'])
+            self.assertEqual([e.name for e in catalogue.epics], ['E_2'])
+            self.assertEqual(catalogue.testTime,
+                             datetime.datetime(2011, 1, 2, 12, 5))
+
+    @scenario("Rewriting after a test run")
+    class Rewrite(Scenario):
+
+        @given("A catalogue written as shards")
+        def create(self):
+            from corejet.core.shard import writeShards
+            self.catalogue = parse(XML)
+            writeShards(self.catalogue, self.directory, processes=1)
+            self.mtime = os.path.getmtime(os.path.join(self.directory, 'E_2.xml'))
+
+        @when("A scenario status, the test time and the set of epics change")
+        def change(self):
+            from corejet.core.model import Epic
+            from corejet.core.shard import writeShards
+            self.catalogue.epics[0].stories[0].scenarios[0].status = 'fail'
+            self.catalogue.testTime = datetime.datetime(2011, 1, 3)
+            del self.catalogue.epics[2]
+            self.catalogue.epics.append(Epic('E4', 'Fourth epic'))
+            self.written = writeShards(self.catalogue, self.directory,
+                                       processes=1)
+
+        @then("Only the changed and new epics are written again")
+        def written(self):
+            self.assertEqual(self.written, ['E1', 'E4'])
+            self.assertEqual(self.mtime,
+                os.path.getmtime(os.path.join(self.directory, 'E_2.xml')))
+
+        @then("Shards of removed epics are deleted")
+        def removed(self):
+            self.assertEqual(sorted(os.listdir(self.directory)),
+                ['E1.xml', 'E4.xml', 'E_2.xml', 'manifest.xml'])
+
+        @then("The manifest has the new test time")
+        def manifest(self):
+            from corejet.core.shard import ShardedCatalogue
+            sharded = ShardedCatalogue(self.directory)
+            self.assertEqual(sharded.testTime, datetime.datetime(2011, 1, 3))
+            self.assertEqual(sharded.loadEpic('E1').stories[0].scenarios[0].status,
+                             'fail')
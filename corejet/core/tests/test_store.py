@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest2 as unittest
+import lxml.etree
+from StringIO import StringIO
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+XML = """\
+<requirementscatalogue project="Test project" extractTime="2011-01-02T12:01:00+02:00" testTime="2011-01-02T12:05:00">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story" points="3" requirementStatus="open" priority="Critical">
+      <given>some background</given>
+      <scenario name="First scenario" testStatus="fail">
+        <given>something</given>
+        <when>something happens</when>
+        <then>do something</then>
+        <then>and something else</then>
+      </scenario>
+      <scenario name="Second scenario" testStatus="pass">
+        <given>something else</given>
+      </scenario>
+    </story>
+    <story id="S2" title="Second story" points="3" requirementStatus="closed" requirementResolution="fixed" priority="Critical">
+      <scenario name="Third scenario" testStatus="pass"/>
+    </story>
+  </epic>
+  <epic id="E2" title="Second epic"/>
+  <epic id="E3" title="Third epic">
+    <story id="S3" title="Third story" priority="Minor">
+      <scenario name="Fourth scenario" testStatus="fail"/>
+    </story>
+  </epic>
+</requirementscatalogue>
+"""
+
+def toXML(catalogue):
+    return lxml.etree.tostring(catalogue.serialize())
+
+@story(id="store-1", title="As a developer, I can keep a catalogue in a SQLite database")
+class Storing(unittest.TestCase):
+
+    @given("A catalogue saved to a new database")
+    def save(self):
+        from corejet.core.model import RequirementsCatalogue
+        from corejet.core.store import CatalogueStore
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'corejet.db')
+        self.catalogue = RequirementsCatalogue()
+        self.catalogue.populate(StringIO(XML))
+        self.store = CatalogueStore(self.path)
+        self.store.save(self.catalogue)
+
+    @then("Clean up")
+    def cleanUp(self):
+        self.store.close()
+        shutil.rmtree(self.tmpdir)
+
+    @scenario("Loading everything")
+    class Full(Scenario):
+
+        @when("The whole catalogue is loaded from a new connection")
+        def load(self):
+            from corejet.core.store import CatalogueStore
+            store = CatalogueStore(self.path)
+            try:
+                self.copy = store.load()
+            finally:
+                store.close()
+
+        @then("It is the same as the saved catalogue")
+        def check(self):
+            self.assertEqual(toXML(self.copy), toXML(self.catalogue))
+            self.assertEqual(self.copy.extractTime, self.catalogue.extractTime)
+            self.assertEqual(self.copy.fingerprint, self.catalogue.fingerprint)
+            self.assertTrue(self.copy.getScenario('S1', 'First scenario').story
+                            is self.copy.getStory('S1'))
+
+    @scenario("Loading by query")
+    class Query(Scenario):
+
+        @when("Failing scenarios of critical stories are loaded")
+        def load(self):
+            self.result = self.store.load(priority='Critical',
+                                          scenarioStatus='fail')
+
+        @then("Only those scenarios, their stories and epics are loaded")
+        def check(self):
+            self.assertEqual([epic.name for epic in self.result.epics], ['E1'])
+            self.assertEqual([s.name for s in self.result.epics[0].stories], ['S1'])
+            story = self.result.getStory('S1')
+            self.assertEqual([s.name for s in story.scenarios], ['First scenario'])
+            self.assertEqual([s.text for s in story.givens], ['some background'])
+            self.assertEqual([s.text for s in story.scenarios[0].thens],
+                             ['do something', 'and something else'])
+
+        @then("Several values can be given for a field")
+        def alternatives(self):
+            result = self.store.load(story=['S2', 'S3'])
+            self.assertEqual([epic.name for epic in result.epics], ['E1', 'E3'])
+            result = self.store.load(status='closed', scenarioStatus='fail')
+            self.assertEqual(result.epics, [])
+
+        @then("The queried fields are indexed")
+        def indexes(self):
+            plan = ' '.join([str(row) for row in self.store.connection.execute(
+                'EXPLAIN QUERY PLAN SELECT id FROM story WHERE priority = ?',
+                ('Critical',))])
+            self.assertIn('story_priority', plan)
+
+    @scenario("Saving again")
+    class Replace(Scenario):
+
+        @when("A changed catalogue is saved")
+        def save(self):
+            del self.catalogue.epics[0]
+            self.store.save(self.catalogue)
+
+        @then("It replaces the stored one")
+        def check(self):
+            self.assertEqual(toXML(self.store.load()), toXML(self.catalogue))
@@ -0,0 +1,99 @@
+import io
+import unittest2 as unittest
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+TEXT = u"""\
+Given a logged-in user
+
+Scenario: Logging out
+When the user logs out
+Then the login page is shown
+
+Scenario Outline: Adding items
+Given <start> items
+When the user adds <added> items
+Then there are <total> items
+
+Examples:
+| start | added | total |
+| 1     | 2     | 3     |
+| 4     | 5     | 9     |
+
+Scenario: Closing the basket
+When the user closes the basket
+Then the basket is closed
+"""
+
+@story(id="stream-1", title="As a developer, I can stream scenarios out of acceptance criteria")
+class Streaming(unittest.TestCase):
+
+    @given("A story")
+    def create(self):
+        from corejet.core.model import Story
+        self.target = Story(u'S1', u'First story')
+
+    @scenario("Parsing lazily")
+    class Lazy(Scenario):
+
+        @when("Scenarios are read from a generator of lines")
+        def parse(self):
+            from corejet.core.parser import iterScenarios
+            self.consumed = 0
+            def lines():
+                for line in io.StringIO(TEXT):
+                    self.consumed += 1
+                    yield line
+            self.seen = []
+            for scenario in iterScenarios(self.target, lines()):
+                self.seen.append((scenario.name, self.consumed,))
+
+        @then("Each scenario is yielded once it is complete")
+        def check(self):
+            self.assertEqual(self.seen, [
+                (u'Logging out', 7),
+                (u'Adding items #01', 14),
+                (u'Adding items #02', 15),
+                (u'Closing the basket', 19),
+            ])
+
+        @then("Steps before the first scenario go to the story")
+        def background(self):
+            self.assertEqual([step.text for step in self.target.givens],
+                             [u'a logged-in user'])
+            self.assertEqual(self.target.scenarios, [])
+
+    @scenario("Appending scenarios")
+    class Append(Scenario):
+
+        @when("The same text is parsed with appendScenarios()")
+        def parse(self):
+            from corejet.core.parser import appendScenarios
+            appendScenarios(self.target, TEXT)
+
+        @then("The same scenarios are appended to the story")
+        def check(self):
+            scenarios = self.target.scenarios
+            self.assertEqual([s.name for s in scenarios], [
+                u'Logging out', u'Adding items #01', u'Adding items #02',
+                u'Closing the basket'])
+            self.assertEqual([s.text for s in scenarios[2].thens],
+                             [u'there are 9 items'])
+            self.assertTrue(scenarios[0].story is self.target)
+
+    @scenario("Appending invalid criteria")
+    class Invalid(Scenario):
+
+        @when("Text that fails after an outline is parsed with appendScenarios()")
+        def parse(self):
+            from corejet.core.parser import appendScenarios
+            with self.assertRaises(ValueError):
+                appendScenarios(self.target,
+                                TEXT + u"\nScenario: Bad\nThen nothing happened")
+
+        @then("The story is unchanged")
+        def check(self):
+            self.assertEqual(list(self.target.givens), [])
+            self.assertEqual(list(self.target.scenarios), [])
+            self.assertEqual(self.target._outlines, None)
+            self.assertEqual(self.target.rollup.scenarios, 0)
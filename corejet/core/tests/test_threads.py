@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import sys
+import shutil
+import tempfile
+import threading
+import unittest2 as unittest
+
+from multiprocessing.pool import ThreadPool
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+ENGLISH = u"""\
+Given a logged-in user
+
+Scenario: Adding item %(n)d
+When the user adds item %(n)d
+ And the user opens the basket
+Then the basket holds item %(n)d
+
+Scenario Outline: Adding items %(n)d
+Given <start> items
+When the user adds <added> items
+Then there are <total> items
+
+Examples:
+| start | added | total |
+| 1     | 2     | 3     |
+| 4     | 5     | 9     |
+"""
+
+FINNISH = u"""\
+# language: fi
+Tapaus: Tuotteen %(n)d lisääminen
+Oletetaan, että kori on tyhjä,
+Kun käyttäjä lisää tuotteen %(n)d koriin,
+niin korissa on tuote %(n)d,
+  mutta ei mitään muuta.
+"""
+
+THREADS = 8
+
+def together(func, args):
+    """Call func with each of args in its own thread, starting them all at
+    once, and return the results in order
+    """
+    start = threading.Event()
+    results = [None] * len(args)
+    def run(index):
+        start.wait()
+        results[index] = func(args[index])
+    threads = [threading.Thread(target=run, args=(index,))
+               for index in range(len(args))]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+def parse(text):
+    from corejet.core.model import Story
+    from corejet.core.parser import appendScenarios
+    target = Story(u'S1', u'First story')
+    appendScenarios(target, text)
+    return (target.fingerprint,
+            [scenario.name for scenario in target.scenarios],)
+
+@story(id="threads-1", title="As a developer, I can parse acceptance criteria from many threads at once")
+class Threads(unittest.TestCase):
+
+    @given("Frequent thread switches")
+    def switch(self):
+        self.checkInterval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+
+    @then("Restore thread switches")
+    def restore(self):
+        sys.setcheckinterval(self.checkInterval)
+
+    @scenario("Loading languages from many threads")
+    class Languages(Scenario):
+
+        @given("A registry that has not loaded any languages")
+        def create(self):
+            from corejet.core.parser import LocaleRegistry
+            self.registry = LocaleRegistry()
+
+        @when("Threads ask for the same classifiers at once")
+        def load(self):
+            languages = ['en', 'fi', 'xx'] * THREADS
+            self.classifiers = together(self.registry.classifier, languages)
+
+        @then("Each language is compiled once")
+        def check(self):
+            english, finnish = self.classifiers[:2]
+            self.assertFalse(english is finnish)
+            for index, classifier in enumerate(self.classifiers):
+                self.assertTrue(classifier is (finnish if index % 3 == 1
+                                               else english))
+            self.assertEqual(finnish.classify(u'Tapaus: Yksi'),
+                             (u'scenario', u'Yksi'))
+
+    @scenario("Matching line types from many threads")
+    class Match(Scenario):
+
+        @given("A line type regex that has not been compiled")
+        def create(self):
+            from corejet.core.parser import RegEx, LocaleRegistry
+            self.regex = RegEx(r'^\s*{keyword} (.+)', 'Given')
+            self.regex.translations = LocaleRegistry()
+
+        @when("Threads match lines at once")
+        def match(self):
+            lines = [(u'Given a user', 'en',),
+                     (u'Oletetaan, että käyttäjä', 'fi',)] * THREADS
+            self.matches = together(
+                lambda args: self.regex.match(*args).group(1), lines)
+
+        @then("Each match uses the expression for its language")
+        def check(self):
+            self.assertEqual(self.matches,
+                             [u'a user', u'käyttäjä'] * THREADS)
+            self.assertEqual(len(self.regex._expressions), 2)
+
+    @scenario("Registering catalogues while parsing")
+    class Register(Scenario):
+
+        @given("A registry with a Swedish catalogue")
+        def create(self):
+            from corejet.core.parser import LocaleRegistry
+            from corejet.core.tests.test_locales import writeCatalogue, SWEDISH
+            self.localeDir = tempfile.mkdtemp()
+            writeCatalogue(self.localeDir, 'sv', SWEDISH)
+            self.registry = LocaleRegistry([], None)
+            self.registry.register('sv', self.localeDir)
+
+        @when("Threads classify Swedish lines while it is registered again")
+        def classify(self):
+            def work(index):
+                if index % 4 == 0:
+                    self.registry.register('sv', self.localeDir)
+                    return None
+                return self.registry.classifier('sv').classify(u'Givet x')
+            try:
+                self.results = together(work, range(THREADS * 4))
+            finally:
+                shutil.rmtree(self.localeDir)
+
+        @then("Every line is classified with the Swedish catalogue")
+        def check(self):
+            for index, result in enumerate(self.results):
+                if index % 4:
+                    self.assertEqual(result, (u'given', u'x'))
+
+    @scenario("Parsing in a thread pool")
+    class Pool(Scenario):
+
+        @given("Criteria in several languages")
+        def create(self):
+            self.texts = [(ENGLISH if n % 2 else FINNISH) % {'n': n}
+                          for n in range(200)]
+            self.expected = [parse(text) for text in self.texts]
+
+        @when("They are parsed in a thread pool")
+        def parallel(self):
+            pool = ThreadPool(THREADS)
+            try:
+                self.results = pool.map(parse, self.texts, 1)
+            finally:
+                pool.close()
+                pool.join()
+
+        @then("Each result is the same as when parsed serially")
+        def check(self):
+            self.assertEqual(self.results, self.expected)
+            self.assertEqual(self.results[1][1], [
+                u'Adding item 1', u'Adding items 1 #01', u'Adding items 1 #02'])
@@ -0,0 +1,110 @@
+import unittest2 as unittest
+from StringIO import StringIO
+
+from corejet.core import Scenario, story, scenario, given, when, then
+
+XML = """\
+<requirementscatalogue project="Test project" extractTime="2011-01-02T12:01:00+02:00">
+  <epic id="E1" title="First epic">
+    <story id="S1" title="First story" points="3" priority="Critical">
+      <given>some background</given>
+      <scenario name="First scenario" testStatus="fail">
+        <given>something</given>
+        <when>something happens</when>
+        <then>do something</then>
+      </scenario>
+      <scenario name="Second scenario" testStatus="pass"/>
+    </story>
+  </epic>
+</requirementscatalogue>
+"""
+
+@story(id="validate-1", title="As a developer, I can validate a catalogue against its schema")
+class Validating(unittest.TestCase):
+
+    @given("A catalogue read from XML")
+    def create(self):
+        from corejet.core.model import RequirementsCatalogue
+        self.catalogue = RequirementsCatalogue()
+        self.catalogue.populate(StringIO(XML))
+
+    @scenario("A valid catalogue")
+    class Valid(Scenario):
+
+        @when("It is validated")
+        def validate(self):
+            from corejet.core.validate import validateCatalogue
+            self.errors = validateCatalogue(self.catalogue)
+
+        @then("There are no errors")
+        def check(self):
+            self.assertEqual(self.errors, [])
+
+    @scenario("An invalid catalogue")
+    class Invalid(Scenario):
+
+        @when("Several nodes are made invalid")
+        def invalidate(self):
+            from corejet.core.validate import validateCatalogue
+            story = self.catalogue.getStory('S1')
+            self.catalogue.extractTime = None
+            story.title = None
+            story.scenarios[1].status = 'broken'
+            story.scenarios[0].whens[0].text = 'two\nlines'
+            story.scenarios[0].thens[0].step_type = 'then,'
+            self.errors = validateCatalogue(self.catalogue)
+
+        @then("All the errors are reported with their paths")
+        def check(self):
+            from zope.schema.interfaces import RequiredMissing
+            from zope.schema.interfaces import ConstraintNotSatisfied
+            self.assertEqual(
+                [(path, type(error),) for path, error in self.errors], [
+                ('extractTime', RequiredMissing),
+                ('epics[0].stories[0].title', RequiredMissing),
+                ('epics[0].stories[0].scenarios[0].whens[0].text',
+                    ConstraintNotSatisfied),
+                ('epics[0].stories[0].scenarios[0].thens[0].step_type',
+                    ConstraintNotSatisfied),
+                ('epics[0].stories[0].scenarios[1].status',
+                    ConstraintNotSatisfied),
+            ])
+
+        @then("They agree with zope.schema")
+        def agree(self):
+            from zope.schema import getValidationErrors
+            from corejet.core.interfaces import IStep
+            step = self.catalogue.getStory('S1').scenarios[0].thens[0]
+            step.text = u'do something'
+            self.assertEqual([name for name, error in
+                              getValidationErrors(IStep, step)], ['step_type'])
+
+    @scenario("Validating while populating")
+    class Populate(Scenario):
+
+        @when("An invalid document is read with validation enabled")
+        def populate(self):
+            from corejet.core.model import RequirementsCatalogue
+            from corejet.core.validate import CatalogueValidationError
+            catalogue = RequirementsCatalogue()
+            try:
+                catalogue.populate(StringIO(XML.replace(
+                    ' extractTime="2011-01-02T12:01:00+02:00"', '').replace(
+                    'testStatus="pass"', 'testStatus="passed"')), validate=True)
+            except CatalogueValidationError, e:
+                self.error = e
+            else:
+                self.error = None
+
+        @then("All the errors are raised together")
+        def check(self):
+            self.assertNotEqual(self.error, None)
+            self.assertEqual([path for path, error in self.error.errors], [
+                'extractTime', 'epics[0].stories[0].scenarios[1].status'])
+
+        @then("A valid document is accepted")
+        def valid(self):
+            from corejet.core.model import RequirementsCatalogue
+            catalogue = RequirementsCatalogue()
+            catalogue.populate(StringIO(XML), validate=True)
+            self.assertEqual(catalogue.getStory('S1').points, 3)
@@ -0,0 +1,164 @@
+"""Bulk validation of requirements catalogues.
+
+``zope.schema.getValidationErrors()`` binds and validates every field of
+every object separately, which is far too slow for catalogues with many
+thousands of nodes. Instead, a ``Validator`` compiles the fields of a
+schema interface once into a list of plain checks, and walks a whole
+catalogue in a single pass::
+
+    errors = validateCatalogue(catalogue)
+    for path, error in errors:
+        print path, error
+
+Each error is a ``(path, error)`` pair, where ``path`` locates the value,
+e.g. ``epics[0].stories[3].points``, and ``error`` is the
+``zope.schema`` validation error that the field would have raised.
+
+Text fields accept byte strings as well as unicode, since lxml returns
+ASCII-only text as ``str`` under Python 2. Fields referring back to a
+parent node are only checked to provide their interface, and are not
+descended into.
+"""
+
+import datetime
+
+from zope import schema
+from zope.schema.interfaces import RequiredMissing
+from zope.schema.interfaces import WrongType
+from zope.schema.interfaces import WrongContainedType
+from zope.schema.interfaces import ConstraintNotSatisfied
+from zope.schema.interfaces import SchemaNotProvided
+from zope.schema.interfaces import ValidationError
+
+from corejet.core.interfaces import IRequirementsCatalogue
+from corejet.core.model import ScenarioSequence
+
+class CatalogueValidationError(ValueError):
+    """A catalogue failed validation. ``errors`` holds all the
+    ``(path, error)`` pairs found.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        ValueError.__init__(self, "%d validation error(s), first at %s: %r" %
+                            (len(errors), errors[0][0], errors[0][1],))
+
+def _textCheck(field):
+    multiLine = not isinstance(field, schema.TextLine)
+    def check(value):
+        if not isinstance(value, basestring):
+            return WrongType(value, unicode, field.__name__)
+        if not multiLine and ('\n' in value or '\r' in value):
+            return ConstraintNotSatisfied(value, field.__name__)
+    return check
+
+def _typeCheck(field, types):
+    def check(value):
+        if not isinstance(value, types) or isinstance(value, bool):
+            return WrongType(value, field._type, field.__name__)
+    return check
+
+def _choiceCheck(field):
+    values = frozenset([term.value for term in field.vocabulary])
+    def check(value):
+        if value not in values:
+            return ConstraintNotSatisfied(value, field.__name__)
+    return check
+
+def _providesCheck(field):
+    provided = field.schema.providedBy
+    def check(value):
+        if not provided(value):
+            return SchemaNotProvided(field.schema, value)
+    return check
+
+def _fieldCheck(field):
+    # Return a function of a (non-None) value returning an error or None
+    if isinstance(field, schema.Text):
+        return _textCheck(field)
+    if isinstance(field, schema.Int):
+        return _typeCheck(field, (int, long,))
+    if isinstance(field, schema.Datetime):
+        return _typeCheck(field, datetime.datetime)
+    if isinstance(field, schema.Choice) and field.vocabulary is not None:
+        return _choiceCheck(field)
+    if isinstance(field, schema.Object):
+        return _providesCheck(field)
+    # Anything else is validated the slow way
+    def check(value):
+        try:
+            field.validate(value)
+        except ValidationError, e:
+            return e
+    return check
+
+class Validator(object):
+    """Validates objects providing ``schema``, and the nodes in any lists
+    of objects it contains, against their schema fields
+    """
+
+    def __init__(self, schema_):
+        self.schema = schema_
+        self.fields = []
+        self.children = []
+        for name, field in schema.getFieldsInOrder(schema_):
+            if (isinstance(field, schema.List) and
+                isinstance(field.value_type, schema.Object)
+            ):
+                self.children.append((name, field,))
+            else:
+                self.fields.append((name, field.required, _fieldCheck(field),))
+
+    def errors(self, node, path=''):
+        """Return a list of ``(path, error)`` pairs for ``node`` and its
+        children
+        """
+        errors = []
+        self._validate(node, path, errors)
+        return errors
+
+    def _validate(self, node, path, errors):
+        prefix = path and path + '.' or ''
+        for name, required, check in self.fields:
+            value = getattr(node, name, None)
+            if value is None:
+                if required:
+                    errors.append((prefix + name, RequiredMissing(name),))
+                continue
+            error = check(value)
+            if error is not None:
+                errors.append((prefix + name, error,))
+
+        for name, field in self.children:
+            items = getattr(node, name, None)
+            if items is None:
+                if field.required:
+                    errors.append((prefix + name, RequiredMissing(name),))
+                continue
+            if not isinstance(items, (list, ScenarioSequence,)):
+                errors.append((prefix + name, WrongType(items, list, name),))
+                continue
+            itemSchema = field.value_type.schema
+            provided = itemSchema.providedBy
+            validate = _validatorFor(itemSchema)._validate
+            for index, item in enumerate(items):
+                itemPath = '%s%s[%d]' % (prefix, name, index,)
+                if not provided(item):
+                    errors.append((itemPath, WrongContainedType(
+                        [SchemaNotProvided(itemSchema, item)], name),))
+                    continue
+                validate(item, itemPath, errors)
+
+_compiled = {}
+
+def _validatorFor(schema_):
+    validator = _compiled.get(schema_)
+    if validator is None:
+        validator = _compiled[schema_] = Validator(schema_)
+    return validator
+
+def validateCatalogue(catalogue):
+    """Return a list of ``(path, error)`` pairs for all the problems found
+    in ``catalogue``, or an empty list if it is valid
+    """
+    return _validatorFor(IRequirementsCatalogue).errors(catalogue)
@@ -4,7 +4,7 @@ version = '1.1.1.dev0'
 
 requires = [
     'setuptools',
-    'lxml',
+    'lxml >= 4.5',
     'argparse',
     'python-dateutil',
     'unittest2',
@@ -30,6 +30,9 @@ setup(name='corejet.core',
       include_package_data=True,
       zip_safe=False,
       install_requires=requires,
+      extras_require={
+        'xz': ['backports.lzma'],
+      },
       entry_points="""
       [console_scripts]
       corejet2py = corejet.core.scripts.corejet2py:main